@@ -0,0 +1,67 @@
+import io
+import gzip
+import lzma
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+# Compressed JTL suffixes and the matching compression names used by pandas.
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+    ".xz": "xz",
+}
+
+READ_BUFFER_SIZE = 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+def get_compression(file_path: Path) -> Optional[str]:
+    """
+    Returns the compression of a file judging by its suffix, None for uncompressed files.
+    """
+    return COMPRESSION_SUFFIXES.get(Path(file_path).suffix)
+
+
+def get_file_patterns(file_mask: str) -> List[str]:
+    """
+    Returns the glob patterns matching the file mask with and without a compression suffix.
+    """
+    return [f"*{file_mask}"] + [f"*{file_mask}{suffix}" for suffix in COMPRESSION_SUFFIXES]
+
+
+def find_jtl_files(directory: Path, file_mask: str) -> List[Path]:
+    """
+    Finds the JTL files matching the file mask in a directory and its subdirectories,
+    compressed or not, in path order.
+    """
+    jtl_files = set()
+    logger.debug(f"Scanning {directory} for files.")
+    for file_pattern in get_file_patterns(file_mask):
+        for file in Path(directory).rglob(file_pattern):
+            logger.info(f"Found file: {file}")
+            jtl_files.add(file)
+    return sorted(jtl_files)
+
+
+def open_jtl(file_path: Path):
+    """
+    Opens a possibly compressed JTL file for binary reading, decompressing it as a stream.
+
+    Raises:
+        ImportError: If the file is compressed with zstd and zstandard is not installed.
+    """
+    compression = get_compression(file_path)
+    if compression == "gzip":
+        return gzip.open(file_path, "rb")
+    if compression == "xz":
+        return lzma.open(file_path, "rb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError("Reading .zst JTL files requires the zstandard package") from e
+        reader = zstandard.ZstdDecompressor().stream_reader(open(file_path, "rb"), closefd=True)
+        return io.BufferedReader(reader, buffer_size=READ_BUFFER_SIZE)
+    return open(file_path, "rb")
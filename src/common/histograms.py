@@ -0,0 +1,366 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence
+from src.common.percentiles import lerp, linear_positions
+
+# Largest number of dense histogram cells (groups x value span) counted with np.bincount.
+# Longer tails are counted sparsely by hashing.
+DENSE_LIMIT = 1 << 22
+# Elapsed times below 2 ** (LATENCY_SUB_BUCKET_BITS + 1) have a latency bin each, longer
+# ones share log-linear bins 1 / 2 ** LATENCY_SUB_BUCKET_BITS of their value wide, like
+# HdrHistogram does, so there are 64 bins per power of two and quantiles estimated from
+# the bins are within LATENCY_RELATIVE_ERROR of the exact ones.
+LATENCY_SUB_BUCKET_BITS = 6
+LATENCY_RELATIVE_ERROR = 1 / 2 ** (LATENCY_SUB_BUCKET_BITS + 1)
+
+
+def time_segments(edges: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+    """
+    Assigns timestamps to the elementary time segments between sorted range boundaries.
+
+    Segment 2 * i + 1 holds the timestamps equal to edge i, segment 2 * i the timestamps
+    between edges i - 1 and i, so there are 2 * len(edges) + 1 segments.
+    """
+    positions = np.searchsorted(edges, timestamps, side="left")
+    at_edge = edges[np.minimum(positions, len(edges) - 1)] == timestamps if len(edges) else False
+    return 2 * positions + at_edge
+
+
+def range_segments(edges: np.ndarray, start_epoch: int, end_epoch: int) -> slice:
+    """
+    Returns the time segments strictly between two range boundaries, which are both edges.
+    """
+    start = int(np.searchsorted(edges, start_epoch))
+    end = int(np.searchsorted(edges, end_epoch))
+    return slice(2 * start + 2, max(2 * start + 2, 2 * end + 1))
+
+
+def latency_bins(elapsed) -> np.ndarray:
+    """
+    Returns the latency bin of every elapsed time, rounding times down to whole units.
+    Bins increase with the elapsed time, negative times fall into bin 0.
+    """
+    values = np.maximum(np.floor(np.asarray(elapsed, dtype=np.float64)), 0).astype(np.int64)
+    exponents = np.frexp(values)[1] - 1
+    shifts = np.maximum(exponents - LATENCY_SUB_BUCKET_BITS, 0)
+    return (shifts << LATENCY_SUB_BUCKET_BITS) + (values >> shifts)
+
+
+def latency_bin_values(bins) -> np.ndarray:
+    """
+    Returns the middle of the elapsed times of every latency bin.
+    """
+    bins = np.asarray(bins, dtype=np.int64)
+    shifts = np.maximum((bins >> LATENCY_SUB_BUCKET_BITS) - 1, 0)
+    lower = (bins - (shifts << LATENCY_SUB_BUCKET_BITS)) << shifts
+    return lower + ((1 << shifts) - 1) / 2
+
+
+class LatencyHistogram:
+    """
+    Exact histogram of elapsed times, stored sparsely as the distinct values and their counts.
+
+    Histograms of disjoint samples can be merged, and the quantiles of a histogram are
+    identical to Series.quantile of the values it was built from.
+    """
+
+    def __init__(self, values: Optional[np.ndarray] = None, counts: Optional[np.ndarray] = None):
+        """
+        Parameters:
+        - values (Optional[np.ndarray]): The distinct values in increasing order.
+        - counts (Optional[np.ndarray]): The number of occurrences of every value.
+        """
+        self.values = np.asarray(values) if values is not None else np.empty(0, dtype=np.int64)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+
+    @classmethod
+    def from_values(cls, values) -> "LatencyHistogram":
+        """
+        Builds the histogram of the values, ignoring missing values.
+        """
+        values = np.asarray(values)
+        return cls.from_groups(values, np.zeros(len(values), dtype=np.intp), 1)[0]
+
+    @classmethod
+    def from_groups(cls, values, group_codes, n_groups: int) -> List["LatencyHistogram"]:
+        """
+        Builds the histograms of several groups of values in one pass.
+
+        Integer values with a bounded range are counted in linear time with np.bincount,
+        other values are counted by hashing, sorting only the distinct values and keys.
+
+        Parameters:
+        - values: The values, missing values are ignored.
+        - group_codes: The group of every value, from 0 to n_groups - 1.
+          Values with negative codes are ignored.
+        - n_groups (int): The number of groups.
+
+        Returns:
+        - List[LatencyHistogram]: The histogram of every group.
+        """
+        values = np.asarray(values)
+        group_codes = np.asarray(group_codes, dtype=np.intp)
+        valid = group_codes >= 0
+        if values.dtype.kind == "f":
+            valid &= ~np.isnan(values)
+            if np.array_equal(values[valid], np.floor(values[valid])):
+                values = np.where(valid, values, 0).astype(np.int64)
+        if not valid.all():
+            values, group_codes = values[valid], group_codes[valid]
+        if values.size == 0:
+            return [cls() for _ in range(n_groups)]
+
+        if values.dtype.kind in "iub":
+            values = values.astype(np.int64)
+        minimum = int(values.min()) if values.dtype.kind == "i" else 0
+        span = int(values.max()) - minimum + 1 if values.dtype.kind == "i" else 0
+        if values.dtype.kind == "i" and n_groups * span <= DENSE_LIMIT:
+            value_codes, n_values = values - minimum, span
+            distinct_values = None
+        else:
+            # Distinct values are found by hashing, only they are sorted
+            value_codes, distinct_values = pd.factorize(values, sort=True)
+            n_values = len(distinct_values)
+
+        keys = group_codes * n_values + value_codes
+        if n_groups * n_values <= DENSE_LIMIT:
+            counts = np.bincount(keys, minlength=n_groups * n_values)
+            keys = np.flatnonzero(counts)
+            counts = counts[keys]
+        else:
+            key_codes, keys = pd.factorize(keys)
+            counts = np.bincount(key_codes)
+            order = np.argsort(keys)
+            keys, counts = keys[order], counts[order]
+
+        run_codes, run_value_codes = np.divmod(keys, n_values)
+        run_values = run_value_codes + minimum if distinct_values is None else distinct_values[run_value_codes]
+        bounds = np.searchsorted(run_codes, np.arange(n_groups + 1))
+        return [
+            cls(run_values[start:end], counts[start:end])
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+
+    @classmethod
+    def merge_all(cls, histograms: Iterable["LatencyHistogram"]) -> "LatencyHistogram":
+        """
+        Merges histograms of disjoint samples into the histogram of all of them.
+        """
+        histograms = [histogram for histogram in histograms if histogram.total]
+        if not histograms:
+            return cls()
+        if len(histograms) == 1:
+            return histograms[0]
+        values, inverse = np.unique(
+            np.concatenate([histogram.values for histogram in histograms]), return_inverse=True
+        )
+        counts = np.bincount(
+            inverse, weights=np.concatenate([histogram.counts for histogram in histograms])
+        )
+        return cls(values, counts.astype(np.int64))
+
+    def __add__(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        return self.merge_all([self, other])
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def sum(self):
+        return np.dot(self.values, self.counts).item()
+
+    @property
+    def min(self):
+        return self.values[0] if self.values.size else np.nan
+
+    @property
+    def max(self):
+        return self.values[-1] if self.values.size else np.nan
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else np.nan
+
+    def quantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """
+        Calculates the quantiles exactly as Series.quantile does for the original values.
+
+        Parameters:
+        - quantiles (Sequence[float]): The quantiles, between 0 and 1.
+
+        Returns:
+        - np.ndarray: The quantiles, NaN for an empty histogram.
+        """
+        total = self.total
+        if total == 0:
+            return np.full(len(quantiles), np.nan)
+        previous_indexes, next_indexes, gamma = linear_positions(np.array([total]), quantiles)
+        cumulative_counts = np.cumsum(self.counts)
+        previous = self.values[np.searchsorted(cumulative_counts, previous_indexes[0], side="right")]
+        following = self.values[np.searchsorted(cumulative_counts, next_indexes[0], side="right")]
+        return lerp(previous.astype(np.float64), following.astype(np.float64), gamma[0])
+
+    def to_dict(self) -> Dict:
+        """
+        Converts the histogram to a JSON serializable dictionary.
+        """
+        return {"values": self.values.tolist(), "counts": self.counts.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "LatencyHistogram":
+        """
+        Creates a histogram from a dictionary written by to_dict.
+        """
+        return cls(data.get("values", []), data.get("counts", []))
+
+
+class BinnedLatencyHistogram:
+    """
+    Histogram of elapsed times counted in latency bins, with the exact number, sum,
+    minimum and maximum of the times.
+
+    Quantiles are interpolated between the middles of the bins like LatencyHistogram
+    does between values, so they are within LATENCY_RELATIVE_ERROR of the exact ones.
+    """
+
+    def __init__(self, bins=None, counts=None, total_sum=0, minimum=np.nan, maximum=np.nan):
+        """
+        Parameters:
+        - bins: The latency bins of the times in increasing order, see latency_bins.
+        - counts: The number of times in every bin.
+        - total_sum: The sum of the times.
+        - minimum: The shortest time.
+        - maximum: The longest time.
+        """
+        self.bins = np.asarray(bins if bins is not None else [], dtype=np.int64)
+        self.counts = np.asarray(counts if counts is not None else [], dtype=np.int64)
+        self.sum = total_sum
+        self.min = minimum
+        self.max = maximum
+
+    @classmethod
+    def merge_all(cls, histograms: Iterable["BinnedLatencyHistogram"]) -> "BinnedLatencyHistogram":
+        """
+        Merges histograms of disjoint samples into the histogram of all of them.
+        """
+        histograms = [histogram for histogram in histograms if histogram.total]
+        if not histograms:
+            return cls()
+        if len(histograms) == 1:
+            return histograms[0]
+        bins, inverse = np.unique(
+            np.concatenate([histogram.bins for histogram in histograms]), return_inverse=True
+        )
+        counts = np.bincount(
+            inverse, weights=np.concatenate([histogram.counts for histogram in histograms])
+        )
+        return cls(
+            bins,
+            counts.astype(np.int64),
+            sum(histogram.sum for histogram in histograms),
+            min(histogram.min for histogram in histograms),
+            max(histogram.max for histogram in histograms),
+        )
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else np.nan
+
+    def quantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """
+        Estimates the quantiles, clipped to the shortest and longest time.
+
+        Parameters:
+        - quantiles (Sequence[float]): The quantiles, between 0 and 1.
+
+        Returns:
+        - np.ndarray: The quantiles, NaN for an empty histogram.
+        """
+        estimates = LatencyHistogram(latency_bin_values(self.bins), self.counts).quantiles(quantiles)
+        return np.clip(estimates, self.min, self.max) if self.total else estimates
+
+
+class RangeHistograms:
+    """
+    Latency histograms and sample counts by label within the elementary time segments
+    between the boundaries of the test ranges.
+
+    A range (start, end) is the union of the segments between its boundaries, so the
+    statistics of every range, including the full test, are merged from the segments
+    instead of being recalculated from the rows.
+    """
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        label_codes: np.ndarray,
+        labels: Sequence,
+        elapsed: np.ndarray,
+        successes: np.ndarray,
+        failures: np.ndarray,
+        boundaries: Iterable[int],
+    ):
+        """
+        Parameters:
+        - timestamps (np.ndarray): The sample times in epoch nanoseconds.
+        - label_codes (np.ndarray): The label of every sample as a position in labels.
+        - labels (Sequence): The distinct labels.
+        - elapsed (np.ndarray): The elapsed time of every sample.
+        - successes (np.ndarray): Whether every sample succeeded.
+        - failures (np.ndarray): Whether every sample failed.
+        - boundaries (Iterable[int]): The start and end times of the ranges in epoch nanoseconds.
+        """
+        self.edges = np.unique(np.asarray(list(boundaries), dtype=np.int64))
+        self.label_codes = {label: code for code, label in enumerate(labels)}
+        n_labels = len(labels)
+        n_segments = 2 * len(self.edges) + 1
+        segments = time_segments(self.edges, timestamps)
+        groups = segments * n_labels + label_codes
+        n_groups = n_segments * n_labels
+
+        histograms = LatencyHistogram.from_groups(elapsed, groups, n_groups)
+        self.histograms = [histograms[i:i + n_labels] for i in range(0, n_groups, n_labels)]
+        self.samples = np.bincount(groups, minlength=n_groups).reshape(n_segments, n_labels)
+        self.successes = np.bincount(
+            groups, weights=successes, minlength=n_groups
+        ).astype(np.int64).reshape(n_segments, n_labels)
+        self.failures = np.bincount(
+            groups, weights=failures, minlength=n_groups
+        ).astype(np.int64).reshape(n_segments, n_labels)
+
+    def summarize(self, start_epoch: int, end_epoch: int, label=None):
+        """
+        Merges the statistics of the samples strictly between two range boundaries.
+
+        Parameters:
+        - start_epoch (int): The range start in epoch nanoseconds, one of the boundaries.
+        - end_epoch (int): The range end in epoch nanoseconds, one of the boundaries.
+        - label: The label to summarize, all labels if None.
+
+        Returns:
+        - Tuple[LatencyHistogram, int, int, int]: The histogram and the numbers of samples,
+          successes and failures.
+        """
+        segments = range_segments(self.edges, start_epoch, end_epoch)
+        if label is None:
+            labels = slice(None)
+        elif label in self.label_codes:
+            labels = slice(self.label_codes[label], self.label_codes[label] + 1)
+        else:
+            labels = slice(0)
+        histogram = LatencyHistogram.merge_all(
+            histogram
+            for segment_histograms in self.histograms[segments]
+            for histogram in segment_histograms[labels]
+        )
+        return (
+            histogram,
+            self.samples[segments, labels].sum(),
+            self.successes[segments, labels].sum(),
+            self.failures[segments, labels].sum(),
+        )
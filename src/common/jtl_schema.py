@@ -0,0 +1,232 @@
+import logging
+import pandas as pd
+from typing import Dict, List, Optional
+from pandas.core.frame import DataFrame
+from pandas.api.types import union_categoricals
+from src.common.compression import get_compression, open_jtl
+
+logger = logging.getLogger(__name__)
+
+# Compact types of the columns JMeter writes to CSV JTL files.
+# Low-cardinality strings become categoricals, timings fit into int32.
+JTL_COLUMN_TYPES: Dict[str, str] = {
+    "elapsed": "int32",
+    "label": "category",
+    "responseCode": "category",
+    "responseMessage": "category",
+    "threadName": "category",
+    "dataType": "category",
+    "success": "bool",
+    "failureMessage": "category",
+    "bytes": "int64",
+    "sentBytes": "int64",
+    "grpThreads": "int32",
+    "allThreads": "int32",
+    "URL": "category",
+    "Latency": "int32",
+    "IdleTime": "int32",
+    "Connect": "int32",
+}
+
+TIMESTAMP_COLUMN = "timeStamp"
+
+# Default missing value markers of pd.read_csv, reused by the pyarrow reader.
+NA_VALUES: List[str] = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND",
+    "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+TRUE_VALUES: List[str] = ["True", "TRUE", "true"]
+FALSE_VALUES: List[str] = ["False", "FALSE", "false"]
+# Size of the blocks pyarrow splits a CSV file into to parse them in parallel.
+ARROW_BLOCK_SIZE = 1 << 20
+
+# Columns used by s03_analysis_preparator and s04_results_analyzer.
+ANALYSIS_COLUMNS: List[str] = [
+    TIMESTAMP_COLUMN,
+    "elapsed",
+    "label",
+    "responseCode",
+    "threadName",
+    "success",
+    "Latency",
+    "Connect",
+]
+
+
+def read_jtl(source, columns: Optional[List[str]] = None, **read_csv_kwargs) -> DataFrame:
+    """
+    Reads a JTL file with the compact column types of JTL_COLUMN_TYPES.
+
+    If the values do not fit the compact types (e.g. empty timings), the file is read
+    with inferred types and then compacted where the values allow it.
+
+    Parameters:
+    - source: The path or binary buffer of the JTL file.
+    - columns (Optional[List[str]]): The columns to load, all columns if None.
+    - read_csv_kwargs: Additional arguments for pd.read_csv.
+
+    Returns:
+    - DataFrame: The JTL data.
+    """
+    usecols = None
+    if columns is not None:
+        selected_columns = set(columns) | {TIMESTAMP_COLUMN}
+        usecols = lambda column: column in selected_columns
+    try:
+        return pd.read_csv(source, dtype=JTL_COLUMN_TYPES, usecols=usecols, **read_csv_kwargs)
+    except ValueError as e:
+        logger.warning(f"Falling back to inferred column types: {e}")
+        if hasattr(source, "seek"):
+            source.seek(0)
+        data_frame = pd.read_csv(source, usecols=usecols, **read_csv_kwargs)
+        return apply_jtl_schema(data_frame)
+
+
+def read_jtl_arrow(
+    file_path, columns: Optional[List[str]] = None, newlines_in_values: bool = False
+) -> Optional[DataFrame]:
+    """
+    Reads a JTL file with pyarrow's multithreaded CSV reader into the same DataFrame
+    read_jtl(file_path, columns, on_bad_lines="skip") produces. Compressed files are
+    decompressed as a stream.
+
+    Rows with too many fields are skipped like with on_bad_lines="skip". pandas fills
+    rows with too few fields with missing values, which pyarrow can't do, so if such rows
+    are found None is returned and the caller has to use read_jtl instead.
+
+    Blocks are split at every line end so they can be parsed in parallel. If quoted values
+    spanning several lines (e.g. response messages) put the parser out of sync, the file is
+    read again with newlines_in_values, which splits blocks serially.
+
+    Parameters:
+    - file_path: The path of the JTL file.
+    - columns (Optional[List[str]]): The columns to load, all columns if None.
+    - newlines_in_values (bool): Allow quoted values spanning lines from the start.
+
+    Returns:
+    - Optional[DataFrame]: The JTL data, or None if the file has rows with missing fields.
+    """
+    import pyarrow as pa
+    from pyarrow import csv
+
+    header = pd.read_csv(file_path, nrows=0).columns
+    if columns is not None:
+        selected_columns = set(columns) | {TIMESTAMP_COLUMN}
+        header = [column for column in header if column in selected_columns]
+
+    short_rows = []
+
+    def skip_invalid_row(row):
+        if row.actual_columns < row.expected_columns:
+            short_rows.append(row.text)
+        return "skip"
+
+    # Categorical columns are read as strings and cast by apply_jtl_schema,
+    # which sorts categories the same way pd.read_csv does.
+    column_types = {
+        column: pa.string() if column_type == "category" else pa.from_numpy_dtype(column_type)
+        for column, column_type in JTL_COLUMN_TYPES.items()
+        if column in header
+    }
+    column_types[TIMESTAMP_COLUMN] = pa.int64()
+
+    def read_csv_source(source, types):
+        return csv.read_csv(
+            source,
+            read_options=csv.ReadOptions(use_threads=True, block_size=ARROW_BLOCK_SIZE),
+            parse_options=csv.ParseOptions(
+                newlines_in_values=newlines_in_values, invalid_row_handler=skip_invalid_row
+            ),
+            convert_options=csv.ConvertOptions(
+                column_types=types,
+                include_columns=list(header),
+                null_values=NA_VALUES,
+                true_values=TRUE_VALUES,
+                false_values=FALSE_VALUES,
+                strings_can_be_null=True,
+            ),
+        )
+
+    def read_source(types):
+        short_rows.clear()
+        if get_compression(file_path) is None:
+            return read_csv_source(file_path, types)
+        with open_jtl(file_path) as source:
+            return read_csv_source(source, types)
+
+    def read_table(types):
+        nonlocal newlines_in_values
+        try:
+            return read_source(types)
+        except pa.ArrowInvalid as e:
+            if newlines_in_values or "newlines_in_values" not in str(e):
+                raise
+            logger.info(f"{file_path} has values spanning lines, reading it with newlines_in_values")
+            newlines_in_values = True
+            return read_source(types)
+
+    try:
+        table = read_table(column_types)
+    except pa.ArrowInvalid:
+        # Timestamps written as date strings rather than epoch milliseconds
+        column_types[TIMESTAMP_COLUMN] = pa.string()
+        try:
+            table = read_table(column_types)
+        except pa.ArrowInvalid as e:
+            logger.warning(f"Falling back to inferred column types: {e}")
+            table = read_table({})
+    if short_rows:
+        logger.warning(f"{len(short_rows)} rows with missing fields in {file_path}")
+        return None
+
+    data_frame = table.to_pandas()
+    return apply_jtl_schema(data_frame)
+
+
+def apply_jtl_schema(data_frame: DataFrame) -> DataFrame:
+    """
+    Casts the known JTL columns of the DataFrame to their compact types where possible.
+    Numeric and boolean columns with missing values keep their inferred types.
+
+    Parameters:
+    - data_frame (DataFrame): The DataFrame to compact.
+
+    Returns:
+    - DataFrame: The compacted DataFrame.
+    """
+    for column, column_type in JTL_COLUMN_TYPES.items():
+        if column not in data_frame.columns or data_frame[column].dtype == column_type:
+            continue
+        if column_type != "category" and data_frame[column].isna().any():
+            continue
+        try:
+            data_frame[column] = data_frame[column].astype(column_type)
+        except (ValueError, TypeError) as e:
+            logger.debug(f"Keeping inferred type of column {column}: {e}")
+    return data_frame
+
+
+def concat_jtl(data_frames: List[DataFrame], **concat_kwargs) -> DataFrame:
+    """
+    Concatenates JTL DataFrames keeping categorical columns categorical.
+
+    pd.concat turns categoricals with different categories into object columns,
+    so the categories are unified before concatenation.
+
+    Parameters:
+    - data_frames (List[DataFrame]): The DataFrames to concatenate, modified in place.
+    - concat_kwargs: Additional arguments for pd.concat.
+
+    Returns:
+    - DataFrame: The concatenated DataFrame.
+    """
+    columns = {column for data_frame in data_frames for column in data_frame.columns}
+    for column in columns:
+        column_data = [data_frame[column] for data_frame in data_frames if column in data_frame]
+        if not all(isinstance(data.dtype, pd.CategoricalDtype) for data in column_data):
+            continue
+        categories = union_categoricals(column_data, sort_categories=True).categories
+        for data_frame in data_frames:
+            if column in data_frame:
+                data_frame[column] = data_frame[column].cat.set_categories(categories)
+    return pd.concat(data_frames, **concat_kwargs)
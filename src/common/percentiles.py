@@ -0,0 +1,124 @@
+import numpy as np
+from typing import Dict, Sequence
+
+# Elapsed time percentiles reported for every range and label by default.
+DEFAULT_PERCENTILES: Dict[str, float] = {
+    "p25": 0.25,
+    "p50": 0.50,
+    "p75": 0.75,
+    "p90": 0.90,
+    "p92": 0.92,
+    "p95": 0.95,
+    "p98": 0.98,
+    "p99": 0.99,
+}
+
+
+def parse_percentiles(value: str) -> Dict[str, float]:
+    """
+    Parses a comma separated list of percentiles, e.g. "50,90,99.9".
+
+    Returns:
+    - Dict[str, float]: The quantiles by percentile name, e.g. {"p99.9": 0.999}.
+
+    Raises:
+        ValueError: If a percentile is not a number between 0 and 100.
+    """
+    percentiles = {}
+    for item in value.split(","):
+        percentile = float(item)
+        if not 0 <= percentile <= 100:
+            raise ValueError(f"Percentile {item} is not between 0 and 100")
+        percentiles[f"p{percentile:g}"] = percentile / 100
+    if not percentiles:
+        raise ValueError("No percentiles given")
+    return percentiles
+
+
+def grouped_percentiles(
+    values: np.ndarray, group_codes: np.ndarray, n_groups: int, quantiles: Sequence[float]
+) -> np.ndarray:
+    """
+    Calculates several quantiles of every group sorting all values once.
+
+    The values are sorted by group and value together, so every group is a contiguous
+    sorted run and all quantiles of all groups are picked from it in one vectorized step.
+    The interpolation reproduces np.percentile's default "linear" method, which
+    Series.quantile uses, bit for bit.
+
+    Parameters:
+    - values (np.ndarray): The values, missing values are ignored.
+    - group_codes (np.ndarray): The group of every value, from 0 to n_groups - 1.
+      Values with negative codes, like the missing keys of groupby.ngroup, are ignored.
+    - n_groups (int): The number of groups.
+    - quantiles (Sequence[float]): The quantiles to calculate, between 0 and 1.
+
+    Returns:
+    - np.ndarray: The quantiles with shape (n_groups, len(quantiles)),
+      NaN for groups without values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    group_codes = np.asarray(group_codes, dtype=np.intp)
+    valid = ~np.isnan(values) & (group_codes >= 0)
+    if not valid.all():
+        values, group_codes = values[valid], group_codes[valid]
+
+    order = np.lexsort((values, group_codes))
+    sorted_values = values[order]
+    counts = np.bincount(group_codes, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+
+    previous_indexes, next_indexes, gamma = linear_positions(counts, quantiles)
+
+    if sorted_values.size == 0:
+        return np.full(gamma.shape, np.nan)
+    empty = counts == 0
+    offsets = np.where(empty, 0, starts)[:, np.newaxis]
+    result = lerp(
+        sorted_values[offsets + previous_indexes], sorted_values[offsets + next_indexes], gamma
+    )
+    result[empty] = np.nan
+    return result
+
+
+def linear_positions(counts: np.ndarray, quantiles: Sequence[float]):
+    """
+    Finds the sorted positions to interpolate every quantile between, with the same
+    floating point operations as np.percentile's default "linear" method.
+
+    Parameters:
+    - counts (np.ndarray): The number of values of every group.
+    - quantiles (Sequence[float]): The quantiles, between 0 and 1.
+
+    Returns:
+    - Tuple[np.ndarray, np.ndarray, np.ndarray]: The previous and next positions within
+      every group and the interpolation weights, with shape (len(counts), len(quantiles)).
+      Positions of groups without values are 0.
+    """
+    # Series.quantile passes percentages to np.percentile, which divides them by 100 again
+    q = (np.asarray(quantiles, dtype=np.float64) * 100.0 / 100)[np.newaxis, :]
+    n = np.asarray(counts, dtype=np.float64)[:, np.newaxis]
+    virtual_indexes = (n - 1) * q
+    previous_indexes = np.floor(virtual_indexes)
+    next_indexes = previous_indexes + 1
+    # Quantiles beyond the last value take the last value
+    above_bounds = virtual_indexes >= n - 1
+    last_indexes = np.broadcast_to(n - 1, virtual_indexes.shape)
+    previous_indexes[above_bounds] = last_indexes[above_bounds]
+    next_indexes[above_bounds] = last_indexes[above_bounds]
+    gamma = virtual_indexes - previous_indexes
+    return (
+        np.maximum(previous_indexes, 0).astype(np.intp),
+        np.maximum(next_indexes, 0).astype(np.intp),
+        gamma,
+    )
+
+
+def lerp(previous: np.ndarray, following: np.ndarray, gamma: np.ndarray) -> np.ndarray:
+    """
+    Interpolates linearly between two values the way numpy does for quantiles.
+    """
+    diff = following - previous
+    result = previous + diff * gamma
+    np.subtract(following, diff * (1 - gamma), out=result, where=gamma >= 0.5)
+    return result
@@ -0,0 +1,340 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from pandas.core.frame import DataFrame
+from src.common.histograms import BinnedLatencyHistogram
+from src.common.percentiles import DEFAULT_PERCENTILES
+from src.common.rollups import DEFAULT_BUCKET, SUM_PREFIX, Rollup, build_rollup
+
+logger = logging.getLogger(__name__)
+
+# Array of an index file holding the bucket, origin, number of buckets and labels as JSON.
+INDEX_METADATA_KEY = "metadata"
+
+
+class TimeWindowIndex:
+    """
+    Cumulative sample counts and latency histograms by label over the time buckets of
+    a rollup, answering statistics of arbitrary time windows without scanning rows.
+
+    The buckets with samples of every label (and of all labels together, the group of
+    label None) are stored in time order with the running numbers of samples, successes
+    and failures and the running sum of elapsed times, so those of a window are the
+    difference of two of them. The latency bins are stored sorted by bin and bucket with
+    their running counts, so the histogram of a window is read with one binary search
+    per bin, and the shortest and longest elapsed times come from segment trees.
+    A query therefore costs O(log n) whatever the length of the window.
+    Windows are resolved to buckets: a window holds the buckets starting within it.
+
+    All arrays are flat with the parts of every group delimited by offsets, so an index
+    is built once at ingest, saved with write_index and read again with read_index.
+
+    Attributes:
+        bucket (int): The length of the buckets in nanoseconds.
+        origin (int): The start of the first bucket in epoch nanoseconds.
+        n_buckets (int): The number of buckets from the first to the last one with samples.
+        groups (Dict): The position of every label in the offsets, None for all labels.
+        arrays (Dict[str, np.ndarray]): The flat arrays and their offsets by name.
+    """
+
+    def __init__(self, bucket: int, origin: int, n_buckets: int, labels: List, arrays: Dict[str, np.ndarray]):
+        """
+        Parameters:
+        - bucket (int): The length of the buckets in nanoseconds.
+        - origin (int): The start of the first bucket in epoch nanoseconds.
+        - n_buckets (int): The number of buckets from the first to the last one with samples.
+        - labels (List): The labels in the order of their groups after the group of all labels.
+        - arrays (Dict[str, np.ndarray]): The flat arrays and their offsets by name.
+        """
+        self.bucket = bucket
+        self.origin = origin
+        self.n_buckets = n_buckets
+        self.groups: Dict[object, int] = {None: 0}
+        self.groups.update((label, code + 1) for code, label in enumerate(labels))
+        self.arrays = arrays
+
+    @classmethod
+    def from_rollup(cls, rollup: Rollup) -> "TimeWindowIndex":
+        """
+        Builds the index of a rollup of src.common.rollups, e.g. from s00 or s02.
+        """
+        stats = rollup.stats
+        bucket = pd.Timedelta(rollup.bucket).value
+        bucket_starts = stats["bucket"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+        origin = int(bucket_starts.min()) if len(stats) else 0
+        n_buckets = int(bucket_starts.max() - origin) // bucket + 1 if len(stats) else 0
+        positions = (bucket_starts - origin) // bucket
+        row_values = {
+            "samples": stats["count"].to_numpy(),
+            "successes": stats["successes"].to_numpy(),
+            "failures": stats["failures"].to_numpy(),
+            "elapsed_sum": stats[SUM_PREFIX + "elapsed"].to_numpy(dtype=np.float64),
+            "elapsed_min": stats["elapsed_min"].to_numpy(dtype=np.float64),
+            "elapsed_max": stats["elapsed_max"].to_numpy(dtype=np.float64),
+        }
+        entry_rows = rollup.latency["row"].to_numpy()
+        entry_bins = rollup.latency["latency_bin"].to_numpy()
+        entry_counts = rollup.latency["count"].to_numpy()
+
+        label_codes, labels = pd.factorize(stats["label"])
+        # Rows and latency entries of the labels, missing labels only count for all labels
+        row_order = np.argsort(label_codes, kind="stable")
+        row_bounds = np.searchsorted(label_codes[row_order], np.arange(len(labels) + 1))
+        entry_codes = label_codes[entry_rows]
+        entry_order = np.argsort(entry_codes, kind="stable")
+        entry_bounds = np.searchsorted(entry_codes[entry_order], np.arange(len(labels) + 1))
+        group_rows = [np.arange(len(stats))] + [
+            row_order[start:end] for start, end in zip(row_bounds[:-1], row_bounds[1:])
+        ]
+        group_entries = [np.arange(len(entry_rows))] + [
+            entry_order[start:end] for start, end in zip(entry_bounds[:-1], entry_bounds[1:])
+        ]
+        parts: Dict[str, List[np.ndarray]] = {}
+        for rows, entries in zip(group_rows, group_entries):
+            _add_group(
+                parts,
+                n_buckets,
+                positions[rows],
+                {name: values[rows] for name, values in row_values.items()},
+                positions[entry_rows[entries]],
+                entry_bins[entries],
+                entry_counts[entries],
+            )
+        arrays = {name: np.concatenate(arrays) for name, arrays in parts.items()}
+        return cls(bucket, origin, n_buckets, list(labels), arrays)
+
+    @classmethod
+    def from_data_frame(cls, data_frame: DataFrame, bucket: str = DEFAULT_BUCKET) -> "TimeWindowIndex":
+        """
+        Builds the index of samples indexed by time.
+        """
+        return cls.from_rollup(build_rollup(data_frame, bucket))
+
+    @property
+    def start(self) -> pd.Timestamp:
+        """
+        The start of the first bucket.
+        """
+        return pd.Timestamp(self.origin)
+
+    @property
+    def labels(self):
+        return [label for label in self.groups if label is not None]
+
+    def _part(self, name: str, group: int) -> np.ndarray:
+        offsets = self.arrays[name + "_offsets"]
+        return self.arrays[name][offsets[group]:offsets[group + 1]]
+
+    def bucket_range(self, start, end) -> Tuple[int, int]:
+        """
+        Returns the first and the last but one bucket starting within a window.
+
+        Parameters:
+        - start: The window start as a timestamp or epoch nanoseconds.
+        - end: The window end as a timestamp or epoch nanoseconds, excluded.
+        """
+        first = -((self.origin - pd.Timestamp(start).value) // self.bucket)
+        last = -((self.origin - pd.Timestamp(end).value) // self.bucket)
+        first = min(max(first, 0), self.n_buckets)
+        return first, min(max(last, first), self.n_buckets)
+
+    def summarize(self, start, end, label=None):
+        """
+        Returns the statistics of the samples of a window.
+
+        Parameters:
+        - start: The window start as a timestamp or epoch nanoseconds.
+        - end: The window end as a timestamp or epoch nanoseconds, excluded.
+        - label: The label to summarize, all labels if None.
+
+        Returns:
+        - Tuple[BinnedLatencyHistogram, int, int, int]: The histogram and the numbers of
+          samples, successes and failures, like RangeHistograms.summarize.
+        """
+        group = self.groups.get(label)
+        if group is None:
+            return BinnedLatencyHistogram(), 0, 0, 0
+        first, last = self.bucket_range(start, end)
+        lower, upper = np.searchsorted(self._part("positions", group), [first, last])
+        cumulative_counts = self._part("cumulative_counts", group)
+        cumulative_elapsed = self._part("cumulative_elapsed", group)
+        samples, successes, failures = (cumulative_counts[upper] - cumulative_counts[lower]).tolist()
+
+        bins = self._part("bins", group)
+        bin_keys = bins * max(self.n_buckets, 1)
+        bounds = np.searchsorted(self._part("keys", group), np.concatenate((bin_keys + first, bin_keys + last)))
+        running_counts = self._part("running_counts", group)
+        bin_counts = running_counts[bounds[len(bins):]] - running_counts[bounds[:len(bins)]]
+        present = bin_counts > 0
+        minimum = _tree_query(self._part("minimum_tree", group), lower, upper, np.fmin, np.inf)
+        maximum = _tree_query(self._part("maximum_tree", group), lower, upper, np.fmax, -np.inf)
+        histogram = BinnedLatencyHistogram(
+            bins[present],
+            bin_counts[present],
+            cumulative_elapsed[upper] - cumulative_elapsed[lower],
+            minimum if np.isfinite(minimum) else np.nan,
+            maximum if np.isfinite(maximum) else np.nan,
+        )
+        return histogram, samples, successes, failures
+
+    def query(
+        self, start, end, label=None, percentiles: Dict[str, float] = DEFAULT_PERCENTILES
+    ) -> Optional[Dict]:
+        """
+        Returns the statistics of a window with the names s04_results_analyzer uses,
+        without rounding. See query_indexes.
+        """
+        return query_indexes([self], start, end, label, percentiles)
+
+
+def query_indexes(
+    indexes: Sequence[TimeWindowIndex],
+    start,
+    end,
+    label=None,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+) -> Optional[Dict]:
+    """
+    Returns the statistics of a window of the samples of several indexes, e.g. of the
+    load generators, with the names s04_results_analyzer uses, without rounding.
+
+    Parameters:
+    - indexes (Sequence[TimeWindowIndex]): Indexes of disjoint samples with the same bucket length.
+    - start: The window start as a timestamp or epoch nanoseconds.
+    - end: The window end as a timestamp or epoch nanoseconds, excluded.
+    - label: The label to summarize, all labels if None.
+    - percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+
+    Returns:
+    - Optional[Dict]: The statistics, None if the window has no samples.
+    """
+    summaries = [index.summarize(start, end, label) for index in indexes]
+    histogram = BinnedLatencyHistogram.merge_all(summary[0] for summary in summaries)
+    samples, successes, failures = (sum(summary[column] for summary in summaries) for column in (1, 2, 3))
+    if samples == 0:
+        return None
+    statistics = {
+        "sampler_count": int(samples),
+        "success": int(successes),
+        "failures": int(failures),
+        "avg-min": histogram.min,
+        "avg-max": histogram.max,
+        "avg-rt": histogram.mean,
+    }
+    statistics.update(zip(percentiles, histogram.quantiles(list(percentiles.values())).tolist()))
+    statistics["error_percent"] = failures / samples * 100
+    statistics["success_percent"] = successes / samples * 100
+    return statistics
+
+
+def write_index(index: TimeWindowIndex, output_path: Path) -> None:
+    """
+    Writes an index to a NumPy .npz file, its arrays as they are and its bucket, origin,
+    number of buckets and labels as JSON, so reading it back costs no computation.
+    """
+    metadata = {
+        "bucket": index.bucket,
+        "origin": index.origin,
+        "n_buckets": index.n_buckets,
+        "labels": index.labels,
+    }
+    with open(output_path, "wb") as index_file:
+        np.savez(index_file, **index.arrays, **{INDEX_METADATA_KEY: np.array(json.dumps(metadata))})
+
+
+def read_index(index_path: Path) -> TimeWindowIndex:
+    """
+    Reads an index written by write_index.
+
+    Raises:
+        ValueError: If the file has no index metadata, e.g. it is not an index.
+    """
+    with np.load(index_path, allow_pickle=False) as index_file:
+        if INDEX_METADATA_KEY not in index_file.files:
+            raise ValueError(f"{index_path} is not an index file, it has no {INDEX_METADATA_KEY}")
+        metadata = json.loads(index_file[INDEX_METADATA_KEY].item())
+        arrays = {name: index_file[name] for name in index_file.files if name != INDEX_METADATA_KEY}
+    index = TimeWindowIndex(metadata["bucket"], metadata["origin"], metadata["n_buckets"], metadata["labels"], arrays)
+    logger.info(f"Read the index of {index.n_buckets} buckets of {len(index.labels)} labels from {index_path}")
+    return index
+
+
+def _add_group(parts, n_buckets, positions, row_values, entry_positions, entry_bins, entry_counts) -> None:
+    """
+    Appends the arrays of a group, aggregating its rows by bucket and its latency
+    entries by bin and bucket.
+    """
+    bucket_positions, bucket_codes = np.unique(positions, return_inverse=True)
+    n = len(bucket_positions)
+
+    def bucket_sums(values):
+        return np.bincount(bucket_codes, weights=values, minlength=n)
+
+    cumulative_counts = np.zeros((n + 1, 3), dtype=np.int64)
+    for column, name in enumerate(("samples", "successes", "failures")):
+        cumulative_counts[1:, column] = np.cumsum(bucket_sums(row_values[name]).astype(np.int64))
+    cumulative_elapsed = np.concatenate(([0.0], np.cumsum(bucket_sums(row_values["elapsed_sum"]))))
+    minimums = np.full(n, np.inf)
+    np.fmin.at(minimums, bucket_codes, row_values["elapsed_min"])
+    maximums = np.full(n, -np.inf)
+    np.fmax.at(maximums, bucket_codes, row_values["elapsed_max"])
+
+    entry_keys = entry_bins.astype(np.int64) * max(n_buckets, 1) + entry_positions
+    keys, key_codes = np.unique(entry_keys, return_inverse=True)
+    key_counts = np.bincount(key_codes, weights=entry_counts, minlength=len(keys)).astype(np.int64)
+
+    _append_part(parts, "positions", bucket_positions)
+    _append_part(parts, "cumulative_counts", cumulative_counts)
+    _append_part(parts, "cumulative_elapsed", cumulative_elapsed)
+    _append_part(parts, "minimum_tree", _segment_tree(minimums, np.fmin, np.inf))
+    _append_part(parts, "maximum_tree", _segment_tree(maximums, np.fmax, -np.inf))
+    _append_part(parts, "bins", np.unique(entry_bins).astype(np.int64))
+    _append_part(parts, "keys", keys)
+    _append_part(parts, "running_counts", np.concatenate(([0], np.cumsum(key_counts))))
+
+
+def _append_part(parts: Dict[str, List[np.ndarray]], name: str, values: np.ndarray) -> None:
+    """
+    Appends the part of a group to a flat array and its end to the offsets of the array.
+    """
+    if name not in parts:
+        parts[name] = []
+        parts[name + "_offsets"] = [np.zeros(1, dtype=np.int64)]
+    parts[name].append(values)
+    parts[name + "_offsets"].append(parts[name + "_offsets"][-1][-1:] + len(values))
+
+
+def _segment_tree(values: np.ndarray, combine, identity: float) -> np.ndarray:
+    """
+    Builds a segment tree over the values: the leaves are at positions size to 2 * size
+    and every other node combines its two children.
+    """
+    size = 1 << max(len(values) - 1, 0).bit_length()
+    tree = np.full(2 * size, identity)
+    tree[size:size + len(values)] = values
+    level = size
+    while level > 1:
+        tree[level // 2:level] = combine(tree[level:2 * level:2], tree[level + 1:2 * level:2])
+        level //= 2
+    return tree
+
+
+def _tree_query(tree: np.ndarray, lower: int, upper: int, combine, identity: float) -> float:
+    """
+    Combines the values from lower to upper, excluded, of a segment tree.
+    """
+    size = len(tree) // 2
+    result = identity
+    lower, upper = lower + size, upper + size
+    while lower < upper:
+        if lower & 1:
+            result = combine(result, tree[lower])
+            lower += 1
+        if upper & 1:
+            upper -= 1
+            result = combine(result, tree[upper])
+        lower, upper = lower // 2, upper // 2
+    return float(result)
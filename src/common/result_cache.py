@@ -0,0 +1,120 @@
+import os
+import json
+import hashlib
+import logging
+from pathlib import Path
+from src.common.range_models import GBEncoder
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Eviction removes the least recently used entries until the cache is this full,
+# so that it doesn't run on every write once the cache is at its limit.
+EVICTION_RATIO = 0.8
+# Part of every key: changing how results are calculated must invalidate old entries.
+CACHE_FORMAT_VERSION = 1
+READ_BUFFER_SIZE = 1024 * 1024
+
+# Default of ResultCache.get, None being a valid cached result.
+MISSING = object()
+
+
+def file_digest(file_path: Path) -> str:
+    """
+    Returns the BLAKE2b digest of a file's content, read in chunks.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(READ_BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of JSON serializable analysis results, one file per entry.
+
+    Keys are derived from a data key, e.g. the digest of the analyzed file, and the
+    parameters of the result, so entries of another version of the data are never hit
+    and are evicted eventually. When the cache grows beyond its size limit the least
+    recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir: Path, data_key: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Parameters:
+        - cache_dir (Path): The directory of the cache entries, created if missing.
+        - data_key (str): The identity of the analyzed data.
+        - max_bytes (int): The size limit of the cache.
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.data_key = data_key
+        self.max_bytes = max_bytes
+        self.size = sum(entry.stat().st_size for entry in self._entries())
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, *parts) -> str:
+        """
+        Returns the key of a result from JSON serializable parameters.
+        """
+        key_data = json.dumps([CACHE_FORMAT_VERSION, self.data_key, *parts], cls=GBEncoder)
+        return hashlib.blake2b(key_data.encode(), digest_size=20).hexdigest()
+
+    def get(self, key: str, default=MISSING):
+        """
+        Returns a cached result, or the default if there is none.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "r") as file:
+                value = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.misses += 1
+            return default
+        # The modification time orders the entries for eviction
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value) -> None:
+        """
+        Stores a result, evicting the least recently used entries if the cache is full.
+        """
+        path = self._path(key)
+        temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(temporary_path, "w") as file:
+            json.dump(value, file, cls=GBEncoder)
+        previous_size = path.stat().st_size if path.exists() else 0
+        os.replace(temporary_path, path)
+        self.size += path.stat().st_size - previous_size
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes the least recently used entries until the cache is below its size limit.
+        """
+        entries = sorted(
+            ((entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in self._entries()),
+        )
+        size = sum(entry_size for _, entry_size, _ in entries)
+        removed = 0
+        for _, entry_size, entry_path in entries:
+            if size <= self.max_bytes * EVICTION_RATIO:
+                break
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+            removed += 1
+        self.size = size
+        logger.info(f"Evicted {removed} cached results, {size} bytes left")
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _entries(self):
+        return (entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json"))
@@ -0,0 +1,259 @@
+import os
+import json
+import logging
+import numpy as np
+from enum import Enum
+from pathlib import Path
+from datetime import datetime
+from dataclasses import asdict, is_dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+INDENT = 4
+COMPACT_SEPARATORS = (",", ":")
+# Sections of the results file up to this depth, e.g. ("descriptive_analysis", "impact"),
+# have their byte offsets recorded in the section index.
+SECTION_DEPTH = 2
+SECTION_INDEX_SUFFIX = ".index"
+# Section indexes of other versions are outdated, version 1 joined the keys with dots.
+SECTION_INDEX_VERSION = 2
+
+_converters: Dict[type, Callable] = {}
+
+
+def _serialize_datetime(value: datetime) -> Dict:
+    return {
+        "year": value.year,
+        "month": value.month,
+        "day": value.day,
+        "hour": value.hour,
+        "minute": value.minute,
+        "second": value.second,
+        "isoformat": value.isoformat(),
+    }
+
+
+def _find_converter(value_type: type) -> Optional[Callable]:
+    """
+    Finds how GBEncoder serializes values of a type, plus numpy scalars and arrays.
+    """
+    if hasattr(value_type, "to_dict"):
+        return lambda value: value.to_dict()
+    if issubclass(value_type, datetime):
+        return _serialize_datetime
+    if issubclass(value_type, Enum):
+        return lambda value: value.value
+    if is_dataclass(value_type):
+        return asdict
+    if issubclass(value_type, (np.generic, np.ndarray)):
+        return lambda value: value.tolist()
+    return None
+
+
+def serialize_default(value):
+    """
+    The default function of json.dump for results: serializes what GBEncoder does, and
+    numpy scalars and arrays, looking the conversion up by type once per type.
+
+    Raises:
+        TypeError: If the value can't be serialized.
+    """
+    value_type = type(value)
+    if value_type not in _converters:
+        _converters[value_type] = _find_converter(value_type)
+    converter = _converters[value_type]
+    if converter is None:
+        raise TypeError(f"Object of type {value_type.__name__} is not JSON serializable")
+    return converter(value)
+
+
+def _encode(value, compact: bool) -> str:
+    if compact:
+        # Without indentation json uses its C encoder
+        return json.dumps(value, default=serialize_default, separators=COMPACT_SEPARATORS)
+    return json.dumps(value, default=serialize_default, indent=INDENT)
+
+
+def _encode_sections(
+    value, compact: bool, path: List[str], pieces: List[str], offsets: List[List], position: int
+) -> int:
+    """
+    Appends the JSON text of a value to pieces, laid out exactly like json.dump does,
+    recording the offsets of the sections up to SECTION_DEPTH. Returns the end offset.
+    """
+    depth = len(path)
+    if not isinstance(value, (dict, list, tuple, str, int, float, bool, type(None))):
+        value = serialize_default(value)
+    if not isinstance(value, dict) or not value or depth == SECTION_DEPTH:
+        text = _encode(value, compact)
+        if not compact and depth:
+            text = text.replace("\n", "\n" + " " * (INDENT * depth))
+        pieces.append(text)
+        return position + len(text)
+
+    item_indent = "" if compact else "\n" + " " * (INDENT * (depth + 1))
+    key_separator = ":" if compact else ": "
+    pieces.append("{")
+    position += 1
+    for item_number, (key, item) in enumerate(value.items()):
+        key = _key_text(key)
+        prefix = ("," if item_number else "") + item_indent + json.dumps(key) + key_separator
+        pieces.append(prefix)
+        start = position + len(prefix)
+        position = _encode_sections(item, compact, path + [key], pieces, offsets, start)
+        offsets.append([path + [key], start, position])
+    closing = "}" if compact else "\n" + " " * (INDENT * depth) + "}"
+    pieces.append(closing)
+    return position + len(closing)
+
+
+def _key_text(key) -> str:
+    """
+    Converts a dictionary key to a string like json does.
+
+    Raises:
+        TypeError: If the key can't be converted.
+    """
+    if isinstance(key, str):
+        return key
+    if key is True or key is False or key is None or isinstance(key, (int, float)):
+        return json.dumps(key)
+    raise TypeError(f"Keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+
+def dump_results(data: Dict, results_path: Path, compact: bool = False) -> None:
+    """
+    Writes a results file the way json.dump(data, file, indent=4, cls=GBEncoder) does,
+    or compactly with json's C encoder, and indexes its sections.
+
+    The section index, stored next to the results file, holds the keys and byte offsets
+    of the sections up to SECTION_DEPTH so load_results_sections can parse only those
+    it reads.
+    Both files are replaced atomically.
+
+    Parameters:
+    - data (Dict): The results.
+    - results_path (Path): The results file.
+    - compact (bool): Write without indentation and spaces, which is several times faster.
+    """
+    results_path = Path(results_path)
+    pieces: List[str] = []
+    offsets: List[List] = []
+    _encode_sections(data, compact, [], pieces, offsets, 0)
+    # The text is ASCII, json escapes other characters, so offsets are byte offsets
+    _replace_file(results_path, "".join(pieces))
+    stat = results_path.stat()
+    section_index = {
+        "version": SECTION_INDEX_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sections": offsets,
+    }
+    _replace_file(get_section_index_path(results_path), json.dumps(section_index, separators=COMPACT_SEPARATORS))
+
+
+def _replace_file(path: Path, text: str) -> None:
+    temporary_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(temporary_path, "w") as file:
+        file.write(text)
+    os.replace(temporary_path, path)
+
+
+def get_section_index_path(results_path: Path) -> Path:
+    return Path(results_path).with_name(Path(results_path).name + SECTION_INDEX_SUFFIX)
+
+
+def _read_section_index(results_path: Path) -> Optional[Dict]:
+    """
+    Returns the section index of a results file, None if it is missing or outdated.
+    """
+    try:
+        with open(get_section_index_path(results_path), "r") as file:
+            section_index = json.load(file)
+        stat = Path(results_path).stat()
+    except (OSError, ValueError):
+        return None
+    if (section_index.get("version"), section_index.get("size"), section_index.get("mtime_ns")) != (
+        SECTION_INDEX_VERSION,
+        stat.st_size,
+        stat.st_mtime_ns,
+    ):
+        logger.debug(f"Section index of {results_path} is outdated")
+        return None
+    return section_index
+
+
+def load_results(results_path: Path) -> Dict:
+    """
+    Reads a whole results file.
+    """
+    with open(results_path, "r") as file:
+        return json.load(file)
+
+
+def load_results_section(results_path: Path, keys: Union[str, Sequence[str]], default=None):
+    """
+    Reads one section of a results file, e.g. ("descriptive_analysis", "impact").
+    See load_results_sections.
+
+    Parameters:
+    - results_path (Path): The results file.
+    - keys (Union[str, Sequence[str]]): The keys of the section, or a top level key.
+    - default: The value returned if the section doesn't exist.
+
+    Returns:
+    - The section.
+    """
+    return load_results_sections(results_path, [keys], default)[0]
+
+
+def load_results_sections(results_path: Path, sections: Sequence[Union[str, Sequence[str]]], default=None) -> List:
+    """
+    Reads several sections of a results file at once, each given by its keys, so keys
+    may contain dots, e.g. labels like "GET /api/v1.2".
+
+    With an up to date section index only the bytes of the deepest indexed sections
+    containing them are parsed, each once, otherwise the whole file is, once.
+
+    Parameters:
+    - results_path (Path): The results file.
+    - sections (Sequence[Union[str, Sequence[str]]]): The keys of every section, or a top level key.
+    - default: The value returned for sections that don't exist.
+
+    Returns:
+    - List: The sections in the given order.
+    """
+    sections = [[keys] if isinstance(keys, str) else list(keys) for keys in sections]
+    section_index = _read_section_index(results_path)
+    if section_index is None:
+        data = load_results(results_path)
+        return [_get_section(data, keys, default) for keys in sections]
+
+    bounds_by_keys: Dict[Tuple[str, ...], Tuple[int, int]] = {
+        tuple(keys): (start, end) for keys, start, end in section_index["sections"]
+    }
+    results = []
+    parsed: Dict[Tuple[int, int], object] = {}
+    with open(results_path, "rb") as file:
+        for keys in sections:
+            for depth in range(min(len(keys), SECTION_DEPTH), 0, -1):
+                bounds = bounds_by_keys.get(tuple(keys[:depth]))
+                if bounds is not None:
+                    if bounds not in parsed:
+                        file.seek(bounds[0])
+                        parsed[bounds] = json.loads(file.read(bounds[1] - bounds[0]))
+                    results.append(_get_section(parsed[bounds], keys[depth:], default))
+                    break
+            else:
+                # Indexed files have all sections up to SECTION_DEPTH, so the section is missing
+                results.append(default)
+    return results
+
+
+def _get_section(data, keys: List[str], default):
+    for key in keys:
+        if not isinstance(data, dict) or key not in data:
+            return default
+        data = data[key]
+    return data
@@ -0,0 +1,332 @@
+import json
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Sequence
+from pandas.core.frame import DataFrame
+from src.common.histograms import BinnedLatencyHistogram, latency_bins
+from src.common.jtl_schema import concat_jtl
+
+logger = logging.getLogger(__name__)
+
+# Rows of a rollup are the samples of one label within one time bucket.
+ROLLUP_KEYS: List[str] = ["label", "bucket"]
+SUM_PREFIX = "sum_"
+DEFAULT_BUCKET = "1s"
+BUCKET_METADATA_KEY = b"rollup_bucket"
+# List columns of a rollup file holding the latency bins and counts of every row.
+LATENCY_BINS_COLUMN = "latency_bins"
+LATENCY_COUNTS_COLUMN = "latency_counts"
+# How the statistics of rows are merged, the other columns are summed.
+MERGE_AGGREGATIONS: Dict[str, str] = {
+    "ts_min": "min",
+    "ts_max": "max",
+    "elapsed_min": "min",
+    "elapsed_max": "max",
+}
+
+
+class Rollup:
+    """
+    Samples aggregated by label and time bucket.
+
+    Every label and bucket with samples has one row of statistics: the number of samples,
+    successes and failures, the first and last sample time, the shortest and longest
+    elapsed time and the sums of the numeric columns. Its latency histogram is counted in
+    the log-linear bins of src.common.histograms.latency_bins, of which there are a few
+    hundred at most, so the size of a rollup depends on the number of labels and buckets
+    rather than on the number of samples.
+
+    Attributes:
+        stats (DataFrame): The statistics, one row per ROLLUP_KEYS, sorted by them.
+        latency (DataFrame): The "row" of stats, the "latency_bin" and the "count" of
+            every non-empty latency bin of every row, sorted by row and bin.
+        bucket (str): The length of the time buckets, e.g. "1s".
+    """
+
+    def __init__(self, stats: DataFrame, latency: DataFrame, bucket: str = DEFAULT_BUCKET):
+        self.stats = stats
+        self.latency = latency
+        self.bucket = bucket
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+    def take(self, rows) -> "Rollup":
+        """
+        Returns the rollup of some rows, given as a boolean mask or as increasing positions.
+        """
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.intp)
+        new_rows = np.full(len(self.stats), -1, dtype=np.intp)
+        new_rows[rows] = np.arange(len(rows))
+        entry_rows = new_rows[self.latency["row"].to_numpy()]
+        kept = entry_rows >= 0
+        latency = pd.DataFrame(
+            {
+                "row": entry_rows[kept],
+                "latency_bin": self.latency["latency_bin"].to_numpy()[kept],
+                "count": self.latency["count"].to_numpy()[kept],
+            }
+        )
+        return Rollup(self.stats.iloc[rows].reset_index(drop=True), latency, self.bucket)
+
+    def split_by_label(self) -> Dict[object, "Rollup"]:
+        """
+        Returns the rollups of every label, in the order of the labels in stats.
+        """
+        label_codes, labels = pd.factorize(self.stats["label"], use_na_sentinel=False)
+        order = np.argsort(label_codes, kind="stable")
+        bounds = np.searchsorted(label_codes[order], np.arange(len(labels) + 1))
+        new_rows = np.empty(len(order), dtype=np.intp)
+        new_rows[order] = np.arange(len(order))
+        entry_rows = new_rows[self.latency["row"].to_numpy()]
+        # Rows keep their order within a label, so entries stay sorted by bin within a row
+        entry_order = np.argsort(entry_rows, kind="stable")
+        entry_rows = entry_rows[entry_order]
+        entry_bins = self.latency["latency_bin"].to_numpy()[entry_order]
+        entry_counts = self.latency["count"].to_numpy()[entry_order]
+        entry_bounds = np.searchsorted(entry_rows, bounds)
+        stats = self.stats.iloc[order].reset_index(drop=True)
+
+        label_rollups = {}
+        for code, label in enumerate(labels):
+            start, end = bounds[code], bounds[code + 1]
+            entries = slice(entry_bounds[code], entry_bounds[code + 1])
+            latency = pd.DataFrame(
+                {
+                    "row": entry_rows[entries] - start,
+                    "latency_bin": entry_bins[entries],
+                    "count": entry_counts[entries],
+                }
+            )
+            label_rollups[label] = Rollup(stats.iloc[start:end].reset_index(drop=True), latency, self.bucket)
+        return label_rollups
+
+
+def count_latency_bins(rows: np.ndarray, elapsed: np.ndarray, counts=None) -> DataFrame:
+    """
+    Counts elapsed times, or the latency bins of elapsed times, by rollup row and latency bin.
+
+    Parameters:
+    - rows (np.ndarray): The rollup row of every elapsed time.
+    - elapsed (np.ndarray): The elapsed times, missing times are ignored.
+    - counts: The number of times of every entry, 1 if None.
+
+    Returns:
+    - DataFrame: The latency entries of Rollup.latency.
+    """
+    elapsed = np.asarray(elapsed)
+    timed = ~pd.isna(elapsed)
+    entries = pd.DataFrame(
+        {
+            "row": rows[timed],
+            "latency_bin": latency_bins(elapsed[timed]),
+            "count": np.ones(timed.sum(), dtype=np.int64) if counts is None else np.asarray(counts)[timed],
+        }
+    )
+    return entries.groupby(["row", "latency_bin"], sort=True)["count"].sum().reset_index()
+
+
+def build_rollup(data_frame: DataFrame, bucket: str = DEFAULT_BUCKET) -> Rollup:
+    """
+    Aggregates samples indexed by time into a rollup by label and time bucket.
+
+    Parameters:
+    - data_frame (DataFrame): The samples indexed by time.
+    - bucket (str): The length of the time buckets, e.g. "1s".
+
+    Returns:
+    - Rollup: The rollup of the samples.
+    """
+    bucket_ns = pd.Timedelta(bucket).value
+    timestamps = data_frame.index.asi8
+    # Samples without a success flag are counted neither as successes nor as failures
+    success = data_frame.get("success", pd.Series(np.nan, index=data_frame.index))
+    sum_columns = (
+        data_frame.drop(columns=["responseCode"], errors="ignore")
+        .select_dtypes(include=["number", "bool"])
+        .columns
+    )
+    elapsed = data_frame["elapsed"].to_numpy()
+    rollup_input = pd.DataFrame(
+        {
+            "label": data_frame["label"].to_numpy(),
+            "bucket": timestamps - timestamps % bucket_ns,
+            "successes": success.eq(True).to_numpy(),
+            "failures": success.eq(False).to_numpy(),
+            "timestamp": timestamps,
+            "elapsed": elapsed,
+        }
+    )
+    aggregations = {
+        "count": ("timestamp", "size"),
+        "successes": ("successes", "sum"),
+        "failures": ("failures", "sum"),
+        "ts_min": ("timestamp", "min"),
+        "ts_max": ("timestamp", "max"),
+        "elapsed_min": ("elapsed", "min"),
+        "elapsed_max": ("elapsed", "max"),
+    }
+    for column in sum_columns:
+        rollup_input[SUM_PREFIX + column] = data_frame[column].to_numpy()
+        aggregations[SUM_PREFIX + column] = (SUM_PREFIX + column, "sum")
+    grouped = rollup_input.groupby(ROLLUP_KEYS, observed=True, dropna=False, sort=True)
+    stats = grouped.agg(**aggregations).reset_index()
+    stats["bucket"] = pd.to_datetime(stats["bucket"])
+    latency = count_latency_bins(grouped.ngroup().to_numpy(), elapsed)
+    return Rollup(stats, latency, bucket)
+
+
+def merge_rollups(rollups: Sequence[Rollup]) -> Rollup:
+    """
+    Merges rollups of disjoint samples, e.g. of several load generators.
+
+    Raises:
+        ValueError: If the rollups have different bucket lengths.
+    """
+    buckets = {rollup.bucket for rollup in rollups}
+    if len(buckets) > 1:
+        raise ValueError(f"Can't merge rollups with different buckets: {sorted(buckets)}")
+    combined = concat_jtl([rollup.stats.copy() for rollup in rollups], ignore_index=True)
+    aggregations = {
+        column: MERGE_AGGREGATIONS.get(column, "sum")
+        for column in combined.columns
+        if column not in ROLLUP_KEYS
+    }
+    grouped = combined.groupby(ROLLUP_KEYS, observed=True, dropna=False, sort=True)
+    stats = grouped.agg(aggregations).reset_index()
+
+    merged_rows = grouped.ngroup().to_numpy()
+    row_offsets = np.cumsum([0] + [len(rollup) for rollup in rollups])
+    entries = [
+        (merged_rows[offset + rollup.latency["row"].to_numpy()], rollup.latency)
+        for offset, rollup in zip(row_offsets, rollups)
+    ]
+    latency = (
+        pd.DataFrame(
+            {
+                "row": np.concatenate([rows for rows, _ in entries]) if entries else [],
+                "latency_bin": np.concatenate([entry["latency_bin"].to_numpy() for _, entry in entries]) if entries else [],
+                "count": np.concatenate([entry["count"].to_numpy() for _, entry in entries]) if entries else [],
+            }
+        )
+        .groupby(["row", "latency_bin"], sort=True)["count"]
+        .sum()
+        .reset_index()
+    )
+    return Rollup(stats, latency, buckets.pop() if buckets else DEFAULT_BUCKET)
+
+
+def write_rollup(rollup: Rollup, output_path: Path) -> None:
+    """
+    Writes a rollup to a Feather file, the latency bins and counts of every row as list
+    columns and its bucket length in the file metadata. Bins fit into 16 bits for elapsed
+    times up to 2 ** 31. Rollups are compressed with zstd, which is about half the size of
+    the default lz4 on their mostly small sums and counts.
+    """
+    import pyarrow as pa
+    from pyarrow import feather
+
+    table = pa.Table.from_pandas(rollup.stats, preserve_index=False)
+    offsets = pa.array(
+        np.searchsorted(rollup.latency["row"].to_numpy(), np.arange(len(rollup) + 1)).astype(np.int32)
+    )
+    table = table.append_column(
+        LATENCY_BINS_COLUMN,
+        pa.ListArray.from_arrays(offsets, pa.array(rollup.latency["latency_bin"].to_numpy(), pa.int16())),
+    )
+    table = table.append_column(
+        LATENCY_COUNTS_COLUMN,
+        pa.ListArray.from_arrays(offsets, pa.array(rollup.latency["count"].to_numpy(), pa.int32())),
+    )
+    metadata = dict(table.schema.metadata or {})
+    metadata[BUCKET_METADATA_KEY] = json.dumps(rollup.bucket).encode()
+    feather.write_feather(table.replace_schema_metadata(metadata), str(output_path), compression="zstd")
+
+
+def read_rollup(rollup_path: Path) -> Rollup:
+    """
+    Reads a rollup written by write_rollup.
+
+    Raises:
+        ValueError: If the file has no latency bins, e.g. it is not a rollup.
+    """
+    import pyarrow.compute as pc
+    from pyarrow import feather
+
+    table = feather.read_table(str(rollup_path))
+    if LATENCY_BINS_COLUMN not in table.column_names:
+        raise ValueError(f"{rollup_path} is not a rollup file, it has no {LATENCY_BINS_COLUMN} column")
+    lengths = pc.list_value_length(table[LATENCY_BINS_COLUMN]).to_numpy()
+    latency = pd.DataFrame(
+        {
+            "row": np.repeat(np.arange(table.num_rows), lengths),
+            "latency_bin": pc.list_flatten(table[LATENCY_BINS_COLUMN]).to_numpy().astype(np.int64),
+            "count": pc.list_flatten(table[LATENCY_COUNTS_COLUMN]).to_numpy().astype(np.int64),
+        }
+    )
+    stats = table.drop_columns([LATENCY_BINS_COLUMN, LATENCY_COUNTS_COLUMN]).to_pandas()
+    metadata = table.schema.metadata or {}
+    rollup = Rollup(stats, latency, json.loads(metadata.get(BUCKET_METADATA_KEY, b'"1s"')))
+    logger.info(f"Read {len(rollup)} rollup rows with {len(latency)} latency bins from {rollup_path}")
+    return rollup
+
+
+def select_range(rollup: Rollup, start_epoch: int, end_epoch: int) -> Rollup:
+    """
+    Selects the rollup rows of a time range. Range boundaries are resolved to the rows:
+    a row belongs to the range when the middle of its first and last sample time is
+    strictly inside it.
+
+    Parameters:
+    - rollup (Rollup): The rollup.
+    - start_epoch (int): The range start in epoch nanoseconds.
+    - end_epoch (int): The range end in epoch nanoseconds.
+
+    Returns:
+    - Rollup: The rollup rows of the range.
+    """
+    stats = rollup.stats
+    middle = stats["ts_min"] + (stats["ts_max"] - stats["ts_min"]) // 2
+    return rollup.take(((middle > start_epoch) & (middle < end_epoch)).to_numpy())
+
+
+def rollup_histogram(rollup: Rollup) -> BinnedLatencyHistogram:
+    """
+    Returns the latency histogram of the samples of a rollup.
+    """
+    bin_counts = np.bincount(
+        rollup.latency["latency_bin"].to_numpy(), weights=rollup.latency["count"].to_numpy()
+    ).astype(np.int64)
+    bins = np.flatnonzero(bin_counts)
+    return BinnedLatencyHistogram(
+        bins,
+        bin_counts[bins],
+        rollup.stats[SUM_PREFIX + "elapsed"].sum().item(),
+        rollup.stats["elapsed_min"].min(),
+        rollup.stats["elapsed_max"].max(),
+    )
+
+
+def get_sum_columns(rollup: Rollup) -> List[str]:
+    """
+    Returns the summed sample columns of a rollup, in the order of the samples.
+    """
+    return [column[len(SUM_PREFIX):] for column in rollup.stats.columns if column.startswith(SUM_PREFIX)]
+
+
+def get_rollup_labels(rollup: Rollup) -> List[str]:
+    """
+    Returns the labels of a rollup in the order of their first sample.
+    """
+    first_samples = rollup.stats.groupby("label", observed=True)["ts_min"].min().sort_values(kind="stable")
+    return [label for label in first_samples.index if label is not None and not pd.isna(label)]
+
+
+def get_rollup_times(rollup: Rollup):
+    """
+    Returns the first and last sample time of a rollup.
+    """
+    stats = rollup.stats
+    return pd.Timestamp(np.int64(stats["ts_min"].min())), pd.Timestamp(np.int64(stats["ts_max"].max()))
@@ -0,0 +1,113 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Optional
+from pandas.core.frame import DataFrame
+
+logger = logging.getLogger(__name__)
+
+# Key of the results file pointing to the series file written by s04_results_analyzer.
+SERIES_FILE_KEY = "series_file"
+SERIES_KEYS = ["range", "label", "freq", "bucket"]
+
+
+def extract_series(descriptive_analysis: Dict, freq: str) -> DataFrame:
+    """
+    Moves the series of every range and label out of the analysis results into one
+    long table, leaving only the scalar statistics in the results.
+
+    Parameters:
+    - descriptive_analysis (Dict): The results of s04_results_analyzer, modified in place.
+    - freq (str): The frequency of the "series" fields, other frequencies are read from
+      the "series_by_freq" fields.
+
+    Returns:
+    - DataFrame: The series with SERIES_KEYS columns and a column per series metric.
+    """
+    keys = {key: [] for key in SERIES_KEYS}
+    rows = []
+    for range_name, range_data in descriptive_analysis.items():
+        for label_name, transaction_data in range_data["by_transactions_range_results"].items():
+            if transaction_data is None:
+                continue
+            series_by_freq = {freq: transaction_data.pop("series", {})}
+            series_by_freq.update(transaction_data.pop("series_by_freq", {}))
+            for series_freq, series in series_by_freq.items():
+                keys["range"].extend([range_name] * len(series))
+                keys["label"].extend([label_name] * len(series))
+                keys["freq"].extend([series_freq] * len(series))
+                keys["bucket"].extend(series)
+                rows.extend(series.values())
+
+    series_frame = pd.DataFrame(
+        {key: pd.Categorical(values) for key, values in keys.items() if key != "bucket"}
+    )
+    series_frame["bucket"] = pd.to_datetime(pd.Series(keys["bucket"], dtype=object))
+    metrics = pd.DataFrame(rows, dtype=np.float64)
+    return pd.concat([series_frame, metrics], axis=1)
+
+
+def write_series(series_frame: DataFrame, series_path: Path) -> None:
+    """
+    Writes series extracted by extract_series to a Feather file.
+    """
+    series_frame.to_feather(series_path)
+    logger.info(f"Saved {len(series_frame)} series rows to {series_path}")
+
+
+def series_file_pointer(series_path: Path, results_path: Path) -> str:
+    """
+    Returns the path of the series file relative to the directory of the results file,
+    so the pointer stays valid when both are read from elsewhere or moved together.
+    The path is absolute if no relative path leads to it, e.g. on another drive.
+    """
+    series_path = Path(os.path.abspath(series_path))
+    try:
+        return os.path.relpath(series_path, os.path.abspath(Path(results_path).parent))
+    except ValueError:
+        return str(series_path)
+
+
+def read_series(
+    series_path: Path,
+    range_name: Optional[str] = None,
+    label_name: Optional[str] = None,
+    freq: Optional[str] = None,
+    results_path: Optional[Path] = None,
+) -> DataFrame:
+    """
+    Reads the series of a range, label and frequency, all of them if None, filtering
+    the Feather file before it is converted to pandas.
+
+    Parameters:
+    - series_path (Path): The series file, e.g. the SERIES_FILE_KEY field of a results file.
+    - results_path (Optional[Path]): The results file a relative series_path is resolved
+      against, the working directory if None.
+
+    Returns:
+    - DataFrame: The selected series rows.
+    """
+    import pyarrow.compute as pc
+    from pyarrow import feather
+
+    if results_path is not None:
+        series_path = Path(results_path).parent / series_path
+    table = feather.read_table(str(series_path))
+    for column, value in (("range", range_name), ("label", label_name), ("freq", freq)):
+        if value is not None:
+            table = table.filter(pc.equal(table[column].cast("string"), value))
+    return table.to_pandas()
+
+
+def series_to_dict(series_frame: DataFrame) -> Dict:
+    """
+    Converts the series rows of one range, label and frequency back to the
+    {interval end: {metric: mean}} dictionaries of the "series" fields.
+    """
+    metrics = series_frame.drop(columns=SERIES_KEYS)
+    return {
+        str(bucket): dict(zip(metrics.columns, values))
+        for bucket, values in zip(series_frame["bucket"], metrics.to_numpy().tolist())
+    }
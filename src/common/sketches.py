@@ -0,0 +1,266 @@
+import math
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from src.common.histograms import range_segments, time_segments
+from src.common.percentiles import lerp, linear_positions
+
+DEFAULT_RELATIVE_ERROR = 0.01
+# Key of the totals of all labels of a tracked range
+_ALL_LABELS = object()
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with a bounded relative error (DDSketch).
+
+    Positive values are counted in logarithmic buckets, so every quantile is estimated
+    within the relative error of the value Series.quantile would return, using memory
+    proportional to the logarithm of the value range rather than the number of values.
+    Count, sum, minimum and maximum are exact.
+    """
+
+    def __init__(self, relative_error: float = DEFAULT_RELATIVE_ERROR):
+        """
+        Parameters:
+        - relative_error (float): The relative error bound of the quantiles, between 0 and 1.
+        """
+        if not 0 < relative_error < 1:
+            raise ValueError(f"Relative error {relative_error} is not between 0 and 1")
+        self.relative_error = relative_error
+        self.gamma = (1 + relative_error) / (1 - relative_error)
+        self._log_gamma = math.log(self.gamma)
+        self.offset = 0
+        self.buckets = np.zeros(0, dtype=np.int64)
+        self.zeros = 0
+        self.total = 0
+        self.sum = 0
+        self.min = np.nan
+        self.max = np.nan
+
+    def add(self, values) -> None:
+        """
+        Adds values to the sketch, ignoring missing values.
+        """
+        values = np.asarray(values)
+        if values.dtype.kind == "f":
+            values = values[~np.isnan(values)]
+        if values.size == 0:
+            return
+        self.total += values.size
+        self.sum += values.sum().item()
+        self.min = np.fmin(self.min, values.min())
+        self.max = np.fmax(self.max, values.max())
+
+        positive = values[values > 0]
+        self.zeros += values.size - positive.size
+        if positive.size:
+            keys = np.ceil(np.log(positive) / self._log_gamma).astype(np.int64)
+            offset = int(keys.min())
+            self._add_buckets(offset, np.bincount(keys - offset))
+
+    def _add_buckets(self, offset: int, buckets: np.ndarray) -> None:
+        if self.buckets.size == 0:
+            self.offset, self.buckets = offset, buckets.astype(np.int64)
+            return
+        start = min(self.offset, offset)
+        end = max(self.offset + self.buckets.size, offset + buckets.size)
+        merged = np.zeros(end - start, dtype=np.int64)
+        merged[self.offset - start:self.offset - start + self.buckets.size] += self.buckets
+        merged[offset - start:offset - start + buckets.size] += buckets
+        self.offset, self.buckets = start, merged
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """
+        Adds the values of another sketch with the same relative error.
+        """
+        if other.gamma != self.gamma:
+            raise ValueError("Can't merge sketches with different relative errors")
+        if other.total == 0:
+            return
+        self.total += other.total
+        self.sum += other.sum
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.zeros += other.zeros
+        if other.buckets.size:
+            self._add_buckets(other.offset, other.buckets)
+
+    @classmethod
+    def merge_all(cls, sketches: Iterable["QuantileSketch"], relative_error: float) -> "QuantileSketch":
+        """
+        Merges sketches of disjoint samples into a new sketch.
+        """
+        merged = cls(relative_error)
+        for sketch in sketches:
+            merged.merge(sketch)
+        return merged
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.total if self.total else np.nan
+
+    def _rank_values(self, ranks: np.ndarray) -> np.ndarray:
+        """
+        Estimates the values at sorted positions from the bucket midpoints.
+        """
+        bucket_positions = np.searchsorted(np.cumsum(self.buckets), ranks - self.zeros, side="right")
+        keys = self.offset + np.minimum(bucket_positions, max(self.buckets.size - 1, 0))
+        estimates = 2 * self.gamma ** keys.astype(np.float64) / (self.gamma + 1)
+        estimates = np.where(ranks < self.zeros, 0.0, estimates)
+        return np.clip(estimates, self.min, self.max)
+
+    def quantiles(self, quantiles: Sequence[float]) -> np.ndarray:
+        """
+        Estimates the quantiles with Series.quantile's linear interpolation between
+        the estimated neighbouring values.
+
+        Parameters:
+        - quantiles (Sequence[float]): The quantiles, between 0 and 1.
+
+        Returns:
+        - np.ndarray: The quantiles, NaN for an empty sketch.
+        """
+        if self.total == 0:
+            return np.full(len(quantiles), np.nan)
+        previous_indexes, next_indexes, gamma = linear_positions(np.array([self.total]), quantiles)
+        return lerp(self._rank_values(previous_indexes[0]), self._rank_values(next_indexes[0]), gamma[0])
+
+
+class RangeSketches:
+    """
+    Quantile sketches and sample counts by label within the elementary time segments
+    between the boundaries of the test ranges, filled batch by batch.
+
+    The memory used is proportional to the number of labels and ranges, not rows.
+    The statistics of a range are merged from its segments like with RangeHistograms.
+
+    Given the ranges to track, the segments hold only the samples added since the last
+    summary instead, which merges them into running totals of the tracked ranges. A summary
+    then costs time proportional to the segments and labels with new samples, and only
+    tracked ranges can be summarized.
+    """
+
+    def __init__(
+        self,
+        boundaries: Iterable[int],
+        relative_error: float = DEFAULT_RELATIVE_ERROR,
+        ranges: Optional[Iterable[Tuple[int, int]]] = None,
+    ):
+        """
+        Parameters:
+        - boundaries (Iterable[int]): The start and end times of the ranges in epoch nanoseconds.
+        - relative_error (float): The relative error bound of the quantiles.
+        - ranges (Optional[Iterable[Tuple[int, int]]]): The start and end times of the ranges
+          to track, boundaries both.
+        """
+        self.edges = np.unique(np.asarray(list(boundaries), dtype=np.int64))
+        self.relative_error = relative_error
+        # Sketches and numbers of samples, successes and failures by segment and label
+        self.sketches: Dict[int, Dict[object, QuantileSketch]] = {}
+        self.counts: Dict[int, Dict[object, np.ndarray]] = {}
+        # The same by tracked range and label, with the totals of all labels by _ALL_LABELS
+        self.range_sketches: Dict[Tuple[int, int], Dict[object, QuantileSketch]] = {}
+        self.range_counts: Dict[Tuple[int, int], Dict[object, np.ndarray]] = {}
+        self.segment_ranges: Dict[int, List[Tuple[int, int]]] = {}
+        segment_numbers = range(2 * len(self.edges) + 1)
+        for range_key in ranges or []:
+            self.range_sketches[range_key], self.range_counts[range_key] = {}, {}
+            for segment in segment_numbers[range_segments(self.edges, *range_key)]:
+                self.segment_ranges.setdefault(segment, []).append(range_key)
+
+    def add(self, timestamps, labels, elapsed, successes, failures) -> None:
+        """
+        Adds a batch of samples.
+
+        Parameters:
+        - timestamps: The sample times in epoch nanoseconds, in any order.
+        - labels: The label of every sample.
+        - elapsed: The elapsed time of every sample.
+        - successes: Whether every sample succeeded.
+        - failures: Whether every sample failed.
+        """
+        if len(timestamps) == 0:
+            return
+        segments = time_segments(self.edges, np.asarray(timestamps))
+        label_codes, label_values = _factorize(labels)
+        groups = segments * len(label_values) + label_codes
+        order = np.argsort(groups, kind="stable")
+        sorted_groups = groups[order]
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        elapsed = np.asarray(elapsed)[order]
+        successes = np.asarray(successes)[order]
+        failures = np.asarray(failures)[order]
+        for start, end in zip(starts, np.r_[starts[1:], len(order)]):
+            segment, label_code = divmod(int(sorted_groups[start]), len(label_values))
+            label = label_values[label_code]
+            segment_sketches = self.sketches.setdefault(segment, {})
+            segment_counts = self.counts.setdefault(segment, {})
+            if label not in segment_sketches:
+                segment_sketches[label] = QuantileSketch(self.relative_error)
+                segment_counts[label] = np.zeros(3, dtype=np.int64)
+            segment_sketches[label].add(elapsed[start:end])
+            segment_counts[label] += [end - start, successes[start:end].sum(), failures[start:end].sum()]
+
+    def summarize(self, start_epoch: int, end_epoch: int, label=None):
+        """
+        Merges the statistics of the samples strictly between two range boundaries.
+
+        Parameters:
+        - start_epoch (int): The range start in epoch nanoseconds, one of the boundaries.
+        - end_epoch (int): The range end in epoch nanoseconds, one of the boundaries.
+        - label: The label to summarize, all labels if None.
+
+        Returns:
+        - Tuple[QuantileSketch, int, int, int]: The sketch and the numbers of samples,
+          successes and failures. The sketch of a tracked range is its running total.
+
+        Raises:
+        - ValueError: If ranges are tracked and this one is not.
+        """
+        if self.range_sketches:
+            if (start_epoch, end_epoch) not in self.range_sketches:
+                raise ValueError(f"Range from {start_epoch} to {end_epoch} is not tracked")
+            self._merge_into_ranges()
+            range_label = _ALL_LABELS if label is None else label
+            range_sketches = self.range_sketches[(start_epoch, end_epoch)]
+            if range_label not in range_sketches:
+                return (QuantileSketch(self.relative_error), *np.zeros(3, dtype=np.int64))
+            return (range_sketches[range_label], *self.range_counts[(start_epoch, end_epoch)][range_label])
+        segments = range(2 * len(self.edges) + 1)[range_segments(self.edges, start_epoch, end_epoch)]
+        sketches = []
+        counts = np.zeros(3, dtype=np.int64)
+        for segment in segments:
+            segment_sketches = self.sketches.get(segment, {})
+            labels = segment_sketches if label is None else [label] if label in segment_sketches else []
+            for segment_label in labels:
+                sketches.append(segment_sketches[segment_label])
+                counts += self.counts[segment][segment_label]
+        sketch = QuantileSketch.merge_all(sketches, self.relative_error)
+        return (sketch, *counts)
+
+    def _merge_into_ranges(self) -> None:
+        """
+        Merges the samples of the segments into the totals of the tracked ranges they are in.
+        """
+        for segment, segment_sketches in self.sketches.items():
+            for range_key in self.segment_ranges.get(segment, []):
+                range_sketches = self.range_sketches[range_key]
+                range_counts = self.range_counts[range_key]
+                for label, sketch in segment_sketches.items():
+                    for range_label in (label, _ALL_LABELS):
+                        if range_label not in range_sketches:
+                            range_sketches[range_label] = QuantileSketch(self.relative_error)
+                            range_counts[range_label] = np.zeros(3, dtype=np.int64)
+                        range_sketches[range_label].merge(sketch)
+                        range_counts[range_label] += self.counts[segment][label]
+        self.sketches, self.counts = {}, {}
+
+
+def _factorize(labels):
+    """
+    Returns the codes and the distinct values of the labels, missing labels included.
+    """
+    label_codes, label_values = pd.factorize(np.asarray(labels, dtype=object), use_na_sentinel=False)
+    return label_codes, list(label_values)
+
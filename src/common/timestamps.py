@@ -0,0 +1,78 @@
+import logging
+import pandas as pd
+from typing import List, Optional
+from pandas import DatetimeIndex
+
+logger = logging.getLogger(__name__)
+
+EPOCH_MILLISECONDS = "epoch_ms"
+EPOCH_SECONDS = "epoch_s"
+
+# Fixed formats tried in order on string timestamps.
+DATETIME_FORMATS: List[str] = [
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y/%m/%d %H:%M:%S.%f",
+    "%Y/%m/%d %H:%M:%S",
+    "%d.%m.%Y %H:%M:%S",
+    "ISO8601",
+]
+
+SAMPLE_SIZE = 1000
+
+# Epoch seconds between 2001-09-09 and 2286-11-20. Read as milliseconds the same numbers
+# fall into January-April 1970, which is not a plausible test time.
+EPOCH_SECONDS_RANGE = (1e9, 1e10)
+
+
+def detect_timestamp_format(values) -> Optional[str]:
+    """
+    Detects the representation of timestamps from a sample of the values.
+
+    Parameters:
+    - values: The timestamps, numbers or strings.
+
+    Returns:
+    - Optional[str]: EPOCH_MILLISECONDS, EPOCH_SECONDS, one of DATETIME_FORMATS,
+      or None if the format was not recognized.
+    """
+    sample = pd.Series(values[:SAMPLE_SIZE]).dropna()
+    if sample.empty:
+        return EPOCH_MILLISECONDS
+    if pd.api.types.is_numeric_dtype(sample):
+        median = sample.abs().median()
+        if EPOCH_SECONDS_RANGE[0] <= median < EPOCH_SECONDS_RANGE[1]:
+            return EPOCH_SECONDS
+        return EPOCH_MILLISECONDS
+    sample = sample.astype(str)
+    for datetime_format in DATETIME_FORMATS:
+        try:
+            pd.to_datetime(sample, format=datetime_format)
+        except (ValueError, TypeError):
+            continue
+        return datetime_format
+    return None
+
+
+def parse_timestamps(values, timestamp_format: Optional[str], errors: str = "raise") -> DatetimeIndex:
+    """
+    Parses timestamps in a single vectorized pass using the detected format.
+
+    Parameters:
+    - values: The timestamps, numbers or strings.
+    - timestamp_format (Optional[str]): The format returned by detect_timestamp_format.
+      Without a format pandas infers it.
+    - errors (str): "raise" or "coerce", as for pd.to_datetime.
+
+    Returns:
+    - DatetimeIndex: The parsed timestamps.
+    """
+    if timestamp_format == EPOCH_MILLISECONDS:
+        return pd.DatetimeIndex(pd.to_datetime(values, unit="ms", errors=errors))
+    if timestamp_format == EPOCH_SECONDS:
+        return pd.DatetimeIndex(pd.to_datetime(values, unit="s", errors=errors))
+    return pd.DatetimeIndex(pd.to_datetime(values, format=timestamp_format, errors=errors))
@@ -0,0 +1,122 @@
+import os
+import sys
+import logging
+import argparse
+from pathlib import Path
+from typing import Optional
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.common.settings import LOGGING_CONFIG
+from src.common.prefix_index import TimeWindowIndex, write_index
+from src.common.rollups import DEFAULT_BUCKET, Rollup, build_rollup, write_rollup
+from src.s02_data_frame_compiler import ENGINES, DataFrameProcessor
+
+logging.basicConfig(**LOGGING_CONFIG)
+logger = logging.getLogger(__name__)
+
+
+class GeneratorSummarizer(DataFrameProcessor):
+    """
+    A class to summarize the JTL file of a load generator where it was written.
+
+    The JTL file is read, indexed and filtered like by DataFrameProcessor, and instead of
+    the data frame a compact rollup is saved: the number of samples, successes and failures,
+    the sums of the numeric columns and the latency histogram by label and time bucket.
+    Rollups of all generators are merged by s03_analysis_preparator and s04_results_analyzer
+    with --rollup_file_paths, so the raw JTL files don't have to be shipped. The time window
+    index of the rollup can be saved as well, which s10_window_query queries together with
+    the indexes of the other generators.
+
+    Attributes:
+        bucket (str): The length of the time buckets, e.g. "1s".
+    """
+
+    def __init__(
+        self,
+        file_path: Path,
+        output_path: Path,
+        bucket: str = DEFAULT_BUCKET,
+        engine: str = "pandas",
+        index_path: Optional[Path] = None,
+    ):
+        """
+        Initialize the GeneratorSummarizer with file paths for input and output.
+
+        Args:
+            file_path (Path): Path to the input JTL file.
+            output_path (Path): Path for saving the rollup.
+            bucket (str): Length of the time buckets.
+            engine (str): CSV parser engine, "pandas" or "pyarrow".
+            index_path (Path, optional): Path for saving the index of the rollup, no index if None.
+        """
+        super().__init__(file_path, output_path, engine=engine, index_path=index_path)
+        self.bucket = bucket
+        self.rollup: Optional[Rollup] = None
+
+    def _save_data_frame(self):
+        """
+        Saves the rollup of the processed DataFrame to the output path in Feather format
+        and its time window index to the index path, if given.
+
+        Raises:
+            Exception: If there is an error in saving the file.
+        """
+        logger.info(f"Summarizing {len(self.data_frame)} samples by {self.bucket} buckets")
+        self.rollup = build_rollup(self.data_frame, self.bucket)
+        logger.info(f"Saving {len(self.rollup)} rollup rows to {self.output_path}")
+        try:
+            write_rollup(self.rollup, self.output_path)
+            logger.info("Rollup saved successfully")
+            if self.index_path is not None:
+                logger.info(f"Saving the time window index to {self.index_path}")
+                write_index(TimeWindowIndex.from_rollup(self.rollup), self.index_path)
+                logger.info("Index saved successfully")
+        except Exception as e:
+            logger.error(f"Error saving rollup: {e}")
+            raise
+
+
+def main():
+    """
+    Main function to parse command line arguments and summarize the JTL file of a load generator.
+    """
+    parser = argparse.ArgumentParser(description="Summarize a load generator's JTL file.")
+    parser.add_argument(
+        "--jtl_file_path",
+        type=Path,
+        default=Path("kpi.jtl"),
+        help="Path to the JTL file of the load generator",
+    )
+    parser.add_argument(
+        "--output_file_path",
+        type=Path,
+        default=Path("kpi_rollup.feather"),
+        help="Path to the rollup file",
+    )
+    parser.add_argument(
+        "--bucket",
+        type=str,
+        default=DEFAULT_BUCKET,
+        help="Length of the time buckets, the series interval of s04 must be a multiple of it",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="pandas",
+        help="CSV parser engine",
+    )
+    parser.add_argument(
+        "--index_file_path",
+        type=Path,
+        help="Path to also save the time window index of the rollup, which s10 queries with --index_file_paths",
+    )
+
+    args = parser.parse_args()
+
+    summarizer = GeneratorSummarizer(
+        args.jtl_file_path, args.output_file_path, args.bucket, args.engine, args.index_file_path
+    )
+    summarizer.process_data_frame()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,78 @@
+import io
 import os
 import sys
+import json
 import argparse
+import shutil
+import hashlib
 import logging
+import tempfile
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
 from pandas.core.frame import DataFrame
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.common.settings import LOGGING_CONFIG
+from src.common.jtl_schema import concat_jtl, read_jtl
+from src.common.compression import find_jtl_files, get_compression, open_jtl
+from src.common.timestamps import EPOCH_MILLISECONDS, detect_timestamp_format, parse_timestamps
 
 logging.basicConfig(**LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
+# Rows parsed up front to estimate the in-memory size of a single row.
+SAMPLE_ROWS = 1000
+# Headroom for the parser buffers and the CSV text produced by `to_csv`
+# on top of the chunk's own DataFrame.
+MEMORY_OVERHEAD_FACTOR = 3
+# Column holding the sort key of rows while merging files by time.
+MERGE_KEY_COLUMN = "__merge_key"
+# Buffer used to copy raw JTL bytes in the identical-header fast path.
+COPY_BUFFER_SIZE = 16 * 1024 * 1024
+# Bytes at the end of the ingested content of a file hashed to detect rewritten files.
+TAIL_WINDOW_SIZE = 64 * 1024
+
 
 class JTLJoiner:
     """
     A class to join JTL files and save the combined data to a specified file path.
+
+    In streaming mode every file is read in chunks sized to fit into the memory budget
+    and appended to the output as it goes, so peak memory does not depend on the total
+    size of the JTL files.
+
+    In raw concat mode files sharing the same header are concatenated byte by byte
+    without being parsed; if the headers differ the joiner falls back to pandas.
+
+    In incremental mode a manifest next to the output records the size, mtime and a hash
+    of the last ingested bytes of every file, and later runs append only new files and the
+    rows appended to already ingested files.
+
+    In merge by time mode the files, each roughly sorted by timestamp, are merged in a
+    streaming k-way merge into a globally sorted output. Rows may be out of order within
+    a file by up to the reorder window. Rows whose timestamp cannot be parsed are dropped.
+
+    Incremental, merge by time and raw concat modes exclude each other; streaming mode may
+    only back raw concat mode for files whose headers differ.
+
+    With more than one worker the files are parsed in a process pool; the output keeps
+    the order of the sorted file list either way.
     """
     def __init__(
-        self, kpi_files_path: Path, file_mask: str, output_file_path: Path
+        self,
+        kpi_files_path: Path,
+        file_mask: str,
+        output_file_path: Path,
+        streaming: bool = False,
+        memory_budget_mb: int = 256,
+        workers: int = 1,
+        raw_concat: bool = False,
+        incremental: bool = False,
+        merge_by_time: bool = False,
+        reorder_window_ms: int = 60000,
+        timestamp_column: str = "timeStamp",
     ) -> None:
         if not kpi_files_path.exists() or not kpi_files_path.is_dir():
             raise ValueError(
@@ -25,6 +80,20 @@ def __init__(
             )
         if not isinstance(file_mask, str):
             raise ValueError("File mask must be a string.")
+        if memory_budget_mb <= 0:
+            raise ValueError("Memory budget must be a positive number of megabytes.")
+        if workers < 1:
+            raise ValueError("Workers count must be a positive number.")
+        if reorder_window_ms < 0:
+            raise ValueError("Reorder window must not be negative.")
+        if sum((incremental, merge_by_time, raw_concat)) > 1:
+            raise ValueError(
+                "Only one of incremental, merge by time and raw concat modes can be used."
+            )
+        if streaming and (incremental or merge_by_time):
+            raise ValueError(
+                "Streaming mode cannot be combined with incremental or merge by time modes."
+            )
         _output_directory = output_file_path.parent
         if not _output_directory.exists() and str(_output_directory) != "":
             _output_directory.mkdir(parents=True, exist_ok=True)
@@ -33,43 +102,570 @@ def __init__(
         self._kpi_files_path = kpi_files_path
         self._file_mask = file_mask
         self._output_file_path = output_file_path
+        self._streaming = streaming
+        self._memory_budget_bytes = memory_budget_mb * 1024 * 1024
+        self._workers = workers
+        self._raw_concat = raw_concat
+        self._incremental = incremental
+        self._merge_by_time = merge_by_time
+        self._reorder_window_ms = reorder_window_ms
+        self._timestamp_column = timestamp_column
 
     @staticmethod
-    def _file_stats(file_path: Path, df: DataFrame) -> None:
+    def _file_stats(file_path: Path, num_rows: int) -> None:
         file_size = file_path.stat().st_size
-        num_rows = df.shape[0]
         logger.info(f"File: {file_path}, Size: {file_size} bytes, Rows: {num_rows}")
 
+    @staticmethod
+    def _read_kpi_file(file_path: Path) -> DataFrame:
+        return read_jtl(file_path)
+
     def _join_kpi_jtl(self) -> DataFrame:
+        kpi_files = find_jtl_files(self._kpi_files_path, self._file_mask)
+
+        dataframes = []
+        if self._workers > 1:
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                futures = [executor.submit(self._read_kpi_file, file) for file in kpi_files]
+                for file, future in zip(kpi_files, futures):
+                    try:
+                        df = future.result()
+                        self._file_stats(file, df.shape[0])
+                        dataframes.append(df)
+                    except Exception as e:
+                        logger.error(f"Error reading {file}: {e}")
+        else:
+            for file in kpi_files:
+                try:
+                    df = self._read_kpi_file(file)
+                    self._file_stats(file, df.shape[0])
+                    dataframes.append(df)
+                except Exception as e:
+                    logger.error(f"Error reading {file}: {e}")
+
+        combined_data = concat_jtl(dataframes, ignore_index=True)
+        return combined_data
+
+    def _save_kpi_jtl(self, combined_data: DataFrame) -> Path:
+        try:
+            combined_data.to_csv(self._output_file_path, index=False)
+            logger.info(f"Saved joined data to {self._output_file_path}")
+            self._file_stats(self._output_file_path, combined_data.shape[0])
+        except Exception as e:
+            logger.error(f"Error saving file: {e}")
+            return Path()
+        return self._output_file_path
+
+    @staticmethod
+    def _chunk_rows(file_path: Path, memory_budget_bytes: int) -> int:
+        """
+        Estimates how many rows of the file fit into the memory budget at once.
+        """
+        sample = pd.read_csv(file_path, nrows=SAMPLE_ROWS)
+        if sample.empty:
+            return SAMPLE_ROWS
+        row_bytes = sample.memory_usage(index=True, deep=True).sum() / len(sample)
+        return max(1, int(memory_budget_bytes // (row_bytes * MEMORY_OVERHEAD_FACTOR)))
+
+    @staticmethod
+    def _write_file_rows(
+        file_path: Path, columns: List[str], output_file, memory_budget_bytes: int
+    ) -> int:
+        """
+        Appends the rows of a JTL file to an open output file chunk by chunk.
+
+        Returns:
+            int: The number of rows written.
+        """
+        chunk_rows = JTLJoiner._chunk_rows(file_path, memory_budget_bytes)
+        logger.debug(f"Reading {file_path} in chunks of {chunk_rows} rows")
+        num_rows = 0
+        for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+            chunk.reindex(columns=columns).to_csv(output_file, header=False, index=False)
+            num_rows += chunk.shape[0]
+        return num_rows
+
+    @staticmethod
+    def _write_file_part(
+        file_path: Path, columns: List[str], part_path: Path, memory_budget_bytes: int
+    ) -> int:
+        with open(part_path, "w", newline="") as part_file:
+            return JTLJoiner._write_file_rows(
+                file_path, columns, part_file, memory_budget_bytes
+            )
+
+    def _joined_columns(self, kpi_files: List[Path]) -> List[str]:
+        """
+        Collects the union of the files' columns in order of appearance, like `pd.concat` does.
+        """
+        columns: List[str] = []
+        for file in kpi_files:
+            try:
+                header = pd.read_csv(file, nrows=0).columns
+            except Exception as e:
+                logger.error(f"Error reading header of {file}: {e}")
+                continue
+            columns.extend(column for column in header if column not in columns)
+        return columns
+
+    def _stream_serially(self, kpi_files: List[Path], columns: List[str], output_file) -> int:
+        total_rows = 0
+        for file in kpi_files:
+            output_file.flush()
+            file_start = output_file.tell()
+            try:
+                file_rows = self._write_file_rows(
+                    file, columns, output_file, self._memory_budget_bytes
+                )
+            except Exception as e:
+                logger.error(f"Error reading {file}: {e}")
+                output_file.seek(file_start)
+                output_file.truncate()
+                continue
+            self._file_stats(file, file_rows)
+            total_rows += file_rows
+        return total_rows
+
+    def _stream_in_parallel(self, kpi_files: List[Path], columns: List[str], output_file) -> int:
+        """
+        Converts every file into a part file in a process pool and appends the parts in order.
+        The memory budget is shared between the workers.
+        """
+        worker_budget_bytes = max(1, self._memory_budget_bytes // self._workers)
+        total_rows = 0
+        with tempfile.TemporaryDirectory(dir=self._output_file_path.parent) as parts_dir:
+            part_paths = [Path(parts_dir, f"{index}.part") for index in range(len(kpi_files))]
+            with ProcessPoolExecutor(max_workers=self._workers) as executor:
+                futures = [
+                    executor.submit(
+                        self._write_file_part, file, columns, part_path, worker_budget_bytes
+                    )
+                    for file, part_path in zip(kpi_files, part_paths)
+                ]
+                for file, part_path, future in zip(kpi_files, part_paths, futures):
+                    try:
+                        file_rows = future.result()
+                    except Exception as e:
+                        logger.error(f"Error reading {file}: {e}")
+                        continue
+                    with open(part_path, "r", newline="") as part_file:
+                        shutil.copyfileobj(part_file, output_file)
+                    part_path.unlink()
+                    self._file_stats(file, file_rows)
+                    total_rows += file_rows
+        return total_rows
+
+    def _stream_kpi_jtl(self) -> Path:
+        kpi_files = find_jtl_files(self._kpi_files_path, self._file_mask)
+        columns = self._joined_columns(kpi_files)
+        if not columns:
+            logger.error("No data combined from JTL files.")
+            return Path()
+
+        total_rows = 0
+        try:
+            with open(self._output_file_path, "w", newline="") as output_file:
+                DataFrame(columns=columns).to_csv(output_file, index=False)
+                if self._workers > 1:
+                    total_rows = self._stream_in_parallel(kpi_files, columns, output_file)
+                else:
+                    total_rows = self._stream_serially(kpi_files, columns, output_file)
+        except Exception as e:
+            logger.error(f"Error saving file: {e}")
+            return Path()
+
+        if total_rows == 0:
+            logger.error("No data combined from JTL files.")
+            self._output_file_path.unlink()
+            return Path()
+
+        logger.info(f"Saved joined data to {self._output_file_path}")
+        self._file_stats(self._output_file_path, total_rows)
+        return self._output_file_path
+
+    @staticmethod
+    def _read_header_line(file_path: Path) -> bytes:
+        with open_jtl(file_path) as file:
+            return file.readline()
+
+    @staticmethod
+    def _copy_rows(source_file, output_file) -> int:
+        """
+        Copies the rest of an open binary source file into the output through a large buffer.
+
+        Returns:
+            int: The number of copied lines.
+        """
+        buffer = bytearray(COPY_BUFFER_SIZE)
+        view = memoryview(buffer)
+        num_rows = 0
+        last_byte = b"\n"
+        while True:
+            read_bytes = source_file.readinto(buffer)
+            if not read_bytes:
+                break
+            output_file.write(view[:read_bytes])
+            num_rows += buffer.count(b"\n", 0, read_bytes)
+            last_byte = buffer[read_bytes - 1:read_bytes]
+        if last_byte != b"\n":
+            output_file.write(b"\n")
+            num_rows += 1
+        return num_rows
+
+    def _concat_raw_kpi_jtl(self) -> Optional[Path]:
+        """
+        Concatenates the raw bytes of JTL files that share one header, writing the header once.
+
+        Returns:
+            Optional[Path]: The output path, an empty Path on failure,
+            or None if the headers differ and the files have to be parsed.
+        """
         kpi_files = []
-        logger.debug("Scanning directory for files.")
-        for file in self._kpi_files_path.rglob(f"*{self._file_mask}"):
-            logger.info(f"Found file: {file}")
+        headers = set()
+        for file in find_jtl_files(self._kpi_files_path, self._file_mask):
+            try:
+                header_line = self._read_header_line(file)
+            except Exception as e:
+                logger.error(f"Error reading header of {file}: {e}")
+                continue
+            if not header_line:
+                logger.error(f"Error reading {file}: the file is empty")
+                continue
+            headers.add(header_line.rstrip(b"\r\n"))
             kpi_files.append(file)
+        if not kpi_files:
+            logger.error("No data combined from JTL files.")
+            return Path()
+        if len(headers) > 1:
+            logger.info("JTL files have different headers, falling back to parsing them.")
+            return None
 
+        total_rows = 0
+        try:
+            with open(self._output_file_path, "wb") as output_file:
+                output_file.write(headers.pop() + b"\n")
+                for file in kpi_files:
+                    output_file.flush()
+                    file_start = output_file.tell()
+                    try:
+                        with open_jtl(file) as source_file:
+                            source_file.readline()
+                            file_rows = self._copy_rows(source_file, output_file)
+                    except Exception as e:
+                        logger.error(f"Error reading {file}: {e}")
+                        output_file.seek(file_start)
+                        output_file.truncate()
+                        continue
+                    self._file_stats(file, file_rows)
+                    total_rows += file_rows
+        except Exception as e:
+            logger.error(f"Error saving file: {e}")
+            return Path()
+
+        if total_rows == 0:
+            logger.error("No data combined from JTL files.")
+            self._output_file_path.unlink()
+            return Path()
+
+        logger.info(f"Saved joined data to {self._output_file_path}")
+        self._file_stats(self._output_file_path, total_rows)
+        return self._output_file_path
+
+    def _manifest_path(self) -> Path:
+        return self._output_file_path.with_name(f"{self._output_file_path.name}.manifest.json")
+
+    def _load_manifest(self) -> Dict:
+        manifest_path = self._manifest_path()
+        if not self._output_file_path.exists() or not manifest_path.exists():
+            return {}
+        try:
+            with open(manifest_path, "r") as manifest_file:
+                return json.load(manifest_file)
+        except Exception as e:
+            logger.error(f"Error reading manifest {manifest_path}: {e}")
+            return {}
+
+    def _save_manifest(self, manifest: Dict) -> None:
+        manifest_path = self._manifest_path()
+        temporary_path = manifest_path.with_name(f"{manifest_path.name}.tmp")
+        with open(temporary_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=4)
+        os.replace(temporary_path, manifest_path)
+
+    @staticmethod
+    def _is_unchanged(file_path: Path, entry: Dict) -> bool:
+        file_stat = file_path.stat()
+        return file_stat.st_size == entry["size"] and file_stat.st_mtime == entry["mtime"]
+
+    @staticmethod
+    def _skip_bytes(file_path: Path, source_file, count: int) -> None:
+        """
+        Moves a file opened by open_jtl forward by count bytes, seeking in uncompressed files
+        and decompressing and discarding the bytes of compressed ones.
+        """
+        if get_compression(file_path) is None:
+            source_file.seek(count, io.SEEK_CUR)
+            return
+        while count > 0:
+            block = source_file.read(min(COPY_BUFFER_SIZE, count))
+            if not block:
+                return
+            count -= len(block)
+
+    @staticmethod
+    def _read_new_rows(file_path: Path, entry: Optional[Dict]) -> Optional[Tuple[DataFrame, Dict]]:
+        """
+        Reads the complete lines appended to a file since the manifest entry was recorded.
+
+        The last TAIL_WINDOW_SIZE bytes of the already ingested content are hashed and compared
+        with the entry first, so a file that was rewritten rather than appended to is detected
+        without reading the whole ingested prefix. Offsets and hashes refer to the decompressed
+        content of compressed files.
+
+        Returns:
+            Optional[Tuple[DataFrame, Dict]]: The new rows and the updated manifest entry,
+            or None if the file no longer ends the ingested content with the same bytes.
+        """
+        offset = entry["offset"] if entry else 0
+        window_size = min(TAIL_WINDOW_SIZE, offset)
+        file_stat = file_path.stat()
+        with open_jtl(file_path) as source_file:
+            header_line = source_file.readline()
+        with open_jtl(file_path) as source_file:
+            JTLJoiner._skip_bytes(file_path, source_file, offset - window_size)
+            tail_window = source_file.read(window_size)
+            if len(tail_window) < window_size:
+                return None
+            if entry and hashlib.sha256(tail_window).hexdigest() != entry.get("tail_sha256"):
+                return None
+            new_bytes = source_file.read()
+
+        # A partially written last line is left for the next run.
+        new_bytes = new_bytes[:new_bytes.rfind(b"\n") + 1]
+        tail_window = (tail_window + new_bytes)[-TAIL_WINDOW_SIZE:]
+        csv_bytes = new_bytes if offset == 0 else header_line + new_bytes
+        try:
+            df = read_jtl(io.BytesIO(csv_bytes))
+        except pd.errors.EmptyDataError:
+            df = DataFrame()
+        new_entry = {
+            "size": file_stat.st_size,
+            "mtime": file_stat.st_mtime,
+            "offset": offset + len(new_bytes),
+            "tail_sha256": hashlib.sha256(tail_window).hexdigest(),
+        }
+        return df, new_entry
+
+    def _collect_new_rows(
+        self, kpi_files: List[Path], known_files: Dict
+    ) -> Optional[Tuple[List[DataFrame], Dict]]:
+        """
+        Reads new and appended rows of the files against the manifest's file entries.
+
+        Returns:
+            Optional[Tuple[List[DataFrame], Dict]]: The new rows per file and the updated
+            file entries, or None if some file was rewritten and a full rebuild is needed.
+        """
         dataframes = []
+        file_entries = {}
         for file in kpi_files:
+            entry = known_files.get(str(file))
             try:
-                df = pd.read_csv(file)
-                self._file_stats(file, df)
+                if entry and self._is_unchanged(file, entry):
+                    logger.debug(f"Skipping unchanged file: {file}")
+                    file_entries[str(file)] = entry
+                    continue
+                new_rows = self._read_new_rows(file, entry)
+            except Exception as e:
+                logger.error(f"Error reading {file}: {e}")
+                if entry:
+                    file_entries[str(file)] = entry
+                continue
+            if new_rows is None:
+                logger.info(f"File {file} was rewritten since the last run.")
+                return None
+            df, file_entries[str(file)] = new_rows
+            self._file_stats(file, df.shape[0])
+            if not df.empty:
                 dataframes.append(df)
+        return dataframes, file_entries
+
+    def _process_incrementally(self) -> Path:
+        manifest = self._load_manifest()
+        known_files = manifest.get("files", {})
+        kpi_files = find_jtl_files(self._kpi_files_path, self._file_mask)
+        removed_files = set(known_files) - {str(file) for file in kpi_files}
+        if removed_files:
+            logger.info(f"Previously ingested files are gone: {sorted(removed_files)}")
+            known_files = {}
+
+        collected = self._collect_new_rows(kpi_files, known_files) if known_files else None
+        if collected is not None:
+            dataframes, file_entries = collected
+            if dataframes:
+                new_data = concat_jtl(dataframes, ignore_index=True)
+                if not set(new_data.columns) <= set(manifest["columns"]):
+                    logger.info("New JTL columns appeared since the last run.")
+                    collected = None
+
+        try:
+            if collected is None:
+                logger.info(f"Rebuilding {self._output_file_path} from all JTL files.")
+                dataframes, file_entries = self._collect_new_rows(kpi_files, {})
+                if not dataframes:
+                    logger.error("No data combined from JTL files.")
+                    return Path()
+                combined_data = concat_jtl(dataframes, ignore_index=True)
+                combined_data.to_csv(self._output_file_path, index=False)
+                manifest = {
+                    "columns": list(combined_data.columns),
+                    "rows": combined_data.shape[0],
+                }
+            elif dataframes:
+                new_data.reindex(columns=manifest["columns"]).to_csv(
+                    self._output_file_path, mode="a", header=False, index=False
+                )
+                manifest["rows"] += new_data.shape[0]
+            else:
+                logger.info("No new data in JTL files.")
+            manifest["files"] = file_entries
+            self._save_manifest(manifest)
+        except Exception as e:
+            logger.error(f"Error saving file: {e}")
+            return Path()
+
+        logger.info(f"Saved joined data to {self._output_file_path}")
+        self._file_stats(self._output_file_path, manifest["rows"])
+        return self._output_file_path
+
+    def _merge_keys(self, chunk: DataFrame, timestamp_format: Optional[str]) -> np.ndarray:
+        """
+        Returns the rows' timestamps in milliseconds, NaN where a timestamp cannot be parsed
+        with the format detected for the file.
+        """
+        timestamps = chunk[self._timestamp_column]
+        if timestamp_format == EPOCH_MILLISECONDS:
+            return pd.to_numeric(timestamps, errors="coerce").to_numpy(dtype="float64")
+        parsed_timestamps = parse_timestamps(timestamps, timestamp_format, errors="coerce")
+        keys = parsed_timestamps.asi8 / 1e6
+        keys[parsed_timestamps.isna()] = np.nan
+        return keys
+
+    def _merge_kpi_jtl(self) -> Path:
+        """
+        Merges the files by timestamp, holding back only rows that a later chunk of some file
+        may still precede: a row is written once every unfinished file has read past its
+        timestamp plus the reorder window.
+
+        The timestamp format of every file is detected from its first chunk, rows whose
+        timestamp does not parse with it are dropped and counted.
+        """
+        kpi_files = find_jtl_files(self._kpi_files_path, self._file_mask)
+        columns = self._joined_columns(kpi_files)
+        if self._timestamp_column not in columns:
+            logger.error(f"No {self._timestamp_column} column found in JTL files.")
+            return Path()
+
+        file_budget_bytes = max(1, self._memory_budget_bytes // max(1, len(kpi_files)))
+        readers = {}
+        for index, file in enumerate(kpi_files):
+            try:
+                chunk_rows = self._chunk_rows(file, file_budget_bytes)
+                readers[index] = pd.read_csv(file, chunksize=chunk_rows)
             except Exception as e:
                 logger.error(f"Error reading {file}: {e}")
+        pending = {index: [] for index in readers}
+        frontiers = {index: -np.inf for index in readers}
+        file_rows = {index: 0 for index in readers}
+        timestamp_formats = {}
+        state = {"total_rows": 0, "late_rows": 0, "unparsed_rows": 0, "last_key": -np.inf}
 
-        combined_data = pd.concat(dataframes, ignore_index=True)
-        return combined_data
+        def advance(index: int) -> None:
+            try:
+                chunk = next(readers[index]).reindex(columns=columns)
+            except StopIteration:
+                self._file_stats(kpi_files[index], file_rows[index])
+                del readers[index]
+                return
+            except Exception as e:
+                logger.error(f"Error reading {kpi_files[index]}: {e}")
+                del readers[index]
+                return
+            if index not in timestamp_formats:
+                timestamp_formats[index] = detect_timestamp_format(chunk[self._timestamp_column])
+            file_rows[index] += chunk.shape[0]
+            chunk[MERGE_KEY_COLUMN] = self._merge_keys(chunk, timestamp_formats[index])
+            is_unparsed = chunk[MERGE_KEY_COLUMN].isna()
+            if is_unparsed.any():
+                state["unparsed_rows"] += int(is_unparsed.sum())
+                chunk = chunk[~is_unparsed]
+            if not chunk.empty:
+                frontiers[index] = max(frontiers[index], chunk[MERGE_KEY_COLUMN].max())
+            pending[index].append(chunk)
+
+        def emit(output_file, bound: float) -> None:
+            ready = []
+            for index in pending:
+                if not pending[index]:
+                    continue
+                buffered = pd.concat(pending[index])
+                is_ready = buffered[MERGE_KEY_COLUMN] < bound
+                ready.append(buffered[is_ready])
+                pending[index] = [buffered[~is_ready]]
+            if not ready:
+                return
+            rows = pd.concat(ready).sort_values(MERGE_KEY_COLUMN, kind="stable")
+            if rows.empty:
+                return
+            state["late_rows"] += int((rows[MERGE_KEY_COLUMN] < state["last_key"]).sum())
+            state["last_key"] = max(state["last_key"], rows[MERGE_KEY_COLUMN].iloc[-1])
+            state["total_rows"] += rows.shape[0]
+            rows.drop(columns=MERGE_KEY_COLUMN).to_csv(output_file, header=False, index=False)
 
-    def _save_kpi_jtl(self, combined_data: DataFrame) -> Path:
         try:
-            combined_data.to_csv(self._output_file_path, index=False)
-            logger.info(f"Saved joined data to {self._output_file_path}")
-            self._file_stats(self._output_file_path, combined_data)
+            with open(self._output_file_path, "w", newline="") as output_file:
+                DataFrame(columns=columns).to_csv(output_file, index=False)
+                for index in list(readers):
+                    advance(index)
+                while readers:
+                    slowest = min(readers, key=lambda index: frontiers[index])
+                    emit(output_file, frontiers[slowest] - self._reorder_window_ms)
+                    advance(slowest)
+                emit(output_file, np.inf)
         except Exception as e:
             logger.error(f"Error saving file: {e}")
             return Path()
+
+        if state["late_rows"]:
+            logger.warning(
+                f"{state['late_rows']} rows were out of order by more than "
+                f"{self._reorder_window_ms} ms and are not in sorted position."
+            )
+        if state["unparsed_rows"]:
+            logger.warning(
+                f"{state['unparsed_rows']} rows had no parsable {self._timestamp_column} "
+                f"and were dropped."
+            )
+        if state["total_rows"] == 0:
+            logger.error("No data combined from JTL files.")
+            self._output_file_path.unlink()
+            return Path()
+
+        logger.info(f"Saved joined data to {self._output_file_path}")
+        self._file_stats(self._output_file_path, state["total_rows"])
         return self._output_file_path
 
     def process_files(self) -> Path:
+        if self._incremental:
+            return self._process_incrementally()
+        if self._merge_by_time:
+            return self._merge_kpi_jtl()
+        if self._raw_concat:
+            result_file = self._concat_raw_kpi_jtl()
+            if result_file is not None:
+                return result_file
+        if self._streaming:
+            return self._stream_kpi_jtl()
         combined_data = self._join_kpi_jtl()
         if combined_data is not None and not combined_data.empty:
             return self._save_kpi_jtl(combined_data)
@@ -95,11 +691,66 @@ def main():
     parser.add_argument(
         "--file_mask", type=str, default="kpi.jtl", help="File mask to search for files"
     )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Read JTL files in chunks and append them to the output as it goes",
+    )
+    parser.add_argument(
+        "--memory_budget_mb",
+        type=int,
+        default=256,
+        help="Memory budget for a single chunk in streaming mode, in megabytes",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to parse JTL files in parallel",
+    )
+    mode_group = parser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        "--raw_concat",
+        action="store_true",
+        help="Concatenate raw bytes of JTL files when all of them have the same header",
+    )
+    mode_group.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Append only new and changed JTL files, tracked in a manifest next to the output",
+    )
+    mode_group.add_argument(
+        "--merge_by_time",
+        action="store_true",
+        help="Merge JTL files into an output sorted by timestamp",
+    )
+    parser.add_argument(
+        "--reorder_window_ms",
+        type=int,
+        default=60000,
+        help="How far rows of a single JTL file may be out of timestamp order, in milliseconds",
+    )
+    parser.add_argument(
+        "--timestamp_column",
+        type=str,
+        default="timeStamp",
+        help="Name of the timestamp column to merge JTL files by",
+    )
     args = parser.parse_args()
 
     try:
         jtl_joiner = JTLJoiner(
-            args.kpi_files_path, args.file_mask, args.output_file_path
+            args.kpi_files_path,
+            args.file_mask,
+            args.output_file_path,
+            streaming=args.streaming,
+            memory_budget_mb=args.memory_budget_mb,
+            workers=args.workers,
+            raw_concat=args.raw_concat,
+            incremental=args.incremental,
+            merge_by_time=args.merge_by_time,
+            reorder_window_ms=args.reorder_window_ms,
+            timestamp_column=args.timestamp_column,
         )
         result_file = jtl_joiner.process_files()
         if result_file:
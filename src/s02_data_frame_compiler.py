@@ -4,38 +4,89 @@
 import argparse
 import pandas as pd
 from pathlib import Path
+from typing import List, Optional
 from pandas.core.frame import DataFrame
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.common.settings import LOGGING_CONFIG
+from src.common.compression import find_jtl_files
+from src.common.jtl_schema import ANALYSIS_COLUMNS, concat_jtl, read_jtl, read_jtl_arrow
+from src.common.prefix_index import TimeWindowIndex, write_index
+from src.common.rollups import DEFAULT_BUCKET, build_rollup, write_rollup
+from src.common.timestamps import detect_timestamp_format, parse_timestamps
 
 logging.basicConfig(**LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
 
+ENGINES = ["pandas", "pyarrow"]
+
 
 class DataFrameProcessor:
     """
     A class to process data frames for JTL (JMeter Test Logs) files.
+    The JTL file may be compressed with gzip, zstd or xz (.gz/.zst/.xz suffix).
 
     This class reads a JTL file, performs data indexing, filtering, and saving the processed data
     into a new file. It handles path validation, file reading, data indexing based on timestamps,
-    and saving the filtered data frame in the Feather format.
+    and saving the filtered data frame in the Feather format. Columns are loaded with the
+    compact types of the shared JTL schema, optionally only a subset of them, either with
+    the pandas C parser or with pyarrow's multithreaded CSV reader.
+
+    Optionally a rollup of the data frame (see src.common.rollups) is saved next to it,
+    which s03_analysis_preparator and s04_results_analyzer analyze with --rollup_file_paths
+    without reading the rows again. It has one row per label and bucket, so it is the
+    smaller the more samples a label has per bucket. The time window index of the rollup
+    (see src.common.prefix_index) can be saved as well, which s10_window_query loads.
 
     Attributes:
         file_path (Path): The file path for the input JTL file.
         output_path (Path): The file path where the processed data frame will be saved.
+        columns (List[str], optional): The JTL columns to load, all columns if None.
+        engine (str): The CSV parser engine, one of ENGINES.
+        rollup_path (Path, optional): The file path where the rollup will be saved, if any.
+        rollup_bucket (str): The length of the rollup time buckets, e.g. "1s".
+        index_path (Path, optional): The file path where the index of the rollup will be saved, if any.
         data_frame (DataFrame, optional): The pandas DataFrame loaded from the JTL file.
     """
 
-    def __init__(self, file_path: Path, output_path: Path):
+    def __init__(
+        self,
+        file_path: Path,
+        output_path: Path,
+        columns: Optional[List[str]] = None,
+        engine: str = "pandas",
+        rollup_path: Optional[Path] = None,
+        rollup_bucket: str = DEFAULT_BUCKET,
+        index_path: Optional[Path] = None,
+    ):
         """
         Initialize the DataFrameProcessor with file paths for input and output.
 
         Args:
             file_path (Path): Path to the input JTL file.
             output_path (Path): Path for saving the processed data frame.
+            columns (List[str], optional): JTL columns to load, all columns if None.
+            engine (str): CSV parser engine, "pandas" or "pyarrow".
+            rollup_path (Path, optional): Path for saving the rollup, no rollup if None.
+            rollup_bucket (str): Length of the rollup time buckets.
+            index_path (Path, optional): Path for saving the index of the rollup, no index if None.
+
+        Raises:
+            ValueError: If the engine is unknown or the rollup columns are not loaded.
         """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown parser engine: {engine}")
+        if (rollup_path is not None or index_path is not None) and columns is not None:
+            missing = {"label", "elapsed"}.difference(columns)
+            if missing:
+                raise ValueError(f"The rollup needs the columns: {' '.join(sorted(missing))}")
         self.file_path = file_path
         self.output_path = output_path
+        self.columns = columns
+        self.engine = engine
+        self.rollup_path = rollup_path
+        self.rollup_bucket = rollup_bucket
+        self.index_path = index_path
         self.data_frame = None
 
         self._validate_paths()
@@ -82,17 +133,37 @@ def _read_and_index_data(self):
                 f"Expected a file, got a directory: {self.file_path}"
             )
         try:
-            df = pd.read_csv(self.file_path, on_bad_lines="skip")
+            df = self._read_jtl_file_data(self.file_path)
             self.data_frame = self._indexing_data(df)
             logger.info("Data read and indexed successfully")
         except Exception as e:
             logger.error(f"Failed to read and index data: {e}")
             raise
 
+    def _read_jtl_file_data(self, jtl_file_path: Path) -> DataFrame:
+        """
+        Reads a JTL file with the selected parser engine, skipping bad lines.
+
+        Args:
+            jtl_file_path (Path): The JTL file to read.
+
+        Returns:
+            DataFrame: The JTL data.
+        """
+        if self.engine == "pyarrow":
+            df = read_jtl_arrow(jtl_file_path, self.columns)
+            if df is not None:
+                return df
+            logger.warning(f"Reading {jtl_file_path} with the pandas engine instead")
+        return read_jtl(jtl_file_path, self.columns, on_bad_lines="skip")
+
     def _indexing_data(self, df: DataFrame) -> DataFrame:
         """
         Indexes the DataFrame based on the 'timeStamp' column.
 
+        The timestamp representation (epoch milliseconds, epoch seconds or a fixed date
+        format) is detected from a sample, and the column is parsed once with it.
+
         Args:
             df (DataFrame): The DataFrame to be indexed.
 
@@ -101,9 +172,12 @@ def _indexing_data(self, df: DataFrame) -> DataFrame:
         """
         logger.info("Indexing data frame")
         df = df.set_index(["timeStamp"])
+        timestamp_format = detect_timestamp_format(df.index)
+        logger.info(f"Detected timestamp format: {timestamp_format}")
         try:
-            df.index = pd.to_datetime(df.index, unit="ms")
-        except ValueError:
+            df.index = parse_timestamps(df.index, timestamp_format)
+        except ValueError as e:
+            logger.warning(f"Timestamps do not match {timestamp_format}, inferring the format: {e}")
             df.index = pd.to_datetime(df.index)
         logger.info("Indexing completed")
         return df
@@ -113,9 +187,13 @@ def _filter_data_frame(self):
         Filters out rows from the DataFrame where the timestamp's year is not 1970.
         """
         logger.info("Filtering data frame")
-        self.data_frame = self.data_frame[self.data_frame.index.year != 1970]
+        self.data_frame = self._drop_epoch_start_rows(self.data_frame)
         logger.info("Filtering completed")
 
+    @staticmethod
+    def _drop_epoch_start_rows(df: DataFrame) -> DataFrame:
+        return df[df.index.year != 1970]
+
     def _save_data_frame(self):
         """
         Saves the processed DataFrame to the specified output path in Feather format.
@@ -130,31 +208,226 @@ def _save_data_frame(self):
         except Exception as e:
             logger.error(f"Error saving data frame: {e}")
             raise
+        if self.rollup_path is not None or self.index_path is not None:
+            self._save_rollup()
+
+    def _save_rollup(self):
+        """
+        Saves the rollup of the processed DataFrame to the rollup path in Feather format
+        and its time window index to the index path, each if given.
+
+        Raises:
+            Exception: If there is an error in saving the files.
+        """
+        logger.info(f"Summarizing {len(self.data_frame)} samples by {self.rollup_bucket} buckets")
+        rollup = build_rollup(self.data_frame, self.rollup_bucket)
+        try:
+            if self.rollup_path is not None:
+                logger.info(
+                    f"Saving {len(rollup)} rollup rows with {len(rollup.latency)} latency bins to {self.rollup_path}"
+                )
+                write_rollup(rollup, self.rollup_path)
+                logger.info("Rollup saved successfully")
+            if self.index_path is not None:
+                logger.info(f"Saving the time window index to {self.index_path}")
+                write_index(TimeWindowIndex.from_rollup(rollup), self.index_path)
+                logger.info("Index saved successfully")
+        except Exception as e:
+            logger.error(f"Error saving rollup: {e}")
+            raise
+
+
+class JTLDirectoryProcessor(DataFrameProcessor):
+    """
+    A class to build the processed data frame straight from a directory of JTL files.
+
+    Files matching the mask, optionally with a .gz/.zst/.xz suffix, are read, indexed and filtered one by one and then concatenated,
+    so the combined CSV of s01_jtl_joiner is neither written nor parsed again.
+
+    Attributes:
+        file_path (Path): The directory with JTL files.
+        file_mask (str): The mask the JTL file names end with.
+        workers (int): The number of processes reading files in parallel.
+    """
+
+    def __init__(
+        self,
+        kpi_files_path: Path,
+        file_mask: str,
+        output_path: Path,
+        workers: int = 1,
+        columns: Optional[List[str]] = None,
+        engine: str = "pandas",
+        rollup_path: Optional[Path] = None,
+        rollup_bucket: str = DEFAULT_BUCKET,
+        index_path: Optional[Path] = None,
+    ):
+        """
+        Initialize the JTLDirectoryProcessor with the JTL directory and the output path.
+
+        Args:
+            kpi_files_path (Path): Path to the directory with JTL files.
+            file_mask (str): File mask to search for files.
+            output_path (Path): Path for saving the processed data frame.
+            workers (int): Number of processes reading files in parallel.
+            columns (List[str], optional): JTL columns to load, all columns if None.
+            engine (str): CSV parser engine, "pandas" or "pyarrow".
+            rollup_path (Path, optional): Path for saving the rollup, no rollup if None.
+            rollup_bucket (str): Length of the rollup time buckets.
+            index_path (Path, optional): Path for saving the index of the rollup, no index if None.
+        """
+        self.file_mask = file_mask
+        self.workers = workers
+        super().__init__(kpi_files_path, output_path, columns, engine, rollup_path, rollup_bucket, index_path)
+
+    def _validate_paths(self):
+        """
+        Validates the existence of the JTL directory and output directory.
+
+        Raises:
+            FileNotFoundError: If the JTL directory is not found.
+            NotADirectoryError: If the JTL path is not a directory.
+        """
+        if not self.file_path.exists():
+            logger.error(f"JTL directory does not exist: {self.file_path}")
+            raise FileNotFoundError(f"JTL directory not found: {self.file_path}")
+        if not self.file_path.is_dir():
+            logger.error(f"The provided path is not a directory: {self.file_path}")
+            raise NotADirectoryError(f"Expected a directory, got a file: {self.file_path}")
+
+        if not self.output_path.parent.exists():
+            logger.info(
+                f"Creating directory for output file: {self.output_path.parent}"
+            )
+            self.output_path.parent.mkdir(parents=True)
+
+    def _read_jtl_file(self, jtl_file_path: Path) -> DataFrame:
+        df = self._read_jtl_file_data(jtl_file_path)
+        return self._drop_epoch_start_rows(self._indexing_data(df))
+
+    def _read_and_index_data(self):
+        """
+        Reads, indexes and filters every JTL file of the directory and concatenates them.
+
+        Raises:
+            ValueError: If no data was read from the JTL files.
+        """
+        logger.info(f"Reading and indexing JTL files from {self.file_path}")
+        jtl_files = find_jtl_files(self.file_path, self.file_mask)
+
+        data_frames = []
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                futures = [executor.submit(self._read_jtl_file, file) for file in jtl_files]
+                for file, future in zip(jtl_files, futures):
+                    try:
+                        data_frames.append(future.result())
+                    except Exception as e:
+                        logger.error(f"Error reading {file}: {e}")
+        else:
+            for file in jtl_files:
+                try:
+                    data_frames.append(self._read_jtl_file(file))
+                except Exception as e:
+                    logger.error(f"Error reading {file}: {e}")
+
+        if not data_frames:
+            logger.error(f"No data read from JTL files in {self.file_path}")
+            raise ValueError(f"No JTL data found in {self.file_path}")
+        self.data_frame = concat_jtl(data_frames)
+        logger.info("Data read and indexed successfully")
 
 
 def main():
     """
     Main function to parse command line arguments and initiate data frame processing.
-    Parses arguments for the JTL file path and the output file path, and then processes
-    the JTL file using DataFrameProcessor.
+    Parses arguments for the JTL file path (or the directory with raw JTL files) and the
+    output file path, and then processes the JTL data using DataFrameProcessor.
     """
     parser = argparse.ArgumentParser(description="Process and filter JTL files.")
-    parser.add_argument(
+    input_group = parser.add_mutually_exclusive_group(required=True)
+    input_group.add_argument(
         "--jtl_file_path",
         type=Path,
-        required=True,
         help="Full path to the joined JTL file",
     )
+    input_group.add_argument(
+        "--kpi_files_path",
+        type=Path,
+        help="Path to directories with raw JTL files to ingest without joining them first",
+    )
+    parser.add_argument(
+        "--file_mask", type=str, default="kpi.jtl", help="File mask to search for files"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used to read raw JTL files in parallel",
+    )
+    parser.add_argument(
+        "--columns",
+        type=str,
+        nargs="+",
+        help=f"JTL columns to load, all columns by default. "
+        f"Downstream stages use: {' '.join(ANALYSIS_COLUMNS)}",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        choices=ENGINES,
+        default="pandas",
+        help="CSV parser engine: the pandas C parser or the multithreaded pyarrow reader",
+    )
     parser.add_argument(
         "--output_file_path",
         type=Path,
         required=True,
         help="Path to save the processed DataFrame",
     )
+    parser.add_argument(
+        "--rollup_file_path",
+        type=Path,
+        help="Path to also save a rollup of the DataFrame, which s03 and s04 can analyze "
+        "with --rollup_file_paths instead of the rows",
+    )
+    parser.add_argument(
+        "--rollup_bucket",
+        type=str,
+        default=DEFAULT_BUCKET,
+        help="Length of the rollup time buckets, the series interval of s04 must be a multiple of it",
+    )
+    parser.add_argument(
+        "--index_file_path",
+        type=Path,
+        help="Path to also save the time window index of the rollup, which s10 queries "
+        "with --index_file_paths",
+    )
     args = parser.parse_args()
 
     try:
-        processor = DataFrameProcessor(args.jtl_file_path, args.output_file_path)
+        if args.kpi_files_path is not None:
+            processor = JTLDirectoryProcessor(
+                args.kpi_files_path,
+                args.file_mask,
+                args.output_file_path,
+                args.workers,
+                args.columns,
+                args.engine,
+                args.rollup_file_path,
+                args.rollup_bucket,
+                args.index_file_path,
+            )
+        else:
+            processor = DataFrameProcessor(
+                args.jtl_file_path,
+                args.output_file_path,
+                args.columns,
+                args.engine,
+                args.rollup_file_path,
+                args.rollup_bucket,
+                args.index_file_path,
+            )
         processor.process_data_frame()
     except Exception as e:
         logger.error(f"An error occurred: {e}")
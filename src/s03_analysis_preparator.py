@@ -1,4 +1,3 @@
-import json
 import argparse
 import logging
 import sys
@@ -7,6 +6,8 @@
 import pandas as pd
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.common.range_models import *
+from src.common.rollups import get_rollup_labels, get_rollup_times, merge_rollups, read_rollup
+from src.common.results_io import dump_results
 from pathlib import Path
 from pandas.core.frame import DataFrame
 from datetime import datetime, timedelta
@@ -125,6 +126,7 @@ def main():
     parser.add_argument("--ranges_count", type=str, default="1", help="Test ranges count")
     parser.add_argument("--duration_range_seconds", type=str, default="600", help="Duration range seconds")
     parser.add_argument("--ramp_down_seconds", type=str, default="30", help="Ramp down seconds")
+    parser.add_argument("--rollup_file_paths", type=Path, nargs="+", help="Prepare the analysis of s00_generator_summarizer rollups instead of the data_frame file")
     parser.add_argument("--results_file_path", type=Path, default=Path("results.json"), help="Path to the resulting analysis json file")
 
     args = parser.parse_args()
@@ -136,15 +138,19 @@ def main():
     DURATION_RANGE_SECONDS =abs(int(args.duration_range_seconds))
     RAMP_DOWN_SECONDS = abs(int(args.ramp_down_seconds))
 
-    data_frame = pd.read_feather(PATH)
-    TEST_START_DATETIME: datetime = data_frame.index.min()
-    TEST_END_DATETIME: datetime = data_frame.index.max()
+    if args.rollup_file_paths:
+        rollup = merge_rollups([read_rollup(path) for path in args.rollup_file_paths])
+        TEST_START_DATETIME, TEST_END_DATETIME = get_rollup_times(rollup)
+        unique_labels = get_rollup_labels(rollup)
+    else:
+        data_frame = pd.read_feather(PATH)
+        TEST_START_DATETIME: datetime = data_frame.index.min()
+        TEST_END_DATETIME: datetime = data_frame.index.max()
+        unique_labels = get_unique_labels(data_frame)
     FULL_TEST_DURATION_SECONDS = int(TEST_END_DATETIME.timestamp()) - int(TEST_START_DATETIME.timestamp())
 
     RESULTS_FILE = args.results_file_path
 
-    unique_labels = get_unique_labels(data_frame)
-
     test_times = get_test_times(
         current_datetime=TEST_START_DATETIME,
         test_end_datetime=TEST_END_DATETIME,
@@ -161,8 +167,7 @@ def main():
     test_data['unique_labels'] = unique_labels
     result_file_path = Path(RESULTS_FILE)
 
-    with open(result_file_path, 'w') as data_file:
-        json.dump(test_data, data_file, indent=4, cls=GBEncoder)
+    dump_results(test_data, result_file_path)
     logging.info("Prepared test data successfully saved to JSON file {RESULTS_FILE}")
 
 if __name__ == "__main__":
@@ -1,19 +1,56 @@
 import os
 import sys
-import json
 import logging
 import argparse
+import tempfile
+import numpy as np
 import pandas as pd
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional, Set, Tuple
 from pandas.core.frame import DataFrame
+from concurrent.futures import ProcessPoolExecutor
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from src.common.range_models import TestTimes, TimeRange
-from src.common.range_models import GBEncoder
+from src.common.percentiles import DEFAULT_PERCENTILES, grouped_percentiles, parse_percentiles
+from src.common.histograms import (
+    LATENCY_RELATIVE_ERROR,
+    LatencyHistogram,
+    RangeHistograms,
+    range_segments,
+    time_segments,
+)
+from src.common.jtl_schema import TIMESTAMP_COLUMN
+from src.common.sketches import DEFAULT_RELATIVE_ERROR, RangeSketches
+from src.common.result_cache import DEFAULT_MAX_BYTES, MISSING, ResultCache, file_digest
+from src.common.series_store import SERIES_FILE_KEY, extract_series, series_file_pointer, write_series
+from src.common.results_io import dump_results, load_results_sections
+from src.common.rollups import (
+    SUM_PREFIX,
+    Rollup,
+    get_sum_columns,
+    merge_rollups,
+    read_rollup,
+    rollup_histogram,
+    select_range,
+)
+
+# "sort" calculates the statistics of every range from its rows, "histogram" merges
+# exact latency histograms of the time segments between range boundaries.
+STATS_BACKENDS = ["sort", "histogram"]
+DEFAULT_FREQ = "30s"
+# Partial series sums of a label kept from separate record batches before they are merged.
+MAX_PENDING_BATCHES = 32
 
 
 def calculate_test(
-    data_frame: DataFrame, test_times: TestTimes, unique_labels: List[str], freq: str
+    data_frame: DataFrame,
+    test_times: TestTimes,
+    unique_labels: List[str],
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+    backend: str = "sort",
+    workers: int = 1,
+    result_cache: Optional[ResultCache] = None,
 ) -> Dict:
     """
     Perform a comprehensive analysis for the given test data.
@@ -22,20 +59,749 @@ def calculate_test(
     test_times (TestTimes): TestTimes object containing test time data.
     unique_labels (List[str]): List of unique labels in the DataFrame.
     freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    backend (str): One of STATS_BACKENDS.
+    workers (int): Number of processes calculating ranges and labels in parallel.
+    result_cache (Optional[ResultCache]): Cache of the results of ranges and labels of
+        the data, only the missing results are calculated.
     Returns:
     Dict: A dictionary containing the analysis results.
     """
     descriptive_analysis_results = {}
+    data_frame = sort_by_time(data_frame)
+    range_histograms = None
+    if backend == "histogram":
+        range_histograms = build_range_histograms(data_frame, test_times)
+    if workers > 1:
+        return calculate_test_in_parallel(
+            data_frame, test_times, unique_labels, freq, percentiles, range_histograms, workers, result_cache
+        )
     for range_obj in test_times.get_all_ranges():
         descriptive_analysis_results[range_obj.full_range_name] = {}
-        range_data = calculate_range(range_obj, data_frame, unique_labels, freq)
+        range_data = calculate_range(
+            range_obj, data_frame, unique_labels, freq, percentiles, range_histograms, result_cache
+        )
         descriptive_analysis_results[range_obj.full_range_name] = range_data
         logging.info(range_obj.full_range_name, "completed")
     return descriptive_analysis_results
 
 
+def calculate_test_in_parallel(
+    data_frame: DataFrame,
+    test_times: TestTimes,
+    unique_labels: List[str],
+    freq: str,
+    percentiles: Dict[str, float],
+    range_histograms: Optional[RangeHistograms],
+    workers: int,
+    result_cache: Optional[ResultCache] = None,
+) -> Dict:
+    """
+    Perform the analysis spreading (range, label) work units over a process pool.
+    The sorted DataFrame is shared with the workers through a memory-mapped, uncompressed
+    Arrow file instead of being pickled, and the results are assembled in the serial order.
+    Parameters:
+    data_frame (DataFrame): Input DataFrame sorted by its time index.
+    test_times (TestTimes): TestTimes object containing test time data.
+    unique_labels (List[str]): List of unique labels in the DataFrame.
+    freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    range_histograms (Optional[RangeHistograms]): Histograms of the histogram backend.
+    workers (int): Number of processes.
+    result_cache (Optional[ResultCache]): Cache of the results of the work units.
+    Returns:
+    Dict: A dictionary containing the analysis results.
+    """
+    ranges = test_times.get_all_ranges()
+    work_units = [
+        (range_index, label_name)
+        for range_index in range(len(ranges))
+        for label_name in [None] + list(dict.fromkeys(unique_labels))
+    ]
+    results = {}
+    unit_keys = {}
+    if result_cache is not None:
+        for range_index, label_name in work_units:
+            unit_key = result_key(result_cache, ranges[range_index], label_name, freq, percentiles)
+            cached = result_cache.get(unit_key)
+            if cached is MISSING:
+                unit_keys[(range_index, label_name)] = unit_key
+            else:
+                results[(range_index, label_name)] = cached
+        work_units = list(unit_keys)
+    if work_units:
+        results.update(
+            _calculate_work_units_in_parallel(
+                data_frame, ranges, work_units, freq, percentiles, range_histograms, workers
+            )
+        )
+    for work_unit, unit_key in unit_keys.items():
+        result_cache.put(unit_key, results[work_unit])
+
+    descriptive_analysis_results = {}
+    for range_index, range_obj in enumerate(ranges):
+        range_data = {}
+        range_data["summary_range_results"] = results[(range_index, None)]
+        range_data["by_transactions_range_results"] = {}
+        for label_name in unique_labels:
+            range_data["by_transactions_range_results"][label_name.strip()] = results[
+                (range_index, label_name)
+            ]
+        descriptive_analysis_results[range_obj.full_range_name] = range_data
+    return descriptive_analysis_results
+
+
+def _calculate_work_units_in_parallel(
+    data_frame: DataFrame,
+    ranges: List[TimeRange],
+    work_units: List,
+    freq: str,
+    percentiles: Dict[str, float],
+    range_histograms: Optional[RangeHistograms],
+    workers: int,
+) -> Dict:
+    """
+    Calculate (range index, label) work units in a process pool, returning the results by unit.
+    """
+    import pyarrow as pa
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        arrow_path = Path(shared_dir, "data_frame.arrow")
+        table = pa.Table.from_pandas(data_frame)
+        with pa.OSFile(str(arrow_path), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        del table
+        # Consecutive units of a range go to the same worker, which slices the range once
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(arrow_path, ranges, freq, percentiles, range_histograms),
+        ) as executor:
+            results = dict(
+                zip(
+                    work_units,
+                    executor.map(
+                        _calculate_work_unit,
+                        work_units,
+                        chunksize=max(1, len(work_units) // (workers * 4)),
+                    ),
+                )
+            )
+    return results
+
+
+_worker_state: Dict = {}
+
+
+def _init_worker(arrow_path: Path, ranges: List[TimeRange], freq: str, percentiles, range_histograms):
+    """
+    Open the memory-mapped DataFrame in a worker process.
+    """
+    import pyarrow as pa
+
+    source = pa.memory_map(str(arrow_path))
+    table = pa.ipc.open_file(source).read_all()
+    _worker_state.clear()
+    _worker_state.update(
+        data_frame=table.to_pandas(split_blocks=True),
+        ranges=ranges,
+        freq=freq,
+        percentiles=percentiles,
+        range_histograms=range_histograms,
+        range_index=None,
+    )
+
+
+def _calculate_work_unit(work_unit):
+    """
+    Calculate the statistics of a range (label None) or of a label within a range.
+    """
+    range_index, label_name = work_unit
+    state = _worker_state
+    range_obj = state["ranges"][range_index]
+    if state["range_index"] != range_index:
+        state["range_data_frame"] = slice_range(range_obj, state["data_frame"])
+        state["label_positions"] = (
+            state["range_data_frame"].groupby("label", sort=False, observed=True).indices
+        )
+        state["range_index"] = range_index
+    range_data_frame = state["range_data_frame"]
+    range_histograms = state["range_histograms"]
+
+    if range_histograms is None:
+        if label_name is None:
+            return calculate_data_frame(range_data_frame, state["freq"], percentiles=state["percentiles"])
+        if label_name not in state["label_positions"]:
+            return None
+        df_label = range_data_frame.iloc[state["label_positions"][label_name]]
+        return calculate_data_frame(df_label, state["freq"], label_name, state["percentiles"])
+
+    summary = range_histograms.summarize(range_obj.start_time.epoch, range_obj.end_time.epoch, label_name)
+    transaction_data = histogram_statistics(*summary, state["percentiles"])
+    if label_name is not None and transaction_data is not None:
+        df_label = range_data_frame.iloc[state["label_positions"][label_name]]
+        transaction_data.update(calculate_series_fields(df_label, state["freq"]))
+    return transaction_data
+
+
+def calculate_test_approximately(
+    data_frame_path: Path,
+    test_times: TestTimes,
+    unique_labels: List[str],
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+    relative_error: float = DEFAULT_RELATIVE_ERROR,
+) -> Dict:
+    """
+    Perform the analysis streaming the Feather file in record batches, for tests that
+    do not fit in memory. Percentiles are estimated with quantile sketches within the
+    relative error, the other statistics and the series are exact.
+    Parameters:
+    data_frame_path (Path): Path to the Feather file written by s02_data_frame_compiler.
+    test_times (TestTimes): TestTimes object containing test time data.
+    unique_labels (List[str]): List of unique labels in the DataFrame.
+    freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    relative_error (float): Relative error bound of the percentiles.
+    Returns:
+    Dict: A dictionary containing the analysis results.
+    """
+    boundaries = [
+        epoch
+        for range_obj in test_times.get_all_ranges()
+        for epoch in (range_obj.start_time.epoch, range_obj.end_time.epoch)
+    ]
+    range_sketches = RangeSketches(boundaries, relative_error)
+    series_sums = SeriesSums(range_sketches.edges, freq, test_times.full_test.start_time.epoch)
+    for batch_data_frame in read_record_batches(data_frame_path):
+        add_record_batch(range_sketches, series_sums, batch_data_frame)
+    return summarize_sketches(range_sketches, series_sums, test_times, unique_labels, percentiles)
+
+
+def add_record_batch(
+    range_sketches: RangeSketches,
+    series_sums: "SeriesSums",
+    data_frame: DataFrame,
+    dirty_keys: Optional[Set[Tuple[int, object]]] = None,
+) -> None:
+    """
+    Add a batch of rows indexed by time to the sketches and series sums.
+    Rows without a success flag are counted neither as successes nor as failures.
+    Parameters:
+    range_sketches (RangeSketches): Sketches to add the rows to.
+    series_sums (SeriesSums): Series sums with the same edges as range_sketches.
+    data_frame (DataFrame): The rows indexed by time.
+    dirty_keys (Set[Tuple[int, object]], optional): Set the (segment, label) pairs of the rows are added to.
+    """
+    if dirty_keys is not None:
+        touched = pd.DataFrame(
+            {
+                "segment": time_segments(range_sketches.edges, data_frame.index.asi8),
+                "label": data_frame["label"].to_numpy(),
+            }
+        ).drop_duplicates()
+        dirty_keys.update(zip(touched["segment"].tolist(), touched["label"].tolist()))
+    success = data_frame.get("success", pd.Series(np.nan, index=data_frame.index))
+    range_sketches.add(
+        data_frame.index.asi8,
+        data_frame["label"],
+        data_frame["elapsed"],
+        success.eq(True),
+        success.eq(False),
+    )
+    series_sums.add(data_frame.drop(columns=["responseCode"], errors="ignore"))
+
+
+def summarize_sketches(
+    range_sketches: RangeSketches,
+    series_sums: "SeriesSums",
+    test_times: TestTimes,
+    unique_labels: List[str],
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+    previous_results: Optional[Dict] = None,
+    dirty_keys: Optional[Set[Tuple[int, object]]] = None,
+) -> Dict:
+    """
+    Build the analysis results of every range and label from sketches and series sums.
+
+    Given the results of a previous call and the (segment, label) pairs add_record_batch
+    marked dirty since, only the ranges and labels with new rows are summarized again.
+    If the sketches and series sums track the ranges, that costs time proportional to
+    the intervals with new rows rather than to the length of the ranges.
+    Parameters:
+    range_sketches (RangeSketches): Sketches with the range boundaries of test_times.
+    series_sums (SeriesSums): Series sums with the same edges as range_sketches.
+    test_times (TestTimes): TestTimes object containing test time data.
+    unique_labels (List[str]): List of unique labels.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    previous_results (Dict, optional): The results of a previous call, with the same test_times.
+    dirty_keys (Set[Tuple[int, object]], optional): The pairs with rows added since previous_results.
+    Returns:
+    Dict: A dictionary containing the analysis results.
+    """
+    previous_results = previous_results or {}
+    dirty_keys = dirty_keys or set()
+    descriptive_analysis_results = {}
+    for range_obj in test_times.get_all_ranges():
+        start_epoch, end_epoch = range_obj.start_time.epoch, range_obj.end_time.epoch
+        segments = range(2 * len(range_sketches.edges) + 1)[range_segments(range_sketches.edges, start_epoch, end_epoch)]
+        dirty_labels = {label for segment, label in dirty_keys if segment in segments}
+        previous_data = previous_results.get(range_obj.full_range_name, {})
+        previous_transactions = previous_data.get("by_transactions_range_results", {})
+        range_data = {}
+        if dirty_labels or "summary_range_results" not in previous_data:
+            range_data["summary_range_results"] = histogram_statistics(
+                *range_sketches.summarize(start_epoch, end_epoch), percentiles
+            )
+        else:
+            range_data["summary_range_results"] = previous_data["summary_range_results"]
+        transactions_data = {}
+        summarized_labels = []
+        for label_name in unique_labels:
+            if label_name not in dirty_labels and label_name.strip() in previous_transactions:
+                transactions_data[label_name.strip()] = previous_transactions[label_name.strip()]
+                continue
+            transaction_data = histogram_statistics(
+                *range_sketches.summarize(start_epoch, end_epoch, label_name), percentiles
+            )
+            if transaction_data is not None:
+                summarized_labels.append(label_name)
+            transactions_data[label_name.strip()] = transaction_data
+        label_series = series_sums.series_fields(start_epoch, end_epoch, summarized_labels)
+        for label_name in summarized_labels:
+            transactions_data[label_name.strip()].update(label_series[label_name])
+        range_data["by_transactions_range_results"] = transactions_data
+        descriptive_analysis_results[range_obj.full_range_name] = range_data
+        logging.info(f"{range_obj.full_range_name} completed")
+    return descriptive_analysis_results
+
+
+def calculate_rollup_test(
+    rollup: Rollup,
+    test_times: TestTimes,
+    unique_labels: List[str],
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+) -> Dict:
+    """
+    Perform the analysis from a rollup of the samples, e.g. merged from the summaries
+    of s00_generator_summarizer, without the raw samples. Percentiles are estimated from
+    the latency bins of the rollup within LATENCY_RELATIVE_ERROR, the other statistics
+    are exact and range boundaries are resolved to the rollup buckets.
+    Parameters:
+    rollup (Rollup): Rollup of the samples, see src.common.rollups.
+    test_times (TestTimes): TestTimes object containing test time data.
+    unique_labels (List[str]): List of unique labels.
+    freq (str): Frequency string for resampling time-series data, a multiple of the bucket.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    Returns:
+    Dict: A dictionary containing the analysis results.
+    """
+    bucket = pd.Timedelta(rollup.bucket).value
+    for series_freq in parse_freqs(freq):
+        if pd.Timedelta(series_freq).value % bucket:
+            logging.warning(f"Series interval {series_freq} is not a multiple of the rollup bucket")
+    descriptive_analysis_results = {}
+    for range_obj in test_times.get_all_ranges():
+        range_rollup = select_range(rollup, range_obj.start_time.epoch, range_obj.end_time.epoch)
+        range_data = {}
+        range_data["summary_range_results"] = rollup_statistics(range_rollup, percentiles)
+        label_rollups = range_rollup.split_by_label()
+        label_series = calculate_rollup_series(range_rollup, freq)
+        transactions_data = {}
+        for label_name in unique_labels:
+            transaction_data = None
+            if label_name in label_rollups:
+                transaction_data = rollup_statistics(label_rollups[label_name], percentiles)
+                transaction_data.update(label_series[label_name])
+            transactions_data[label_name.strip()] = transaction_data
+        range_data["by_transactions_range_results"] = transactions_data
+        descriptive_analysis_results[range_obj.full_range_name] = range_data
+        logging.info(f"{range_obj.full_range_name} completed")
+    return descriptive_analysis_results
+
+
+def rollup_statistics(rollup: Rollup, percentiles: Dict[str, float]) -> Optional[Dict]:
+    """
+    Build the summary statistics of rollup rows.
+    Parameters:
+    rollup (Rollup): Rollup rows.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    Returns:
+    Optional[Dict]: A dictionary containing summary statistics, None without samples.
+    """
+    return histogram_statistics(
+        rollup_histogram(rollup),
+        rollup.stats["count"].sum(),
+        rollup.stats["successes"].sum(),
+        rollup.stats["failures"].sum(),
+        percentiles,
+    )
+
+
+def calculate_rollup_series(rollup: Rollup, freq) -> Dict:
+    """
+    Build the series fields of calculate_series_fields of every label from the sums of rollup rows.
+    Parameters:
+    rollup (Rollup): Rollup rows.
+    freq (str or List[str]): Frequency string or strings, see parse_freqs.
+    Returns:
+    Dict: The series fields, see series_fields, by label.
+    """
+    label_codes, labels = pd.factorize(rollup.stats["label"])
+    stats = rollup.stats[label_codes >= 0]
+    label_codes = label_codes[label_codes >= 0]
+    columns = get_sum_columns(rollup)
+    sums = stats[[SUM_PREFIX + column for column in columns]].set_axis(columns, axis=1)
+    counts = pd.DataFrame(
+        np.repeat(stats["count"].to_numpy()[:, np.newaxis], len(columns), axis=1),
+        index=sums.index,
+        columns=columns,
+    )
+    starts = stats["bucket"].to_numpy().astype(np.int64)
+    origins = day_origins(label_codes, stats["ts_min"].to_numpy(), len(labels))
+    series_by_freq = {
+        series_freq: aggregate_series(sums, counts, label_codes, starts, origins, series_freq)
+        for series_freq in parse_freqs(freq)
+    }
+    return {
+        label: series_fields({series_freq: series.get(code, {}) for series_freq, series in series_by_freq.items()})
+        for code, label in enumerate(labels)
+    }
+
+
+def read_record_batches(data_frame_path: Path):
+    """
+    Read a Feather file one record batch at a time.
+    Parameters:
+    data_frame_path (Path): Path to the Feather file.
+    Returns:
+    Iterator[DataFrame]: The record batches indexed by time.
+    """
+    import pyarrow as pa
+
+    with pa.memory_map(str(data_frame_path)) as source:
+        reader = pa.ipc.open_file(source)
+        for i in range(reader.num_record_batches):
+            batch_data_frame = reader.get_batch(i).to_pandas()
+            if TIMESTAMP_COLUMN in batch_data_frame.columns:
+                batch_data_frame = batch_data_frame.set_index(TIMESTAMP_COLUMN)
+            yield batch_data_frame
+
+
+class SeriesSums:
+    """
+    Sums and counts of the numeric columns by label, time segment and base series
+    interval, accumulated batch by batch to build the same series as calculate_series.
+
+    The partial sums of every batch are appended to arrays by label and only reduced
+    when the series of a label are built, so adding a batch costs time proportional
+    to the batch, not to the sums accumulated so far.
+
+    Intervals start at the midnight of the test start, which is where calculate_series
+    starts them unless a range begins on a later day and freq does not divide a day.
+
+    Given the ranges to track, the partial sums are kept only until the next series are
+    built, which adds them to an IntervalSeries of every tracked range and frequency.
+    Building series then costs time proportional to the intervals with new rows, and
+    only tracked ranges have series.
+    """
+
+    def __init__(self, edges: np.ndarray, freq, start_epoch: int, ranges: Optional[List[Tuple[int, int]]] = None):
+        self.edges = edges
+        self.freqs = parse_freqs(freq)
+        self.base = base_interval(self.freqs)
+        day = pd.Timedelta(days=1).value
+        self.origin = start_epoch - start_epoch % day
+        self.columns: List[str] = []
+        # Segments, interval starts, sums and counts of a label, merged and sorted by segment
+        self.merged: Dict[object, Tuple[np.ndarray, ...]] = {}
+        self.pending: Dict[object, List[Tuple[np.ndarray, ...]]] = {}
+        # Labels, segments, interval starts, sums and counts of the batches added since the
+        # series of the tracked ranges were built, and those series by range and frequency
+        self.new_sums: List[Tuple[np.ndarray, ...]] = []
+        self.range_series: Dict[Tuple[int, int], Dict[str, IntervalSeries]] = {
+            range_key: {series_freq: IntervalSeries(series_freq) for series_freq in self.freqs}
+            for range_key in ranges or []
+        }
+
+    def add(self, data_frame: DataFrame) -> None:
+        """
+        Add the rows of a batch indexed by time.
+        """
+        numeric_data = data_frame.select_dtypes(include=["number", "bool"])
+        self.columns.extend(column for column in numeric_data.columns if column not in self.columns)
+        numeric_data = numeric_data.reindex(columns=self.columns)
+        timestamps = data_frame.index.asi8
+        keys = [
+            data_frame["label"].to_numpy(),
+            time_segments(self.edges, timestamps),
+            self.origin + (timestamps - self.origin) // self.base * self.base,
+        ]
+        grouped = numeric_data.groupby(keys)
+        sums, counts = grouped.sum(), grouped.count()
+        label_values = sums.index.get_level_values(0)
+        batch_sums = (
+            sums.index.get_level_values(1).to_numpy(),
+            sums.index.get_level_values(2).to_numpy(),
+            sums.to_numpy(dtype=np.float64),
+            counts.to_numpy(dtype=np.int64),
+        )
+        if self.range_series:
+            self.new_sums.append((label_values.to_numpy(), *batch_sums))
+            return
+        label_starts = np.flatnonzero(np.r_[True, label_values[1:] != label_values[:-1]])
+        for start, end in zip(label_starts, np.r_[label_starts[1:], len(sums)]):
+            label_pending = self.pending.setdefault(label_values[start], [])
+            label_pending.append(tuple(values[start:end] for values in batch_sums))
+            if len(label_pending) >= MAX_PENDING_BATCHES:
+                self._merge(label_values[start])
+
+    def _merge_into_ranges(self) -> None:
+        """
+        Adds the partial sums of the batches added since the last call to the series of the
+        tracked ranges, summed by label and interval of every frequency.
+        """
+        if not self.new_sums:
+            return
+        width = len(self.columns)
+        labels, segments, starts, sums, counts = (
+            np.concatenate([partial[0] for partial in self.new_sums]),
+            np.concatenate([partial[1] for partial in self.new_sums]),
+            np.concatenate([partial[2] for partial in self.new_sums]),
+            # Columns that appeared in later batches have no sums in earlier ones
+            np.concatenate([np.pad(partial[3], ((0, 0), (0, width - partial[3].shape[1]))) for partial in self.new_sums]),
+            np.concatenate([np.pad(partial[4], ((0, 0), (0, width - partial[4].shape[1]))) for partial in self.new_sums]),
+        )
+        self.new_sums = []
+        interval_ends = {}
+        for series_freq in self.freqs:
+            interval = pd.Timedelta(series_freq).value
+            interval_ends[series_freq] = self.origin + ((starts - self.origin) // interval + 1) * interval
+        for range_key, series_by_freq in self.range_series.items():
+            range_slice = range_segments(self.edges, *range_key)
+            in_range = (segments >= range_slice.start) & (segments < range_slice.stop)
+            if not in_range.any():
+                continue
+            for series_freq, interval_series in series_by_freq.items():
+                keys = pd.MultiIndex.from_arrays([labels[in_range], interval_ends[series_freq][in_range]])
+                range_sums = pd.DataFrame(sums[in_range]).set_axis(keys).groupby(level=[0, 1]).sum()
+                range_counts = pd.DataFrame(counts[in_range]).set_axis(keys).groupby(level=[0, 1]).sum()
+                interval_series.add(
+                    range_sums.index.get_level_values(0).to_numpy(),
+                    range_sums.index.get_level_values(1).to_numpy(),
+                    range_sums.to_numpy(dtype=np.float64),
+                    range_counts.to_numpy(dtype=np.int64),
+                )
+
+    def _merge(self, label_name) -> Optional[Tuple[np.ndarray, ...]]:
+        """
+        Merges the pending partial sums of a label into its sums sorted by segment.
+        """
+        partials = self.pending.pop(label_name, [])
+        if label_name in self.merged:
+            partials.insert(0, self.merged[label_name])
+        if not partials:
+            return None
+        width = len(self.columns)
+        segments, starts, sums, counts = (
+            np.concatenate([partial[0] for partial in partials]),
+            np.concatenate([partial[1] for partial in partials]),
+            # Columns that appeared in later batches have no sums in earlier ones
+            np.concatenate([np.pad(partial[2], ((0, 0), (0, width - partial[2].shape[1]))) for partial in partials]),
+            np.concatenate([np.pad(partial[3], ((0, 0), (0, width - partial[3].shape[1]))) for partial in partials]),
+        )
+        order = np.argsort(segments, kind="stable")
+        self.merged[label_name] = (segments[order], starts[order], sums[order], counts[order])
+        return self.merged[label_name]
+
+    def series_fields(self, start_epoch: int, end_epoch: int, label_names: List[str]) -> Dict:
+        """
+        Build the series fields of labels within a range by label, aggregating the sums
+        of all labels at once. The series of a tracked range are updated in place by
+        later calls.
+        """
+        if self.range_series:
+            if (start_epoch, end_epoch) not in self.range_series:
+                raise ValueError(f"Range from {start_epoch} to {end_epoch} is not tracked")
+            self._merge_into_ranges()
+            series_by_freq = self.range_series[(start_epoch, end_epoch)]
+            return {
+                label_name: series_fields(
+                    {
+                        series_freq: interval_series.update(label_name, self.columns)
+                        for series_freq, interval_series in series_by_freq.items()
+                    }
+                )
+                for label_name in label_names
+            }
+        segments = range_segments(self.edges, start_epoch, end_epoch)
+        parts = []
+        for code, label_name in enumerate(label_names):
+            merged = self._merge(label_name)
+            if merged is not None:
+                first, last = np.searchsorted(merged[0], [segments.start, segments.stop])
+                parts.append((np.full(last - first, code, dtype=np.intp), *(values[first:last] for values in merged[1:])))
+        series_by_freq = {series_freq: {} for series_freq in self.freqs}
+        if parts:
+            # Merged sums have a column for every column seen so far
+            group_codes, starts, sums, counts = (np.concatenate(values) for values in zip(*parts))
+            sums = pd.DataFrame(sums, columns=self.columns)
+            counts = pd.DataFrame(counts, columns=self.columns)
+            origins = np.full(len(label_names), self.origin)
+            for series_freq in self.freqs:
+                series_by_freq[series_freq] = aggregate_series(sums, counts, group_codes, starts, origins, series_freq)
+        return {
+            label_name: series_fields({series_freq: series.get(code, {}) for series_freq, series in series_by_freq.items()})
+            for code, label_name in enumerate(label_names)
+        }
+
+
+class IntervalSeries:
+    """
+    Sums and counts of the numeric columns by label and interval of one frequency within
+    a range, and the series of their means by label.
+
+    Adding sums marks their intervals changed and updating the series of a label
+    recalculates the means of its changed intervals only, so it costs time proportional
+    to the intervals with new rows, not to the length of the series.
+    """
+
+    def __init__(self, freq: str):
+        self.interval = pd.Timedelta(freq).value
+        # Row of the sums and counts of every label and interval end
+        self.rows: Dict[Tuple[object, int], int] = {}
+        self.sums = np.zeros((0, 0), dtype=np.float64)
+        self.counts = np.zeros((0, 0), dtype=np.int64)
+        self.changed: Dict[object, Set[int]] = {}
+        # The means by interval end like aggregate_series returns them, by label, with
+        # the first and last interval end of every series
+        self.series: Dict[object, Dict[str, Dict]] = {}
+        self.bounds: Dict[object, Tuple[int, int]] = {}
+        self.columns: List[str] = []
+
+    def add(self, labels: np.ndarray, interval_ends: np.ndarray, sums: np.ndarray, counts: np.ndarray) -> None:
+        """
+        Add the sums and counts of intervals, every label and interval end at most once.
+        """
+        keys = list(zip(labels.tolist(), interval_ends.tolist()))
+        for key in keys:
+            if key not in self.rows:
+                self.rows[key] = len(self.rows)
+            self.changed.setdefault(key[0], set()).add(key[1])
+        capacity, width = self.sums.shape
+        if len(self.rows) > capacity or sums.shape[1] > width:
+            padding = ((0, max(len(self.rows), 2 * capacity) - capacity), (0, max(sums.shape[1], width) - width))
+            self.sums, self.counts = np.pad(self.sums, padding), np.pad(self.counts, padding)
+        rows = [self.rows[key] for key in keys]
+        self.sums[rows, :sums.shape[1]] += sums
+        self.counts[rows, :counts.shape[1]] += counts
+
+    def update(self, label, columns: List[str]) -> Dict:
+        """
+        Update the means of the changed intervals of a label and return its series,
+        intervals without rows between the first and the last one have NaN means.
+        """
+        if columns != self.columns:
+            # A new column adds a mean to every interval
+            self.columns = list(columns)
+            self.series, self.bounds = {}, {}
+            for row_label, interval_end in self.rows:
+                self.changed.setdefault(row_label, set()).add(interval_end)
+        changed = sorted(self.changed.pop(label, ()))
+        if not changed:
+            return self.series.get(label, {})
+        series = self.series.get(label, {})
+        first_end, last_end = self.bounds.get(label, (changed[0], changed[0] - self.interval))
+        empty_row = [np.nan] * len(self.columns)
+        if changed[0] < first_end:
+            earlier_series = {
+                str(pd.Timestamp(interval_end)): dict(zip(self.columns, empty_row))
+                for interval_end in range(changed[0], first_end, self.interval)
+            }
+            earlier_series.update(series)
+            series, first_end = earlier_series, changed[0]
+        for interval_end in range(last_end + self.interval, changed[-1] + self.interval, self.interval):
+            series[str(pd.Timestamp(interval_end))] = dict(zip(self.columns, empty_row))
+        self.series[label] = series
+        self.bounds[label] = (first_end, max(last_end, changed[-1]))
+
+        width = len(self.columns)
+        if self.sums.shape[1] < width:
+            padding = ((0, 0), (0, width - self.sums.shape[1]))
+            self.sums, self.counts = np.pad(self.sums, padding), np.pad(self.counts, padding)
+        rows = [self.rows[(label, interval_end)] for interval_end in changed]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.round(self.sums[rows, :width] / self.counts[rows, :width], 2)
+        for interval_end, values in zip(changed, means.tolist()):
+            series[str(pd.Timestamp(interval_end))] = dict(zip(self.columns, values))
+        return series
+
+
+def sort_by_time(data_frame: DataFrame) -> DataFrame:
+    """
+    Sort a DataFrame by its time index unless it is already sorted.
+    Parameters:
+    data_frame (DataFrame): Input DataFrame indexed by time.
+    Returns:
+    DataFrame: The DataFrame sorted by time, rows with equal times keep their order.
+    """
+    if data_frame.index.is_monotonic_increasing:
+        return data_frame
+    logging.info("Sorting data frame by time")
+    return data_frame.sort_index(kind="stable")
+
+
+def build_range_histograms(data_frame: DataFrame, test_times: TestTimes) -> RangeHistograms:
+    """
+    Build the latency histograms by label of the time segments between all range boundaries.
+    Parameters:
+    data_frame (DataFrame): Input DataFrame sorted by its time index.
+    test_times (TestTimes): TestTimes object containing test time data.
+    Returns:
+    RangeHistograms: Histograms the statistics of every range are merged from.
+    """
+    label_codes, labels = pd.factorize(data_frame["label"], use_na_sentinel=False)
+    boundaries = [
+        epoch
+        for range_obj in test_times.get_all_ranges()
+        for epoch in (range_obj.start_time.epoch, range_obj.end_time.epoch)
+    ]
+    return RangeHistograms(
+        data_frame.index.asi8,
+        label_codes,
+        labels,
+        data_frame["elapsed"].to_numpy(),
+        data_frame["success"].eq(True).to_numpy(),
+        data_frame["success"].eq(False).to_numpy(),
+        boundaries,
+    )
+
+
+def slice_range(range_obj: TimeRange, data_frame: DataFrame) -> DataFrame:
+    """
+    Select the rows strictly inside a time range without copying them.
+    Parameters:
+    range_obj (TimeRange): TimeRange object representing the range of interest.
+    data_frame (DataFrame): Input DataFrame sorted by its time index.
+    Returns:
+    DataFrame: A positional slice of the DataFrame, found by binary search.
+    """
+    timestamps = data_frame.index.asi8
+    start = np.searchsorted(timestamps, range_obj.start_time.epoch, side="right")
+    end = np.searchsorted(timestamps, range_obj.end_time.epoch, side="left")
+    return data_frame.iloc[start:max(start, end)]
+
+
 def calculate_range(
-    range_obj: TimeRange, test_data_frame: DataFrame, unique_labels: str, freq: str
+    range_obj: TimeRange,
+    test_data_frame: DataFrame,
+    unique_labels: str,
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+    range_histograms: Optional[RangeHistograms] = None,
+    result_cache: Optional[ResultCache] = None,
 ):
     """
     Calculate summary statistics for a given time range within a DataFrame.
@@ -44,102 +810,474 @@ def calculate_range(
     test_data_frame (DataFrame): Input DataFrame to calculate statistics on.
     unique_labels (str): Unique labels in the DataFrame.
     freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    range_histograms (Optional[RangeHistograms]): Histograms to merge the statistics from
+        instead of calculating them from the rows.
+    result_cache (Optional[ResultCache]): Cache of the results of the range and its labels,
+        only the missing results are calculated.
     Returns:
     Dict: A dictionary containing summary statistics.
     """
-    range_data_frame = test_data_frame.copy()
-    range_data_frame = range_data_frame.loc[
-        (range_data_frame.index.asi8 > range_obj.start_time.epoch)
-        & (range_data_frame.index.asi8 < range_obj.end_time.epoch)
-    ]
+    results = {}
+    unit_keys = {}
+    for label_name in [None, *unique_labels]:
+        if result_cache is None:
+            unit_keys[label_name] = None
+            continue
+        unit_key = result_key(result_cache, range_obj, label_name, freq, percentiles)
+        cached = result_cache.get(unit_key)
+        if cached is MISSING:
+            unit_keys[label_name] = unit_key
+        else:
+            results[label_name] = cached
+
+    missing_labels = [label_name for label_name in unique_labels if label_name in unit_keys]
+    if unit_keys:
+        range_data_frame = slice_range(range_obj, sort_by_time(test_data_frame))
+        if None in unit_keys:
+            results[None] = calculate_range_summary(range_obj, range_data_frame, freq, percentiles, range_histograms)
+        if missing_labels:
+            if len(missing_labels) < len(unique_labels):
+                range_data_frame = range_data_frame[range_data_frame["label"].isin(missing_labels)]
+            transactions_data = calculate_range_transactions(
+                range_obj, range_data_frame, missing_labels, freq, percentiles, range_histograms
+            )
+            results.update(
+                (label_name, transactions_data[label_name.strip()]) for label_name in missing_labels
+            )
+        if result_cache is not None:
+            for label_name, unit_key in unit_keys.items():
+                result_cache.put(unit_key, results[label_name])
+
     range_data = {}
-    range_data["summary_range_results"] = calculate_data_frame(range_data_frame, freq)
-    range_data["by_transactions_range_results"] = {}
+    range_data["summary_range_results"] = results[None]
+    range_data["by_transactions_range_results"] = {
+        label_name.strip(): results[label_name] for label_name in unique_labels
+    }
+    return range_data
+
+
+def result_key(
+    result_cache: ResultCache,
+    range_obj: TimeRange,
+    label_name: Optional[str],
+    freq,
+    percentiles: Dict[str, float],
+) -> str:
+    """
+    Return the cache key of the results of a range (label None) or of a label within a range.
+    """
+    return result_cache.key(
+        range_obj.start_time.epoch, range_obj.end_time.epoch, label_name, parse_freqs(freq), percentiles
+    )
+
+
+def calculate_range_summary(
+    range_obj: TimeRange,
+    range_data_frame: DataFrame,
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+    range_histograms: Optional[RangeHistograms] = None,
+):
+    """
+    Calculate the summary statistics of all labels of a range from its rows or histograms.
+    """
+    if range_histograms is None:
+        return calculate_data_frame(range_data_frame, freq, percentiles=percentiles)
+    range_summary = range_histograms.summarize(range_obj.start_time.epoch, range_obj.end_time.epoch)
+    return histogram_statistics(*range_summary, percentiles)
+
+
+def calculate_range_transactions(
+    range_obj: TimeRange,
+    range_data_frame: DataFrame,
+    unique_labels: List[str],
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+    range_histograms: Optional[RangeHistograms] = None,
+):
+    """
+    Calculate the summary statistics of every label of a range from its rows or histograms.
+    """
+    if range_histograms is None:
+        return calculate_transactions(range_data_frame, unique_labels, freq, percentiles)
+
+    series_by_label = calculate_range_series(range_data_frame, freq)
+    transactions_data = {}
     for label_name in unique_labels:
-        range_data["by_transactions_range_results"][label_name.strip()] = (
-            calculate_transaction(range_data_frame, label_name, freq)
+        label_summary = range_histograms.summarize(
+            range_obj.start_time.epoch, range_obj.end_time.epoch, label_name
         )
-    return range_data
+        transaction_data = histogram_statistics(*label_summary, percentiles)
+        if transaction_data is not None:
+            transaction_data.update(series_by_label[label_name])
+        transactions_data[label_name.strip()] = transaction_data
+    return transactions_data
+
+
+def calculate_transactions(
+    range_data_frame: DataFrame,
+    unique_labels: List[str],
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+):
+    """
+    Calculate summary statistics for every label, grouping the DataFrame by label once.
+    Parameters:
+    range_data_frame (DataFrame): Input DataFrame to calculate statistics on.
+    unique_labels (List[str]): Labels to calculate statistics for.
+    freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    Returns:
+    Dict: Summary statistics by stripped label name, None for labels without data.
+    """
+    grouped = range_data_frame.groupby("label", sort=False, observed=True)
+    elapsed = grouped["elapsed"]
+    success = range_data_frame["success"]
+    label_statistics = pd.DataFrame(
+        {
+            "sampler_count": grouped.size(),
+            "success": success.eq(True).groupby(range_data_frame["label"], observed=True).sum(),
+            "failures": success.eq(False).groupby(range_data_frame["label"], observed=True).sum(),
+            "avg-min": elapsed.min(),
+            "avg-max": elapsed.max(),
+            "avg-rt": elapsed.mean(),
+        }
+    )
+    label_positions = grouped.indices
+    label_codes = grouped.ngroup().to_numpy()
+    series_by_label = calculate_range_series(range_data_frame, freq)
+    label_percentiles = grouped_percentiles(
+        range_data_frame["elapsed"].to_numpy(), label_codes, grouped.ngroups, list(percentiles.values())
+    )
 
+    transactions_data = {}
+    for label_name in unique_labels:
+        if label_name not in label_positions:
+            transactions_data[label_name.strip()] = None
+            continue
+        transaction_data = build_statistics(
+            *(label_statistics.at[label_name, column] for column in label_statistics.columns),
+            dict(zip(percentiles, label_percentiles[label_codes[label_positions[label_name][0]]])),
+        )
+        transaction_data.update(series_by_label[label_name])
+        transactions_data[label_name.strip()] = transaction_data
+    return transactions_data
 
-def calculate_transaction(range_data_frame: DataFrame, label_name: str, freq: str):
+
+def calculate_transaction(
+    range_data_frame: DataFrame,
+    label_name: str,
+    freq: str,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+):
     """
     Calculate summary statistics for a given label within a DataFrame.
     Parameters:
     range_data_frame (DataFrame): Input DataFrame to calculate statistics on.
     label_name (str): Label name to filter the DataFrame.
     freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
     Returns:
     Dict: A dictionary containing summary statistics.
     """
     df_label = range_data_frame[range_data_frame["label"].isin([label_name])]
-    transaction_data = calculate_data_frame(df_label, freq, label_name)
+    transaction_data = calculate_data_frame(df_label, freq, label_name, percentiles)
     return transaction_data
 
 
-def calculate_data_frame(data_frame: DataFrame, freq: str, label_name=None):
+def build_statistics(
+    sampler_count, success, failures, minimum, maximum, mean, percentiles: Dict
+) -> Dict:
+    """
+    Build the summary statistics dictionary with its rounding.
+    Parameters:
+    sampler_count: Number of samples.
+    success: Number of successful samples.
+    failures: Number of failed samples.
+    minimum, maximum, mean: Minimum, maximum and mean elapsed time.
+    percentiles (Dict): Elapsed time percentiles by name, e.g. "p95".
+    Returns:
+    Dict: A dictionary containing summary statistics.
+    """
+    calculated_data = {
+        "sampler_count": sampler_count,
+        "success": success,
+        "failures": failures,
+        "avg-min": round(minimum),
+        "avg-max": round(maximum),
+        "avg-rt": round(mean),
+    }
+    for name, value in percentiles.items():
+        calculated_data[name] = round(value)
+    calculated_data.update(
+        {
+            "error_percent": round(((failures / sampler_count) * 100), 2),
+            "success_percent": round(((success / sampler_count) * 100), 2),
+        }
+    )
+    return calculated_data
+
+
+def histogram_statistics(
+    histogram: LatencyHistogram, sampler_count, success, failures, percentiles: Dict[str, float]
+) -> Optional[Dict]:
+    """
+    Build the summary statistics from a latency histogram or quantile sketch.
+    Parameters:
+    histogram (LatencyHistogram): Histogram or QuantileSketch of the elapsed times.
+    sampler_count, success, failures: Numbers of samples, successful and failed samples.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    Returns:
+    Optional[Dict]: A dictionary containing summary statistics, None without samples.
+    """
+    if sampler_count == 0:
+        return None
+    return build_statistics(
+        sampler_count,
+        success,
+        failures,
+        histogram.min,
+        histogram.max,
+        histogram.mean,
+        dict(zip(percentiles, histogram.quantiles(list(percentiles.values())))),
+    )
+
+
+def calculate_data_frame(
+    data_frame: DataFrame,
+    freq: str,
+    label_name=None,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+):
     """
     Calculate summary statistics for a given DataFrame.
     Parameters:
     data_frame (DataFrame): Input DataFrame to calculate statistics on.
     freq (str): Frequency string for resampling time-series data.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
     Returns:
     Dict: A dictionary containing summary statistics if the data_frame is not empty, otherwise None.
     """
     summary_count = len(data_frame.index)
-    success_data = dict(data_frame["success"].value_counts())
     if summary_count != 0:
-        calculated_data = {
-            "sampler_count": summary_count,
-            "success": success_data.get(True, 0),
-            "failures": success_data.get(False, 0),
-            "avg-min": round(data_frame["elapsed"].min()),
-            "avg-max": round(data_frame["elapsed"].max()),
-            "avg-rt": round(data_frame["elapsed"].mean()),
-            "p25": round(data_frame["elapsed"].quantile(0.25)),
-            "p50": round(data_frame["elapsed"].quantile(0.50)),
-            "p75": round(data_frame["elapsed"].quantile(0.75)),
-            "p90": round(data_frame["elapsed"].quantile(0.90)),
-            "p92": round(data_frame["elapsed"].quantile(0.92)),
-            "p95": round(data_frame["elapsed"].quantile(0.95)),
-            "p98": round(data_frame["elapsed"].quantile(0.98)),
-            "p99": round(data_frame["elapsed"].quantile(0.99)),
-        }
         success_data = dict(data_frame["success"].value_counts())
-        calculated_data.update(
-            {
-                "error_percent": round(
-                    ((success_data.get(False, 0) / summary_count) * 100), 2
-                ),
-                "success_percent": round(
-                    ((success_data.get(True, 0) / summary_count) * 100), 2
-                ),
-            }
+        calculated_data = build_statistics(
+            summary_count,
+            success_data.get(True, 0),
+            success_data.get(False, 0),
+            data_frame["elapsed"].min(),
+            data_frame["elapsed"].max(),
+            data_frame["elapsed"].mean(),
+            dict(zip(percentiles, elapsed_percentiles(data_frame["elapsed"], percentiles))),
         )
         if label_name is not None:
-            filtered_data_frame = data_frame.drop(labels=["responseCode"], axis=1)
-            series = calculate_series(filtered_data_frame, freq)
-            calculated_data["series"] = series
+            calculated_data.update(calculate_series_fields(data_frame, freq))
         return calculated_data
     else:
         return None
 
 
+def elapsed_percentiles(elapsed, percentiles: Dict[str, float]) -> np.ndarray:
+    """
+    Calculate all percentiles of the elapsed times sorting them once.
+    Parameters:
+    elapsed (Series): Elapsed times.
+    percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+    Returns:
+    np.ndarray: The percentiles in the order of the dictionary.
+    """
+    values = elapsed.to_numpy()
+    return grouped_percentiles(values, np.zeros(len(values), dtype=np.intp), 1, list(percentiles.values()))[0]
+
+
 def calculate_series(data_frame: DataFrame, freq: str):
-    series_data = data_frame.groupby(
-        pd.Grouper(
-            freq=freq,
-            offset="0s",
-            label="right",
+    """
+    Calculate the mean of every numeric column by time interval for a single label.
+    Parameters:
+    data_frame (DataFrame): DataFrame of one label indexed by time.
+    freq (str): Frequency string for resampling time-series data.
+    Returns:
+    Dict: The means rounded to 2 decimals by interval end.
+    """
+    group_codes = np.zeros(len(data_frame), dtype=np.intp)
+    return build_series(data_frame, group_codes, 1, [freq])[freq].get(0, {})
+
+
+def calculate_series_fields(data_frame: DataFrame, freq) -> Dict:
+    """
+    Calculate the series fields of a single label for one or several frequencies.
+    Parameters:
+    data_frame (DataFrame): DataFrame of one label indexed by time.
+    freq (str or List[str]): Frequency string or strings, see parse_freqs.
+    Returns:
+    Dict: The series fields, see series_fields.
+    """
+    group_codes = np.zeros(len(data_frame), dtype=np.intp)
+    series_by_freq = build_series(data_frame, group_codes, 1, parse_freqs(freq))
+    return series_fields({series_freq: series.get(0, {}) for series_freq, series in series_by_freq.items()})
+
+
+def calculate_range_series(range_data_frame: DataFrame, freq) -> Dict:
+    """
+    Calculate the series fields of every label of a range from one groupby([label,
+    interval]) aggregation at the finest frequency, coarser frequencies are summed from it.
+    Parameters:
+    range_data_frame (DataFrame): Input DataFrame indexed by time.
+    freq (str or List[str]): Frequency string or strings, see parse_freqs.
+    Returns:
+    Dict: The series fields by label, labels without rows are missing.
+    """
+    label_codes, labels = pd.factorize(range_data_frame["label"])
+    series_by_freq = build_series(range_data_frame, label_codes, len(labels), parse_freqs(freq))
+    primary_series = next(iter(series_by_freq.values()))
+    return {
+        labels[code]: series_fields(
+            {series_freq: series[code] for series_freq, series in series_by_freq.items()}
+        )
+        for code in primary_series
+    }
+
+
+def parse_freqs(freq) -> List[str]:
+    """
+    Return the series frequencies given as a string, a comma separated string or a list.
+    The first frequency is the primary one.
+    """
+    if isinstance(freq, str):
+        freq = freq.split(",")
+    return [series_freq.strip() for series_freq in freq]
+
+
+def series_fields(series_by_freq: Dict[str, Dict]) -> Dict:
+    """
+    Build the output fields of a label's series: "series" holds the series of the primary
+    frequency and "series_by_freq" the series of the other frequencies, if any.
+    """
+    freqs = list(series_by_freq)
+    fields = {"series": series_by_freq[freqs[0]]}
+    if len(freqs) > 1:
+        fields["series_by_freq"] = {series_freq: series_by_freq[series_freq] for series_freq in freqs[1:]}
+    return fields
+
+
+def base_interval(freqs: List[str]) -> int:
+    """
+    Return the longest interval in nanoseconds all frequencies are multiples of.
+    """
+    return int(np.gcd.reduce([pd.Timedelta(series_freq).value for series_freq in freqs]))
+
+
+def day_origins(group_codes: np.ndarray, timestamps: np.ndarray, n_groups: int) -> np.ndarray:
+    """
+    Return the midnight before the first timestamp of every group in epoch nanoseconds.
+    """
+    day = pd.Timedelta(days=1).value
+    first_timestamps = pd.Series(timestamps).groupby(group_codes).min()
+    origins = np.zeros(n_groups, dtype=np.int64)
+    origins[first_timestamps.index] = first_timestamps.to_numpy() - first_timestamps.to_numpy() % day
+    return origins
+
+
+def build_series(data_frame: DataFrame, group_codes: np.ndarray, n_groups: int, freqs: List[str]) -> Dict:
+    """
+    Calculate the mean of every numeric column by group and time interval for several
+    frequencies in a single pass over the rows.
+
+    The rows are summed once into base intervals all frequencies are multiples of, and
+    the intervals of every frequency are summed from the base intervals.
+    Parameters:
+    data_frame (DataFrame): Input DataFrame indexed by time.
+    group_codes (np.ndarray): Group of every row, rows with negative codes are ignored.
+    n_groups (int): Number of groups.
+    freqs (List[str]): Frequency strings.
+    Returns:
+    Dict: The series of every group with rows by group code, by frequency.
+    """
+    numeric_data = data_frame.drop(columns=["responseCode"], errors="ignore").select_dtypes(
+        include=["number", "bool"]
+    )
+    valid = group_codes >= 0
+    if not valid.all():
+        numeric_data, group_codes = numeric_data[valid], group_codes[valid]
+    if len(numeric_data) == 0:
+        return {series_freq: {} for series_freq in freqs}
+    base = base_interval(freqs)
+    timestamps = numeric_data.index.asi8
+    origins = day_origins(group_codes, timestamps, n_groups)
+    row_origins = origins[group_codes]
+    base_starts = row_origins + (timestamps - row_origins) // base * base
+
+    grouped = numeric_data.groupby([group_codes, base_starts], sort=True)
+    sums, counts = grouped.sum(), grouped.count()
+    base_codes = sums.index.get_level_values(0).to_numpy()
+    base_starts = sums.index.get_level_values(1).to_numpy()
+    return {
+        series_freq: aggregate_series(sums, counts, base_codes, base_starts, origins, series_freq)
+        for series_freq in freqs
+    }
+
+
+def aggregate_series(
+    sums: DataFrame,
+    counts: DataFrame,
+    group_codes: np.ndarray,
+    starts: np.ndarray,
+    origins: np.ndarray,
+    freq: str,
+) -> Dict:
+    """
+    Calculate the series of every group from the sums and counts of finer intervals.
+
+    Intervals are closed on the left, labelled by their end and start at the origin of
+    their group, like pd.Grouper(freq=freq, label="right") does from the midnight before
+    the first row. Intervals without rows between the first and the last one of a group
+    have NaN means.
+    Parameters:
+    sums (DataFrame): Sums of the columns of every finer interval.
+    counts (DataFrame): Numbers of values of the columns of every finer interval.
+    group_codes (np.ndarray): Group of every finer interval.
+    starts (np.ndarray): Start of every finer interval in epoch nanoseconds.
+    origins (np.ndarray): Origin of the intervals of every group in epoch nanoseconds.
+    freq (str): Frequency string of the series.
+    Returns:
+    Dict: The means rounded to 2 decimals by interval end, by group code.
+    """
+    interval = pd.Timedelta(freq).value
+    row_origins = origins[group_codes]
+    interval_ends = row_origins + ((starts - row_origins) // interval + 1) * interval
+    # Grouping by index levels rather than by arrays spares pandas looking the arrays up as column names
+    keys = pd.MultiIndex.from_arrays([group_codes, interval_ends])
+    means = (
+        sums.set_axis(keys).groupby(level=[0, 1], sort=True).sum()
+        / counts.set_axis(keys).groupby(level=[0, 1], sort=True).sum()
+    )
+    mean_codes = means.index.get_level_values(0).to_numpy()
+    mean_ends = means.index.get_level_values(1).to_numpy()
+    mean_values = np.round(means.to_numpy(dtype=np.float64), 2)
+    group_bounds = np.flatnonzero(np.r_[True, mean_codes[1:] != mean_codes[:-1], True])
+
+    interval_keys = {}
+    series_by_code = {}
+    for start, stop in zip(group_bounds[:-1], group_bounds[1:]):
+        group_ends = mean_ends[start:stop]
+        all_ends = np.arange(group_ends[0], group_ends[-1] + interval, interval)
+        group_values = np.full((len(all_ends), len(means.columns)), np.nan)
+        group_values[(group_ends - group_ends[0]) // interval] = mean_values[start:stop]
+        for end in all_ends.tolist():
+            if end not in interval_keys:
+                interval_keys[end] = str(pd.Timestamp(end))
+        series_by_code[int(mean_codes[start])] = rows_to_dict(
+            [interval_keys[end] for end in all_ends.tolist()], list(means.columns), group_values
         )
-    ).mean(numeric_only=True)
-    series_data_dict = {}
-    for i in range(len(series_data)):
-        row = series_data.iloc[i]
-        series_data_dict[str(row.name)] = {}
-        for column_name in series_data.columns:
-            series_data_dict[str(row.name)][column_name] = round(row[column_name], 2)
-    return series_data_dict
+    return series_by_code
+
+
+def rows_to_dict(keys: List[str], columns: List[str], values: np.ndarray) -> Dict:
+    """
+    Convert a matrix of values to a dictionary of rows by key and values by column.
+    """
+    return {key: dict(zip(columns, row)) for key, row in zip(keys, values.tolist())}
 
 
 def main():
@@ -156,36 +1294,137 @@ def main():
         default=Path("full_test_data_frame.feather"),
         help="Path to the data_frame file",
     )
+    parser.add_argument(
+        "--freq",
+        type=str,
+        nargs="+",
+        default=[DEFAULT_FREQ],
+        help="Series intervals, e.g. 30s 10s 1min; the first one is reported as series, "
+        "all of them are derived from one aggregation at their greatest common divisor",
+    )
+    parser.add_argument(
+        "--percentiles",
+        type=parse_percentiles,
+        default=DEFAULT_PERCENTILES,
+        help="Comma separated elapsed time percentiles to report, e.g. 50,90,99.9",
+    )
+    parser.add_argument(
+        "--stats_backend",
+        choices=STATS_BACKENDS,
+        default="sort",
+        help="Calculate range statistics by sorting rows or by merging latency histograms",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes calculating ranges and labels in parallel",
+    )
+    parser.add_argument(
+        "--compact_results",
+        action="store_true",
+        help="Write the results file without indentation, which is several times faster",
+    )
+    parser.add_argument(
+        "--series_file_path",
+        type=Path,
+        help="Write the series to this Feather file instead of the results file, which points to it",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=Path,
+        help="Directory caching the results of ranges and labels between runs on the same data frame",
+    )
+    parser.add_argument(
+        "--cache_max_mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="Size limit of the result cache, least recently used results are evicted",
+    )
+    parser.add_argument(
+        "--rollup_file_paths",
+        type=Path,
+        nargs="+",
+        help="Analyze summaries of s00_generator_summarizer instead of the data frame",
+    )
+    parser.add_argument(
+        "--approximate",
+        action="store_true",
+        help="Stream the data frame in record batches and estimate the percentiles",
+    )
+    parser.add_argument(
+        "--relative_error",
+        type=float,
+        default=DEFAULT_RELATIVE_ERROR,
+        help="Relative error bound of the approximate percentiles",
+    )
 
     args = parser.parse_args()
 
     RESULTS_PATH = args.results_file_path
     DATA_FRAME_PATH = args.data_frame_file_path
 
-    with open(RESULTS_PATH, "r") as file:
-        results = json.load(file)
-
-    test_times_dict = results.get("test_times", {})
+    test_times_dict, unique_labels = load_results_sections(RESULTS_PATH, ["test_times", "unique_labels"])
 
-    test_times = TestTimes.from_dict(test_times_dict)
-    unique_labels = results.get("unique_labels", [])
+    test_times = TestTimes.from_dict(test_times_dict or {})
+    unique_labels = unique_labels or []
 
-    data_frame = pd.read_feather(DATA_FRAME_PATH)
+    if args.rollup_file_paths:
+        rollup = merge_rollups([read_rollup(path) for path in args.rollup_file_paths])
+        descriptive_analysis_results = calculate_rollup_test(
+            rollup=rollup,
+            test_times=test_times,
+            unique_labels=unique_labels,
+            freq=args.freq,
+            percentiles=args.percentiles,
+        )
+    elif args.approximate:
+        descriptive_analysis_results = calculate_test_approximately(
+            data_frame_path=DATA_FRAME_PATH,
+            test_times=test_times,
+            unique_labels=unique_labels,
+            freq=args.freq,
+            percentiles=args.percentiles,
+            relative_error=args.relative_error,
+        )
+    else:
+        data_frame = pd.read_feather(DATA_FRAME_PATH)
+        result_cache = None
+        if args.cache_dir is not None:
+            result_cache = ResultCache(
+                args.cache_dir, file_digest(DATA_FRAME_PATH), int(args.cache_max_mb * 1024 * 1024)
+            )
 
-    descriptive_analysis_results = calculate_test(
-        data_frame=data_frame,
-        test_times=test_times,
-        unique_labels=unique_labels,
-        freq="30s",
-    )
+        descriptive_analysis_results = calculate_test(
+            data_frame=data_frame,
+            test_times=test_times,
+            unique_labels=unique_labels,
+            freq=args.freq,
+            percentiles=args.percentiles,
+            backend=args.stats_backend,
+            workers=args.workers,
+            result_cache=result_cache,
+        )
+        if result_cache is not None:
+            logging.info(f"Result cache: {result_cache.hits} hits, {result_cache.misses} misses")
 
     test_data = {}
     test_data["test_times"] = test_times_dict
     test_data["unique_labels"] = unique_labels
     test_data["descriptive_analysis"] = descriptive_analysis_results
+    if args.series_file_path is not None:
+        series_frame = extract_series(descriptive_analysis_results, parse_freqs(args.freq)[0])
+        write_series(series_frame, args.series_file_path)
+        test_data[SERIES_FILE_KEY] = series_file_pointer(args.series_file_path, RESULTS_PATH)
+    if args.rollup_file_paths:
+        test_data["approximate_analysis"] = {
+            "rollup_bucket": rollup.bucket,
+            "relative_error": LATENCY_RELATIVE_ERROR,
+        }
+    elif args.approximate:
+        test_data["approximate_analysis"] = {"relative_error": args.relative_error}
 
-    with open(RESULTS_PATH, "w") as data_file:
-        json.dump(test_data, data_file, indent=4, cls=GBEncoder)
+    dump_results(test_data, RESULTS_PATH, compact=args.compact_results)
 
     logging.info("Analyzed test data successfully saved to JSON file {RESULTS_PATH}")
 
@@ -1,11 +1,13 @@
 import os
-import json
+import sys
 import argparse
 import psycopg2
 import pandas as pd
 import logging
 from pathlib import Path
 from pandas.core.frame import DataFrame
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.common.results_io import load_results_sections
 
 
 def get_target_profile_from_db(
@@ -185,11 +187,12 @@ def main():
         profile_list, PROFILE_PERCENTAGE
     )
 
-    with open(RESULTS_PATH, "r") as file:
-        results = json.load(file)
-
-    descriptive_analysis = results.get("descriptive_analysis")
-    impact_duration = int(results["test_times"]["impact"]["duration_in_seconds"])
+    # Only the impact sections are parsed, not the whole results file
+    impact_results, impact_duration = load_results_sections(
+        RESULTS_PATH, [("descriptive_analysis", "impact"), ("test_times", "impact", "duration_in_seconds")]
+    )
+    descriptive_analysis = {"impact": impact_results}
+    impact_duration = int(impact_duration)
 
     df = collect_general_dataframe(
         descriptive_analysis, profile_data_frame, impact_duration, ACCEPTABLE_DEVIATION
@@ -1,11 +1,13 @@
 import os
-import json
+import sys
 import argparse
 import psycopg2
 import logging
 import pandas as pd
 from pathlib import Path
 from pandas.core.frame import DataFrame
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.common.results_io import load_results_section
 
 
 def get_required_response_times_from_db(
@@ -147,10 +149,8 @@ def main():
 
     reqired_response_times_df = transform_to_dataframe(response_times_list)
 
-    with open(RESULTS_PATH, "r") as file:
-        results = json.load(file)
-
-    descriptive_analysis = results.get("descriptive_analysis")
+    # Only the impact section is parsed, not the whole results file
+    descriptive_analysis = {"impact": load_results_section(RESULTS_PATH, ("descriptive_analysis", "impact"))}
 
     general_response_times_df = collect_general_dataframe(
         descriptive_analysis, reqired_response_times_df, ACCEPTABLE_DEVIATION
@@ -0,0 +1,341 @@
+import io
+import os
+import sys
+import time
+import logging
+import argparse
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+from pandas.core.frame import DataFrame
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.common.settings import LOGGING_CONFIG
+from src.common.range_models import TestTimes
+from src.common.results_io import dump_results
+from src.common.jtl_schema import TIMESTAMP_COLUMN, concat_jtl, read_jtl
+from src.common.percentiles import DEFAULT_PERCENTILES, parse_percentiles
+from src.common.sketches import DEFAULT_RELATIVE_ERROR, RangeSketches
+from src.common.timestamps import detect_timestamp_format, parse_timestamps
+from src.s03_analysis_preparator import get_test_times
+from src.s04_results_analyzer import DEFAULT_FREQ, SeriesSums, add_record_batch, summarize_sketches
+
+logging.basicConfig(**LOGGING_CONFIG)
+logger = logging.getLogger(__name__)
+
+
+class JTLTail:
+    """
+    A class to follow a JTL file while JMeter writes it.
+
+    Every read parses only the complete lines appended since the previous read; a partly
+    written last line is left for the next read. Compressed files can't be followed.
+
+    Attributes:
+        file_path (Path): The JTL file.
+        offset (int): The number of bytes read so far.
+        header (bytes, optional): The header line of the file, once read.
+        timestamp_format (str, optional): The timestamp format detected from the first rows.
+    """
+
+    def __init__(self, file_path: Path):
+        self.file_path = file_path
+        self.offset = 0
+        self.header: Optional[bytes] = None
+        self.timestamp_format: Optional[str] = None
+
+    def read_new_rows(self) -> Optional[DataFrame]:
+        """
+        Reads the rows appended since the previous read, indexed by time.
+
+        Returns:
+            DataFrame, optional: The new rows, or None if there are none yet.
+        """
+        if not self.file_path.exists():
+            return None
+        size = self.file_path.stat().st_size
+        if size < self.offset:
+            logger.warning(f"{self.file_path} was truncated, reading it again from the start")
+            self.offset, self.header = 0, None
+        if size == self.offset:
+            return None
+        with open(self.file_path, "rb") as file:
+            file.seek(self.offset)
+            data = file.read(size - self.offset)
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        data = data[:end]
+        self.offset += end
+        if self.header is None:
+            header_end = data.index(b"\n") + 1
+            self.header, data = data[:header_end], data[header_end:]
+        if not data.strip():
+            return None
+
+        data_frame = read_jtl(io.BytesIO(self.header + data), on_bad_lines="skip")
+        data_frame = data_frame.set_index([TIMESTAMP_COLUMN])
+        if self.timestamp_format is None:
+            self.timestamp_format = detect_timestamp_format(data_frame.index)
+            logger.info(f"Detected timestamp format of {self.file_path}: {self.timestamp_format}")
+        data_frame.index = parse_timestamps(data_frame.index, self.timestamp_format, errors="coerce")
+        return data_frame[data_frame.index.notna() & (data_frame.index.year != 1970)]
+
+
+class LiveAnalyzer:
+    """
+    A class to analyze JTL files incrementally while the test runs.
+
+    Rows are added to the quantile sketches and series sums of s04's approximate mode,
+    so a refresh costs time proportional to the new rows, not to all rows of the test.
+    The sketches and series sums track the totals of every range as rows are added.
+    Adding rows marks their time segments and labels dirty, and a snapshot summarizes
+    again only the ranges and labels with dirty segments, reusing the results of the
+    previous snapshot for the others. The series of a dirty label are updated only in
+    the intervals with new rows, so snapshots do not slow down as a long range fills.
+    The ranges are those s03_analysis_preparator calculates, starting at the first sample
+    (or the given start time) and ending when the planned ramp down ends.
+
+    Rows of different files arrive out of order, so rows are only added once the
+    watermark, the latest sample time minus the allowed lateness, has passed them.
+    Rows older than the watermark when they arrive are added right away and counted as late.
+
+    Attributes:
+        tails (List[JTLTail]): The followed JTL files.
+        range_parameters (Dict): The ramp up, impact, range and ramp down durations of s03.
+        test_times (TestTimes, optional): The ranges, once the test start is known.
+        unique_labels (List[str]): The labels in the order of their first sample.
+        watermark (int, optional): The sample time up to which rows are added, in epoch nanoseconds.
+    """
+
+    def __init__(
+        self,
+        jtl_file_paths: List[Path],
+        range_parameters: Dict[str, int],
+        freq=DEFAULT_FREQ,
+        percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+        relative_error: float = DEFAULT_RELATIVE_ERROR,
+        allowed_lateness_seconds: float = 5,
+        test_start_time: Optional[pd.Timestamp] = None,
+    ):
+        """
+        Initialize the LiveAnalyzer with the JTL files and the analysis parameters.
+
+        Args:
+            jtl_file_paths (List[Path]): The JTL files to follow.
+            range_parameters (Dict[str, int]): The keyword arguments of get_test_times
+                ramp_up_time_seconds, impact_time_seconds, ranges_count,
+                duration_range_seconds and ramp_down_seconds.
+            freq (str or List[str]): The series intervals, see s04_results_analyzer.
+            percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+            relative_error (float): Relative error bound of the percentiles.
+            allowed_lateness_seconds (float): How long rows may arrive after later rows.
+            test_start_time (pd.Timestamp, optional): The test start, the first sample if None.
+        """
+        self.tails = [JTLTail(path) for path in jtl_file_paths]
+        self.range_parameters = range_parameters
+        self.freq = freq
+        self.percentiles = percentiles
+        self.relative_error = relative_error
+        self.allowed_lateness = pd.Timedelta(seconds=allowed_lateness_seconds).value
+        self.test_start_time = test_start_time
+        self.test_times: Optional[TestTimes] = None
+        self.range_sketches: Optional[RangeSketches] = None
+        self.series_sums: Optional[SeriesSums] = None
+        self.unique_labels: List[str] = []
+        self.pending: Optional[DataFrame] = None
+        self.watermark: Optional[int] = None
+        self.latest_sample: Optional[int] = None
+        self.added_samples = 0
+        self.late_samples = 0
+        # The (segment, label) pairs with rows added since the previous snapshot
+        self.dirty_keys: Set[Tuple[int, object]] = set()
+        self.descriptive_analysis: Optional[Dict] = None
+
+    def refresh(self, flush: bool = False) -> int:
+        """
+        Reads the new rows of all files and adds the rows the watermark has passed.
+
+        Args:
+            flush (bool): Add all pending rows, e.g. when the test is over.
+
+        Returns:
+            int: The number of new rows.
+        """
+        batches = [batch for batch in (tail.read_new_rows() for tail in self.tails) if batch is not None]
+        batches = [batch for batch in batches if len(batch)]
+        new_rows = sum(len(batch) for batch in batches)
+        if batches:
+            batch = concat_jtl(batches)
+            if self.test_times is None:
+                self._start(self.test_start_time or batch.index.min())
+            for label in batch["label"].dropna().unique():
+                if label not in self.unique_labels:
+                    self.unique_labels.append(label)
+            timestamps = batch.index.asi8
+            self.latest_sample = max(self.latest_sample or timestamps.max(), timestamps.max())
+            if self.watermark is not None:
+                late = timestamps < self.watermark
+                if late.any():
+                    self.late_samples += int(late.sum())
+                    self._add(batch[late])
+                    batch = batch[~late]
+            self.pending = batch if self.pending is None else concat_jtl([self.pending, batch])
+        if self.latest_sample is None:
+            return new_rows
+
+        watermark = self.latest_sample - self.allowed_lateness
+        self.watermark = np.iinfo(np.int64).max if flush else max(self.watermark or watermark, watermark)
+        if self.pending is not None and len(self.pending):
+            passed = self.pending.index.asi8 < self.watermark
+            self._add(self.pending[passed])
+            self.pending = self.pending[~passed]
+        logger.info(
+            f"Read {new_rows} new rows, {self.added_samples} rows analyzed, "
+            f"{len(self.pending)} pending, {self.late_samples} late"
+        )
+        return new_rows
+
+    def _start(self, test_start_time: pd.Timestamp) -> None:
+        """
+        Calculates the ranges of the test and creates the sketches of their segments.
+        """
+        parameters = self.range_parameters
+        duration_seconds = parameters["ramp_up_time_seconds"] + max(
+            parameters["impact_time_seconds"],
+            parameters["ranges_count"] * parameters["duration_range_seconds"] + parameters["ramp_down_seconds"],
+        )
+        self.test_times = get_test_times(
+            current_datetime=test_start_time,
+            test_end_datetime=test_start_time + pd.Timedelta(seconds=duration_seconds),
+            full_test_duration_seconds=duration_seconds,
+            **parameters,
+        )
+        logger.info(f"Test started at {test_start_time}, planned duration {duration_seconds}s")
+        ranges = [
+            (range_obj.start_time.epoch, range_obj.end_time.epoch) for range_obj in self.test_times.get_all_ranges()
+        ]
+        boundaries = [epoch for range_key in ranges for epoch in range_key]
+        self.range_sketches = RangeSketches(boundaries, self.relative_error, ranges)
+        self.series_sums = SeriesSums(
+            self.range_sketches.edges, self.freq, self.test_times.full_test.start_time.epoch, ranges
+        )
+
+    def _add(self, data_frame: DataFrame) -> None:
+        if len(data_frame):
+            add_record_batch(self.range_sketches, self.series_sums, data_frame, self.dirty_keys)
+            self.added_samples += len(data_frame)
+
+    def snapshot(self) -> Optional[Dict]:
+        """
+        Builds the results of the rows added so far in the format of s04_results_analyzer.
+        The series in the results are updated in place by later snapshots.
+
+        Returns:
+            Dict, optional: The results, or None before the first row.
+        """
+        if self.test_times is None:
+            return None
+        completed_ranges = [
+            range_obj.full_range_name
+            for range_obj in self.test_times.get_all_ranges()
+            if range_obj.end_time.epoch <= self.watermark
+        ]
+        test_data = {}
+        test_data["test_times"] = self.test_times
+        test_data["unique_labels"] = self.unique_labels
+        self.descriptive_analysis = summarize_sketches(
+            self.range_sketches,
+            self.series_sums,
+            self.test_times,
+            self.unique_labels,
+            self.percentiles,
+            previous_results=self.descriptive_analysis,
+            dirty_keys=self.dirty_keys,
+        )
+        self.dirty_keys.clear()
+        test_data["descriptive_analysis"] = self.descriptive_analysis
+        test_data["approximate_analysis"] = {"relative_error": self.relative_error}
+        test_data["live_analysis"] = {
+            "watermark": str(pd.Timestamp(min(self.watermark, self.latest_sample))),
+            "completed_ranges": completed_ranges,
+            "analyzed_samples": self.added_samples,
+            "pending_samples": len(self.pending) if self.pending is not None else 0,
+            "late_samples": self.late_samples,
+        }
+        return test_data
+
+    def write_snapshot(self, results_path: Path) -> None:
+        """
+        Replaces the results file with a snapshot, so readers never see a partial file.
+        """
+        test_data = self.snapshot()
+        if test_data is None:
+            logger.info("No samples yet")
+            return
+        dump_results(test_data, results_path)
+        logger.info(f"Snapshot saved to {results_path}")
+
+
+def main():
+    """
+    Main function to follow JTL files during the test and refresh the results snapshot.
+    """
+    parser = argparse.ArgumentParser(description="Analyze growing JTL files during the test.")
+    parser.add_argument("--jtl_file_paths", type=Path, nargs="+", required=True, help="JTL files to follow")
+    parser.add_argument("--results_file_path", type=Path, default=Path("results.json"), help="Path to the results snapshot")
+    parser.add_argument("--ramp_up_time_seconds", type=int, default=600, help="Ramp up test time seconds")
+    parser.add_argument("--impact_time_seconds", type=int, default=600, help="Impact test time seconds")
+    parser.add_argument("--ranges_count", type=int, default=1, help="Test ranges count")
+    parser.add_argument("--duration_range_seconds", type=int, default=600, help="Duration range seconds")
+    parser.add_argument("--ramp_down_seconds", type=int, default=30, help="Ramp down seconds")
+    parser.add_argument("--test_start_time", type=pd.Timestamp, help="Test start time, the first sample's time by default")
+    parser.add_argument("--freq", type=str, nargs="+", default=[DEFAULT_FREQ], help="Series intervals, the first one is reported as series")
+    parser.add_argument(
+        "--percentiles",
+        type=parse_percentiles,
+        default=DEFAULT_PERCENTILES,
+        help="Comma separated elapsed time percentiles to report, e.g. 50,90,99.9",
+    )
+    parser.add_argument("--relative_error", type=float, default=DEFAULT_RELATIVE_ERROR, help="Relative error bound of the percentiles")
+    parser.add_argument("--refresh_seconds", type=float, default=10, help="Seconds between snapshots")
+    parser.add_argument("--allowed_lateness_seconds", type=float, default=5, help="How long rows may arrive after later rows of other files")
+    parser.add_argument("--idle_timeout_seconds", type=float, help="Stop when no rows were written for this long, never by default")
+
+    args = parser.parse_args()
+
+    range_parameters = {
+        "ramp_up_time_seconds": abs(args.ramp_up_time_seconds),
+        "impact_time_seconds": abs(args.impact_time_seconds),
+        "ranges_count": abs(args.ranges_count),
+        "duration_range_seconds": abs(args.duration_range_seconds),
+        "ramp_down_seconds": abs(args.ramp_down_seconds),
+    }
+    analyzer = LiveAnalyzer(
+        args.jtl_file_paths,
+        range_parameters,
+        freq=args.freq,
+        percentiles=args.percentiles,
+        relative_error=args.relative_error,
+        allowed_lateness_seconds=args.allowed_lateness_seconds,
+        test_start_time=args.test_start_time,
+    )
+    last_rows_time = time.monotonic()
+    try:
+        while True:
+            refresh_start = time.monotonic()
+            if analyzer.refresh():
+                last_rows_time = refresh_start
+            elif args.idle_timeout_seconds is not None and refresh_start - last_rows_time >= args.idle_timeout_seconds:
+                logger.info(f"No new rows for {args.idle_timeout_seconds}s, stopping")
+                break
+            analyzer.write_snapshot(args.results_file_path)
+            time.sleep(max(0.0, args.refresh_seconds - (time.monotonic() - refresh_start)))
+    except KeyboardInterrupt:
+        logger.info("Interrupted, stopping")
+    analyzer.refresh(flush=True)
+    analyzer.write_snapshot(args.results_file_path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Sequence
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from src.common.settings import LOGGING_CONFIG
+from src.common.range_models import GBEncoder
+from src.common.percentiles import DEFAULT_PERCENTILES, parse_percentiles
+from src.common.prefix_index import TimeWindowIndex, query_indexes, read_index, write_index
+from src.common.rollups import merge_rollups, read_rollup
+
+logging.basicConfig(**LOGGING_CONFIG)
+logger = logging.getLogger(__name__)
+
+
+def parse_window_bound(value: str, test_start: pd.Timestamp) -> pd.Timestamp:
+    """
+    Parses a window bound given either as an offset from the test start, e.g. "37min",
+    or as a timestamp, e.g. "2024-01-11 05:46:00".
+    """
+    try:
+        return test_start + pd.Timedelta(value)
+    except ValueError:
+        return pd.Timestamp(value)
+
+
+def query_windows(
+    indexes: Sequence[TimeWindowIndex],
+    windows: List[List[str]],
+    labels: List,
+    percentiles: Dict[str, float] = DEFAULT_PERCENTILES,
+) -> List[Dict]:
+    """
+    Queries the statistics of every window for all labels and every given label.
+
+    Parameters:
+    - indexes (Sequence[TimeWindowIndex]): The indexes of the test, e.g. one per load generator.
+    - windows (List[List[str]]): The start and end of every window, see parse_window_bound.
+    - labels (List): The labels to query besides all labels together.
+    - percentiles (Dict[str, float]): Elapsed time quantiles by percentile name.
+
+    Returns:
+    - List[Dict]: The window bounds and the statistics by label, "all" for all labels.
+
+    Raises:
+        ValueError: If the indexes have different bucket lengths.
+    """
+    buckets = {index.bucket for index in indexes}
+    if len(buckets) > 1:
+        raise ValueError(f"Can't query indexes with different buckets: {sorted(buckets)}")
+    test_start = min(index.start for index in indexes)
+    results = []
+    for window_start, window_end in windows:
+        start = parse_window_bound(window_start, test_start)
+        end = parse_window_bound(window_end, test_start)
+        window_data = {"start": str(start), "end": str(end), "all": query_indexes(indexes, start, end, None, percentiles)}
+        for label in labels:
+            window_data[label] = query_indexes(indexes, start, end, label, percentiles)
+        results.append(window_data)
+    return results
+
+
+def main():
+    """
+    Main function to answer ad-hoc time window queries from the indexes or rollups of a test.
+    """
+    parser = argparse.ArgumentParser(description="Query statistics of time windows of a test.")
+    sources = parser.add_mutually_exclusive_group(required=True)
+    sources.add_argument(
+        "--index_file_paths",
+        type=Path,
+        nargs="+",
+        help="Indexes saved by s00_generator_summarizer or s02_data_frame_compiler with --index_file_path",
+    )
+    sources.add_argument(
+        "--rollup_file_paths",
+        type=Path,
+        nargs="+",
+        help="Rollups of s00_generator_summarizer or s02_data_frame_compiler, indexed on every run",
+    )
+    parser.add_argument(
+        "--save_index_file_path",
+        type=Path,
+        help="Path to save the index of the merged rollups, to query it again with --index_file_paths",
+    )
+    parser.add_argument(
+        "--window",
+        nargs=2,
+        action="append",
+        required=True,
+        metavar=("START", "END"),
+        help="Window as offsets from the test start (e.g. 37min 38min) or timestamps, repeatable",
+    )
+    parser.add_argument("--labels", type=str, nargs="+", default=[], help="Labels to query besides all labels")
+    parser.add_argument(
+        "--percentiles",
+        type=parse_percentiles,
+        default=DEFAULT_PERCENTILES,
+        help="Comma separated elapsed time percentiles to report, e.g. 50,90,99.9",
+    )
+    parser.add_argument("--output_file_path", type=Path, help="Path to the JSON result, printed if not given")
+
+    args = parser.parse_args()
+
+    if args.index_file_paths is not None:
+        indexes = [read_index(path) for path in args.index_file_paths]
+    else:
+        rollup = merge_rollups([read_rollup(path) for path in args.rollup_file_paths])
+        indexes = [TimeWindowIndex.from_rollup(rollup)]
+        logger.info(f"Indexed {indexes[0].n_buckets} buckets of {len(indexes[0].labels)} labels")
+        if args.save_index_file_path is not None:
+            write_index(indexes[0], args.save_index_file_path)
+    results = query_windows(indexes, args.window, args.labels, args.percentiles)
+
+    if args.output_file_path is None:
+        print(json.dumps(results, indent=4, cls=GBEncoder))
+    else:
+        with open(args.output_file_path, "w") as data_file:
+            json.dump(results, data_file, indent=4, cls=GBEncoder)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,42 @@
-from typing import List
+from typing import List, Sequence
+import numpy as np
+import pandas as pd
 import pytest
+from src.s03_analysis_preparator import get_test_times
 
 pytest_plugins: List[str] = [
-]
\ No newline at end of file
+]
+
+SAMPLES_START = '2024-01-11 05:46:00'
+SAMPLES_COUNT = 600
+
+
+@pytest.fixture
+def make_samples():
+    """
+    Returns a function building one random sample per second over ten minutes, with the
+    labels given, which the test times of sample_test_times divide into ranges.
+    """
+    def make(labels: Sequence[str] = ('A', 'B'), seed: int = 0) -> pd.DataFrame:
+        rng = np.random.default_rng(seed)
+        index = pd.date_range(SAMPLES_START, periods=SAMPLES_COUNT, freq='1s', name='timeStamp')
+        return pd.DataFrame({
+            'elapsed': rng.lognormal(5, 1, SAMPLES_COUNT).astype('int32'),
+            'label': pd.Categorical(rng.choice(list(labels), SAMPLES_COUNT)),
+            'responseCode': pd.Categorical(['200'] * SAMPLES_COUNT),
+            'success': rng.random(SAMPLES_COUNT) > 0.1,
+            'Latency': rng.integers(0, 100, SAMPLES_COUNT),
+        }, index=index)
+    return make
+
+
+@pytest.fixture
+def sample_test_times():
+    """
+    Returns a function building the test times of the samples of make_samples: a ramp up
+    of 60 s, ranges of 240 s within an impact of 480 s and a ramp down of 59 s.
+    """
+    def make(ranges_count: int = 2):
+        index = pd.date_range(SAMPLES_START, periods=SAMPLES_COUNT, freq='1s')
+        return get_test_times(index.min(), index.max(), SAMPLES_COUNT - 1, 60, 480, ranges_count, 240, 59)
+    return make
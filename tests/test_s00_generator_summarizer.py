@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from src.common.histograms import LATENCY_RELATIVE_ERROR, latency_bins
+from src.common.percentiles import DEFAULT_PERCENTILES
+from src.common.rollups import build_rollup, merge_rollups, read_rollup
+from src.s00_generator_summarizer import GeneratorSummarizer
+from src.s04_results_analyzer import calculate_rollup_test, calculate_test
+
+sample_jtl_file = Path("tests", "test_data", "s02_data_frame_compiler", "sample.jtl")
+
+
+def test_e2e(tmp_path):
+    output_path = tmp_path / "rollup.feather"
+    summarizer = GeneratorSummarizer(sample_jtl_file, output_path)
+    summarizer.process_data_frame()
+
+    rollup = read_rollup(output_path)
+
+    assert rollup.stats["count"].sum() == 10
+    assert rollup.bucket == "1s"
+
+
+def test_merged_rollups_match_raw_analysis(tmp_path, make_samples, sample_test_times):
+    df = make_samples(['A', 'B', 'C'])
+    test_times = sample_test_times()
+    unique_labels = ['A', 'B', 'C']
+
+    generators = [df.iloc[0::2], df.iloc[1::2]]
+    summarizer = GeneratorSummarizer(sample_jtl_file, tmp_path / "rollup.feather")
+    rollups = []
+    for generator_data_frame in generators:
+        summarizer.data_frame = generator_data_frame
+        summarizer._save_data_frame()
+        rollups.append(read_rollup(summarizer.output_path))
+
+    rollup = merge_rollups(rollups)
+    rollup_results = calculate_rollup_test(rollup, test_times, unique_labels, '30s')
+
+    # One row per label and second, percentiles are estimated from the latency bins
+    assert len(rollup) == len(df)
+    assert rollup.latency['count'].sum() == len(df)
+    raw_results = calculate_test(df, test_times, unique_labels, '30s')
+    assert rollup_results.keys() == raw_results.keys()
+    for range_name, range_data in raw_results.items():
+        results = [(range_data['summary_range_results'], rollup_results[range_name]['summary_range_results'])]
+        for label_name, label_data in range_data['by_transactions_range_results'].items():
+            results.append((label_data, rollup_results[range_name]['by_transactions_range_results'][label_name]))
+        for expected, actual in results:
+            assert actual.keys() == expected.keys()
+            for name, value in expected.items():
+                if name in DEFAULT_PERCENTILES:
+                    assert abs(actual[name] - value) <= value * LATENCY_RELATIVE_ERROR + 1
+                else:
+                    assert actual[name] == value
+
+
+def test_rollup_size_depends_on_buckets_not_samples():
+    rng = np.random.default_rng(3)
+    index = pd.date_range('2024-01-11 05:46:00', periods=60000, freq='1ms')
+    df = pd.DataFrame({
+        'elapsed': rng.lognormal(5, 0.5, 60000).astype('int32'),
+        'label': pd.Categorical(rng.choice(['A', 'B'], 60000)),
+        'success': rng.random(60000) > 0.1,
+    }, index=index)
+
+    rollup = build_rollup(df)
+
+    assert len(rollup) == 2 * 60
+    assert len(rollup.latency) <= len(rollup) * len(np.unique(latency_bins(df['elapsed'])))
+    assert len(rollup.latency) < len(df) / 2
+    assert rollup.latency.groupby('row')['count'].sum().tolist() == rollup.stats['count'].tolist()
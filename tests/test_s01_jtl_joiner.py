@@ -1,7 +1,10 @@
 import os
+import gzip
+import shutil
 from uuid import uuid4
 from pathlib import Path
 import pytest
+from src import s01_jtl_joiner
 from src.s01_jtl_joiner import JTLJoiner
 
 
@@ -55,3 +58,193 @@ def test_e2e(test_data_path, export_file_path):
 
     # Clean up: remove the result file after test
     os.remove(result_file)
+
+
+def test_streaming_matches_in_memory_join(test_data_path, export_file_path):
+    joiner = JTLJoiner(test_data_path, "jtl", export_file_path)
+    expected_file = joiner.process_files()
+    with open(expected_file, "r") as file:
+        expected_lines = file.readlines()
+    os.remove(expected_file)
+
+    streaming_joiner = JTLJoiner(
+        test_data_path, "jtl", export_file_path, streaming=True, memory_budget_mb=1
+    )
+    result_file = streaming_joiner.process_files()
+    with open(result_file, "r") as file:
+        actual_lines = file.readlines()
+
+    assert actual_lines == expected_lines, (
+        f"Streaming join of {test_data_path} differs from the in-memory join."
+    )
+
+    os.remove(result_file)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_parallel_matches_serial_join(test_data_path, export_file_path, streaming):
+    joiner = JTLJoiner(test_data_path, "jtl", export_file_path, streaming=streaming)
+    expected_file = joiner.process_files()
+    with open(expected_file, "r") as file:
+        expected_lines = file.readlines()
+    os.remove(expected_file)
+
+    parallel_joiner = JTLJoiner(
+        test_data_path, "jtl", export_file_path, streaming=streaming, workers=2
+    )
+    result_file = parallel_joiner.process_files()
+    with open(result_file, "r") as file:
+        actual_lines = file.readlines()
+
+    assert actual_lines == expected_lines, (
+        f"Parallel join of {test_data_path} differs from the serial join."
+    )
+
+    os.remove(result_file)
+
+
+def test_raw_concat_matches_parsed_join(test_data_path, export_file_path):
+    joiner = JTLJoiner(test_data_path, "jtl", export_file_path)
+    expected_file = joiner.process_files()
+    with open(expected_file, "r") as file:
+        expected_lines = file.readlines()
+    os.remove(expected_file)
+
+    raw_joiner = JTLJoiner(test_data_path, "jtl", export_file_path, raw_concat=True)
+    result_file = raw_joiner.process_files()
+    with open(result_file, "r") as file:
+        actual_lines = file.readlines()
+
+    assert actual_lines == expected_lines, (
+        f"Raw concatenation of {test_data_path} differs from the parsed join."
+    )
+
+    os.remove(result_file)
+
+
+def test_incremental_appends_only_new_rows(tmp_path, test_data_path):
+    kpi_files_path = tmp_path / "JTLs"
+    shutil.copytree(test_data_path, kpi_files_path)
+    output_file_path = tmp_path / "combined.jtl"
+    joiner = JTLJoiner(kpi_files_path, "jtl", output_file_path, incremental=True)
+
+    joiner.process_files()
+    manifest_path = tmp_path / "combined.jtl.manifest.json"
+    assert manifest_path.exists(), f"Expected manifest at {manifest_path} not found."
+
+    with open(kpi_files_path / "root1.jtl", "a") as file:
+        file.write("1625081160000,240,Label1\n1625081220000,250,Label2")
+    shutil.copy(kpi_files_path / "root2.jtl", kpi_files_path / "root3.jtl")
+    joiner.process_files()
+
+    full_joiner = JTLJoiner(kpi_files_path, "jtl", tmp_path / "full.jtl")
+    with open(full_joiner.process_files(), "r") as file:
+        full_lines = file.readlines()
+    with open(output_file_path, "r") as file:
+        incremental_lines = file.readlines()
+
+    # The partially written last line of root1.jtl is not ingested yet
+    assert "1625081220000,250,Label2\n" not in incremental_lines
+    assert sorted(incremental_lines) == sorted(
+        line for line in full_lines if line != "1625081220000,250,Label2\n"
+    )
+
+
+def test_incremental_rebuilds_rewritten_files(tmp_path, test_data_path, monkeypatch):
+    monkeypatch.setattr(s01_jtl_joiner, "TAIL_WINDOW_SIZE", 40)
+    kpi_files_path = tmp_path / "JTLs"
+    shutil.copytree(test_data_path, kpi_files_path)
+    output_file_path = tmp_path / "combined.jtl"
+    joiner = JTLJoiner(kpi_files_path, "jtl", output_file_path, incremental=True)
+    joiner.process_files()
+
+    # The last ingested row changes and a row is appended, so only the tail window differs
+    root1_path = kpi_files_path / "root1.jtl"
+    head, _, _ = root1_path.read_text().rpartition("190,Label3\n")
+    root1_path.write_text(head + "191,Label3\n1625081160000,240,Label1\n")
+    joiner.process_files()
+
+    full_joiner = JTLJoiner(kpi_files_path, "jtl", tmp_path / "full.jtl")
+    with open(full_joiner.process_files(), "r") as file:
+        full_lines = file.readlines()
+    with open(output_file_path, "r") as file:
+        incremental_lines = file.readlines()
+    assert "1625081100000,191,Label3\n" in incremental_lines
+    assert sorted(incremental_lines) == sorted(full_lines)
+
+
+def test_compressed_files_are_joined(tmp_path, test_data_path, export_file_path):
+    kpi_files_path = tmp_path / "JTLs"
+    shutil.copytree(test_data_path, kpi_files_path)
+    for file in list(kpi_files_path.rglob("folder2_*.jtl")):
+        with open(file, "rb") as source, gzip.open(f"{file}.gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(file)
+
+    for raw_concat in (False, True):
+        joiner = JTLJoiner(kpi_files_path, "jtl", export_file_path, raw_concat=raw_concat)
+        result_file = joiner.process_files()
+        with open(result_file, "r") as file:
+            lines = file.readlines()
+        expected_line_count = 44
+        assert len(lines) == expected_line_count
+        os.remove(result_file)
+
+
+def test_merge_by_time_sorts_output(test_data_path, export_file_path):
+    joiner = JTLJoiner(
+        test_data_path,
+        "jtl",
+        export_file_path,
+        merge_by_time=True,
+        reorder_window_ms=300000,
+        timestamp_column="timestamp",
+    )
+    result_file = joiner.process_files()
+
+    with open(result_file, "r") as file:
+        lines = file.readlines()
+    timestamps = [int(line.split(",")[0]) for line in lines[1:]]
+    expected_line_count = 44
+    assert len(lines) == expected_line_count
+    assert timestamps == sorted(timestamps)
+
+    os.remove(result_file)
+
+
+def test_merge_by_time_drops_unparsable_timestamps(tmp_path, caplog):
+    kpi_files_path = tmp_path / "JTLs"
+    kpi_files_path.mkdir()
+    (kpi_files_path / "first.jtl").write_text(
+        "timeStamp,elapsed,label\n"
+        "2021-06-30 19:21:00,210,Label1\n"
+        "not a timestamp,215,Label2\n"
+        "2021-06-30 19:20:00,220,Label3\n"
+    )
+    (kpi_files_path / "second.jtl").write_text(
+        "timeStamp,elapsed,label\n"
+        "2021-06-30 19:20:30,180,Label1\n"
+    )
+    output_file_path = tmp_path / "combined.jtl"
+    joiner = JTLJoiner(kpi_files_path, "jtl", output_file_path, merge_by_time=True)
+    result_file = joiner.process_files()
+
+    with open(result_file, "r") as file:
+        labels = [line.rstrip("\n").split(",")[2] for line in file.readlines()[1:]]
+    assert labels == ["Label3", "Label1", "Label1"]
+    assert "1 rows had no parsable timeStamp and were dropped." in caplog.text
+
+
+@pytest.mark.parametrize(
+    "modes",
+    [
+        {"incremental": True, "merge_by_time": True},
+        {"incremental": True, "raw_concat": True},
+        {"merge_by_time": True, "raw_concat": True},
+        {"incremental": True, "streaming": True},
+        {"merge_by_time": True, "streaming": True},
+    ],
+)
+def test_conflicting_modes_are_rejected(tmp_path, test_data_path, modes):
+    with pytest.raises(ValueError):
+        JTLJoiner(test_data_path, "jtl", tmp_path / "combined.jtl", **modes)
@@ -1,9 +1,13 @@
 import os
+import shutil
 from pathlib import Path
 import pandas as pd
 import pytest
 from uuid import uuid4
-from src.s02_data_frame_compiler import DataFrameProcessor
+from src.common import jtl_schema
+from src.common.prefix_index import read_index
+from src.common.rollups import read_rollup
+from src.s02_data_frame_compiler import DataFrameProcessor, JTLDirectoryProcessor
 
 sample_jtl_file = Path("tests", "test_data", "s02_data_frame_compiler", "sample.jtl")
 results_path = Path("tests", "test_data", "s02_data_frame_compiler", "results")
@@ -33,3 +37,118 @@ def test_e2e(export_file_path):
     ), f"Expected {expected_row_count} rows, but found {actual_row_count} rows in the processed data."
 
     os.remove(export_file_path)
+
+
+def test_directory_ingest(tmp_path, export_file_path):
+    for name in ("generator1", "generator2"):
+        (tmp_path / name).mkdir()
+        shutil.copy(sample_jtl_file, tmp_path / name / "kpi.jtl")
+
+    processor = JTLDirectoryProcessor(tmp_path, "kpi.jtl", export_file_path)
+    processor.process_data_frame()
+    processed_data = pd.read_feather(export_file_path)
+
+    expected_row_count = 20
+    actual_row_count = processed_data.shape[0]
+    assert (
+        actual_row_count == expected_row_count
+    ), f"Expected {expected_row_count} rows, but found {actual_row_count} rows in the processed data."
+    assert (processed_data.index.year != 1970).all()
+
+    os.remove(export_file_path)
+
+
+def test_compact_types_and_projection(export_file_path):
+    processor = DataFrameProcessor(sample_jtl_file, export_file_path, columns=["label"])
+    processor.process_data_frame()
+    processed_data = pd.read_feather(export_file_path)
+
+    assert list(processed_data.columns) == ["label"]
+    assert isinstance(processed_data["label"].dtype, pd.CategoricalDtype)
+
+    os.remove(export_file_path)
+
+
+def test_pyarrow_engine_matches_pandas_engine(export_file_path):
+    pyarrow_export_file_path = results_path / f"results_{uuid4()}.feather"
+    DataFrameProcessor(sample_jtl_file, export_file_path).process_data_frame()
+    DataFrameProcessor(
+        sample_jtl_file, pyarrow_export_file_path, engine="pyarrow"
+    ).process_data_frame()
+
+    with open(export_file_path, "rb") as file:
+        expected_bytes = file.read()
+    with open(pyarrow_export_file_path, "rb") as file:
+        actual_bytes = file.read()
+    assert actual_bytes == expected_bytes
+
+    os.remove(export_file_path)
+    os.remove(pyarrow_export_file_path)
+
+
+def test_pyarrow_engine_reads_values_spanning_lines(tmp_path, monkeypatch):
+    monkeypatch.setattr(jtl_schema, "ARROW_BLOCK_SIZE", 4096)
+    jtl_file_path = tmp_path / "multiline.jtl"
+    rows = ["timeStamp,elapsed,label,responseMessage,success"]
+    for row in range(2000):
+        message = f'"multi\nline {row}"' if row % 50 == 0 else "OK"
+        rows.append(f"{1704951960000 + row},{row},L{row % 3},{message},true")
+    jtl_file_path.write_text("\n".join(rows) + "\n")
+
+    df = jtl_schema.read_jtl_arrow(jtl_file_path)
+
+    pd.testing.assert_frame_equal(df, jtl_schema.read_jtl(jtl_file_path))
+
+
+def test_rollup_saved_alongside(export_file_path):
+    rollup_file_path = results_path / f"rollup_{uuid4()}.feather"
+    index_file_path = results_path / f"index_{uuid4()}.npz"
+    processor = DataFrameProcessor(
+        sample_jtl_file,
+        export_file_path,
+        rollup_path=rollup_file_path,
+        rollup_bucket="10s",
+        index_path=index_file_path,
+    )
+    processor.process_data_frame()
+    processed_data = pd.read_feather(export_file_path)
+    rollup = read_rollup(rollup_file_path)
+    index = read_index(index_file_path)
+
+    label_buckets = processed_data.groupby(["label", processed_data.index.floor("10s")], observed=True)
+
+    assert rollup.bucket == "10s"
+    assert len(rollup) == label_buckets.ngroups
+    assert rollup.stats["count"].tolist() == label_buckets.size().tolist()
+    assert rollup.stats["count"].sum() == len(processed_data)
+    assert rollup.stats["sum_elapsed"].sum() == processed_data["elapsed"].sum()
+    assert set(rollup.stats["label"]) == set(processed_data["label"])
+    assert index.bucket == pd.Timedelta("10s").value
+    assert index.query(index.start, processed_data.index.max() + pd.Timedelta("10s"))["sampler_count"] == len(processed_data)
+
+    os.remove(export_file_path)
+    os.remove(rollup_file_path)
+    os.remove(index_file_path)
+
+
+def test_rollup_needs_label_and_elapsed(export_file_path):
+    with pytest.raises(ValueError):
+        DataFrameProcessor(
+            sample_jtl_file, export_file_path, columns=["label"], rollup_path=export_file_path
+        )
+
+
+@pytest.mark.parametrize(
+    "timestamps, expected_first_timestamp",
+    [
+        ([1704056401000, 1704056402000], "2023-12-31 21:00:01"),
+        ([1704056401, 1704056402], "2023-12-31 21:00:01"),
+        (["2024-01-11 05:46:41.610", "2024-01-11 05:47:11.825"], "2024-01-11 05:46:41.610"),
+        (["2024-01-11T05:46:41", "2024-01-11T05:47:11"], "2024-01-11 05:46:41"),
+    ],
+)
+def test_indexing_detects_timestamp_format(export_file_path, timestamps, expected_first_timestamp):
+    processor = DataFrameProcessor(sample_jtl_file, export_file_path)
+    df = pd.DataFrame({"timeStamp": timestamps, "elapsed": [1, 2]})
+    indexed_df = processor._indexing_data(df)
+    assert indexed_df.index[0] == pd.Timestamp(expected_first_timestamp)
@@ -1,7 +1,21 @@
+import os
+import json
+import shutil
+import pytest
+import numpy as np
 import pandas as pd
-from src.s04_results_analyzer import calculate_test
+from src import s04_results_analyzer
+from src.s04_results_analyzer import calculate_range_series, calculate_test, calculate_test_approximately, calculate_transaction, calculate_transactions, slice_range
+from src.common import histograms
+from src.common.histograms import LatencyHistogram
+from src.common.percentiles import DEFAULT_PERCENTILES, grouped_percentiles, parse_percentiles
+from src.common.range_models import GBEncoder, TimeFormat, TimeRange
+from src.common.result_cache import ResultCache
+from src.common.results_io import dump_results, get_section_index_path, load_results, load_results_section, load_results_sections
+from src.common.series_store import extract_series, read_series, series_file_pointer, series_to_dict, write_series
 from src.s03_analysis_preparator import get_test_times
 from datetime import datetime, timedelta
+from pathlib import Path
 
 def test_calculate_test():
     data = {
@@ -38,4 +52,244 @@ def test_calculate_test():
     actual_sampler_count = descriptive_analysis_results['full_test']['summary_range_results']['sampler_count']
     expected_sampler_count = len(data['responseCode'])
     
-    assert actual_sampler_count == expected_sampler_count
\ No newline at end of file
+    assert actual_sampler_count == expected_sampler_count
+
+def test_slice_range_excludes_bounds_without_copying():
+    index = pd.to_datetime(['2024-01-11 05:46:40', '2024-01-11 05:46:41', '2024-01-11 05:46:42', '2024-01-11 05:46:43'])
+    df = pd.DataFrame({'elapsed': [1, 2, 3, 4]}, index=index)
+    range_obj = TimeRange(2, 'range', 'R', TimeFormat(datetime(2024, 1, 11, 5, 46, 41)), TimeFormat(datetime(2024, 1, 11, 5, 46, 43)))
+    range_obj.start_time.epoch = index[1].value
+    range_obj.end_time.epoch = index[3].value
+
+    range_df = slice_range(range_obj, df)
+
+    assert list(range_df['elapsed']) == [3]
+    assert np.shares_memory(range_df['elapsed'].to_numpy(), df['elapsed'].to_numpy())
+
+
+def test_calculate_transactions_matches_per_label_calculation():
+    index = pd.date_range('2024-01-11 05:46:00', periods=40, freq='7s')
+    df = pd.DataFrame({
+        'elapsed': [(i * 37) % 101 for i in range(40)],
+        'label': ['A', 'B', 'C', 'A'] * 10,
+        'responseCode': [200] * 40,
+        'success': [i % 5 != 0 for i in range(40)],
+        'Latency': list(range(40)),
+    }, index=index)
+    unique_labels = ['A', 'B', 'C', 'D']
+
+    transactions_data = calculate_transactions(df, unique_labels, '30s')
+
+    for label_name in unique_labels:
+        assert transactions_data[label_name] == calculate_transaction(df, label_name, '30s')
+
+
+def test_grouped_percentiles_match_series_quantile():
+    rng = np.random.default_rng(7)
+    values = rng.integers(0, 1000, 500).astype(float)
+    values[::50] = np.nan
+    codes = rng.integers(-1, 4, 500)
+    quantiles = [0, 0.25, 0.5, 0.9, 0.999, 1]
+
+    result = grouped_percentiles(values, codes, 5, quantiles)
+
+    for code in range(4):
+        expected = pd.Series(values[codes == code]).quantile(quantiles).to_numpy()
+        assert np.array_equal(result[code], expected)
+    assert np.isnan(result[4]).all()
+    assert parse_percentiles('50,99.9') == pytest.approx({'p50': 0.5, 'p99.9': 0.999})
+
+
+def test_histogram_backend_matches_sort_backend(make_samples, sample_test_times):
+    df = make_samples(['A', 'B', 'C'])
+    test_times = sample_test_times()
+    unique_labels = ['A', 'B', 'C', 'D']
+
+    sort_results = calculate_test(df, test_times, unique_labels, '30s')
+    histogram_results = calculate_test(df, test_times, unique_labels, '30s', backend='histogram')
+
+    assert histogram_results == sort_results
+
+
+@pytest.mark.parametrize('backend', ['sort', 'histogram'])
+def test_parallel_analysis_matches_serial_analysis(make_samples, sample_test_times, backend):
+    df = make_samples(['A', 'B', 'C'])
+    test_times = sample_test_times()
+    unique_labels = ['A', 'B', 'C', 'D', 'A']
+
+    serial_results = calculate_test(df, test_times, unique_labels, '30s', backend=backend)
+    parallel_results = calculate_test(df, test_times, unique_labels, '30s', backend=backend, workers=2)
+
+    assert parallel_results == serial_results
+    assert list(parallel_results['impact']['by_transactions_range_results']) == ['A', 'B', 'C', 'D']
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_cached_results_are_reused_for_new_ranges(tmp_path, make_samples, sample_test_times, workers):
+    df = make_samples()
+    one_range = sample_test_times(ranges_count=1)
+    two_ranges = sample_test_times()
+
+    first_cache = ResultCache(tmp_path, 'data')
+    calculate_test(df, one_range, ['A', 'B'], '30s', workers=workers, result_cache=first_cache)
+    assert first_cache.hits == 0
+
+    cache = ResultCache(tmp_path, 'data')
+    cached_results = calculate_test(df, two_ranges, ['A', 'B'], '30s', workers=workers, result_cache=cache)
+    # Only the second assessment range and the changed ramp down are calculated again
+    assert (cache.hits, cache.misses) == (12, 6)
+    results = calculate_test(df, two_ranges, ['A', 'B'], '30s')
+    assert json.dumps(cached_results, cls=GBEncoder) == json.dumps(results, cls=GBEncoder)
+
+    other_data_cache = ResultCache(tmp_path, 'other data')
+    calculate_test(df, one_range, ['A', 'B'], '30s', result_cache=other_data_cache)
+    assert other_data_cache.hits == 0
+
+
+def test_series_are_stored_in_a_columnar_file(tmp_path, make_samples, sample_test_times):
+    df = make_samples()
+    results = calculate_test(df, sample_test_times(), ['A', 'B', 'C'], ['30s', '1min'])
+    expected = json.loads(json.dumps(results, cls=GBEncoder))
+
+    series_path = tmp_path / 'series.feather'
+    write_series(extract_series(results, '30s'), series_path)
+
+    for range_name, range_data in expected.items():
+        for label_name, label_data in range_data['by_transactions_range_results'].items():
+            actual = results[range_name]['by_transactions_range_results'][label_name]
+            if label_data is None:
+                assert actual is None
+                continue
+            assert 'series' not in actual and 'series_by_freq' not in actual
+            assert series_to_dict(read_series(series_path, range_name, label_name, '30s')) == label_data['series']
+            assert series_to_dict(read_series(series_path, range_name, label_name, '1min')) == label_data['series_by_freq']['1min']
+
+
+def test_series_file_pointer_is_relative_to_the_results_file(tmp_path, monkeypatch):
+    results_directory = tmp_path / 'results'
+    (results_directory / 'series').mkdir(parents=True)
+    write_series(pd.DataFrame({'range': ['R'], 'label': ['A'], 'freq': ['30s'], 'bucket': [pd.Timestamp(0)]}),
+                 results_directory / 'series' / 'series.feather')
+
+    monkeypatch.chdir(tmp_path)
+    pointer = series_file_pointer(Path('results', 'series', 'series.feather'), Path('results', 'results.json'))
+    assert pointer == os.path.join('series', 'series.feather')
+
+    moved_directory = tmp_path / 'moved'
+    shutil.move(str(results_directory), moved_directory)
+    monkeypatch.chdir(moved_directory / 'series')
+    assert read_series(pointer, results_path=moved_directory / 'results.json')['label'].tolist() == ['A']
+
+
+def test_result_cache_evicts_least_recently_used_results(tmp_path):
+    cache = ResultCache(tmp_path, 'data', max_bytes=3000)
+    for i in range(10):
+        cache.put(cache.key(i), {'values': list(range(100))})
+    assert cache.size <= 3000
+    assert len(list(tmp_path.glob('*.json'))) < 10
+    assert cache.get(cache.key(9)) == {'values': list(range(100))}
+
+
+def test_latency_histograms_merge_and_fall_back_to_sparse_counting(monkeypatch):
+    values = np.array([5, 1, 100000, 5, 7, 2])
+    dense = LatencyHistogram.from_values(values)
+    dense_groups = LatencyHistogram.from_groups(values, [2, 0, 2, -1, 0, 2], 3)
+    monkeypatch.setattr(histograms, 'DENSE_LIMIT', 1)
+    sparse = LatencyHistogram.merge_all([LatencyHistogram.from_values(values[:3]), LatencyHistogram.from_values(values[3:])])
+    sparse_groups = LatencyHistogram.from_groups(values, [2, 0, 2, -1, 0, 2], 3)
+
+    for groups in (dense_groups, sparse_groups):
+        assert [(group.values.tolist(), group.counts.tolist()) for group in groups] == [([1, 7], [1, 1]), ([], []), ([2, 5, 100000], [1, 1, 1])]
+
+    for histogram in (dense, sparse):
+        assert histogram.values.tolist() == [1, 2, 5, 7, 100000]
+        assert histogram.counts.tolist() == [1, 1, 2, 1, 1]
+        assert np.array_equal(histogram.quantiles([0.25, 0.5, 0.99]), pd.Series(values).quantile([0.25, 0.5, 0.99]).to_numpy())
+
+
+def test_approximate_analysis_streams_feather_batches(tmp_path, monkeypatch, make_samples, sample_test_times):
+    # Partial series sums are merged every other batch
+    monkeypatch.setattr(s04_results_analyzer, 'MAX_PENDING_BATCHES', 2)
+    df = make_samples()
+    feather_path = tmp_path / 'test.feather'
+    df.to_feather(feather_path, chunksize=100)
+    test_times = sample_test_times()
+
+    exact = calculate_test(df, test_times, ['A', 'B'], '30s')
+    approximate = calculate_test_approximately(feather_path, test_times, ['A', 'B'], '30s', relative_error=0.01)
+
+    for range_name, range_data in exact.items():
+        for label_name, label_data in range_data['by_transactions_range_results'].items():
+            approximate_data = approximate[range_name]['by_transactions_range_results'][label_name]
+            for name, value in label_data.items():
+                if name in DEFAULT_PERCENTILES:
+                    assert abs(approximate_data[name] - value) <= value * 0.01 + 0.5
+                else:
+                    assert approximate_data[name] == value
+
+
+def test_range_series_match_resampling_every_label():
+    index = pd.DatetimeIndex(['2024-01-11 23:58:10', '2024-01-11 23:58:50', '2024-01-12 00:00:00.500', '2024-01-12 00:00:00', '2024-01-12 00:03:07', '2024-01-12 00:03:29'])
+    df = pd.DataFrame({
+        'elapsed': [10, 20, 30, 41, 55, 66],
+        'label': ['A', 'A', 'B', 'A', 'B', 'B'],
+        'responseCode': [200] * 6,
+        'threadName': ['t'] * 6,
+        'success': [True, False, True, True, True, False],
+        'Latency': [1.5, np.nan, 3.25, 4.125, 5.0, 6.0],
+    }, index=index)
+
+    series_by_label = calculate_range_series(df, ['7s', '21s', '1min'])
+
+    for label_name in ['A', 'B']:
+        label_series = series_by_label[label_name]
+        assert list(label_series['series_by_freq']) == ['21s', '1min']
+        for freq in ['7s', '21s', '1min']:
+            expected = df[df['label'] == label_name].drop(columns=['responseCode']).groupby(
+                pd.Grouper(freq=freq, offset='0s', label='right')
+            ).mean(numeric_only=True)
+            expected_dict = {
+                str(name): {column: round(row[column], 2) for column in expected.columns}
+                for name, row in expected.iterrows()
+            }
+            actual = label_series['series'] if freq == '7s' else label_series['series_by_freq'][freq]
+            assert list(actual) == list(expected_dict)
+            for key, values in expected_dict.items():
+                assert actual[key] == pytest.approx(values, nan_ok=True)
+
+
+def test_results_file_matches_json_dump_and_loads_sections(tmp_path):
+    test_times = get_test_times(datetime(2024, 1, 11, 5, 46), datetime(2024, 1, 11, 5, 56), 599, 60, 300, 2, 60, 30)
+    results = {
+        'test_times': test_times,
+        'unique_labels': ['A', 'B'],
+        'descriptive_analysis': {
+            'impact': {'all_transactions_range_results': {'sampler_count': np.int64(12), 'p99': 1.5}, 'by_transactions_range_results': {}},
+            'R01': {'all_transactions_range_results': None, 'by_transactions_range_results': {'GET /api/v1.2': {'series': {}}}},
+        },
+        'empty': {},
+    }
+    results_path = tmp_path / 'results.json'
+
+    dump_results(results, results_path)
+
+    expected = json.dumps({**results, 'descriptive_analysis': {
+        'impact': {'all_transactions_range_results': {'sampler_count': 12, 'p99': 1.5}, 'by_transactions_range_results': {}},
+        'R01': results['descriptive_analysis']['R01'],
+    }}, indent=4, cls=GBEncoder)
+    assert results_path.read_text() == expected
+    assert load_results_sections(results_path, [('descriptive_analysis', 'impact'), ('test_times', 'impact', 'duration_in_seconds')]) == [
+        json.loads(expected)['descriptive_analysis']['impact'],
+        300,
+    ]
+    assert load_results_section(results_path, ('descriptive_analysis', 'R02'), 'missing') == 'missing'
+    assert load_results_section(results_path, 'unique_labels') == ['A', 'B']
+
+    dump_results(results, results_path, compact=True)
+    assert load_results(results_path) == json.loads(expected)
+    assert load_results_section(results_path, ['descriptive_analysis', 'R01', 'by_transactions_range_results', 'GET /api/v1.2']) == {'series': {}}
+
+    # A results file changed after it was indexed is parsed whole
+    results_path.write_text(json.dumps({'descriptive_analysis': {'impact': 1}}))
+    assert get_section_index_path(results_path).exists()
+    assert load_results_section(results_path, ('descriptive_analysis', 'impact')) == 1
@@ -0,0 +1,88 @@
+import pandas as pd
+from src.common.percentiles import DEFAULT_PERCENTILES
+from src.s04_results_analyzer import calculate_test
+from src.s09_live_analyzer import LiveAnalyzer
+
+RANGE_PARAMETERS = {
+    'ramp_up_time_seconds': 60,
+    'impact_time_seconds': 480,
+    'ranges_count': 2,
+    'duration_range_seconds': 240,
+    'ramp_down_seconds': 59,
+}
+
+
+def to_jtl_lines(df):
+    epochs = df.index.asi8 // 1_000_000
+    return [
+        f"{epoch},{row.elapsed},{row.label},{row.responseCode},{str(row.success).lower()},{row.Latency}\n"
+        for epoch, row in zip(epochs, df.itertuples())
+    ]
+
+
+def test_live_analysis_matches_final_analysis(tmp_path, make_samples, sample_test_times):
+    df = make_samples()
+    header = "timeStamp,elapsed,label,responseCode,success,Latency\n"
+    generator_lines = [to_jtl_lines(df.iloc[0::2]), to_jtl_lines(df.iloc[1::2])]
+    jtl_paths = [tmp_path / 'generator1.jtl', tmp_path / 'generator2.jtl']
+
+    analyzer = LiveAnalyzer(jtl_paths, RANGE_PARAMETERS, freq='30s', allowed_lateness_seconds=10)
+    assert analyzer.refresh() == 0
+    assert analyzer.snapshot() is None
+
+    # The second generator lags behind and the first one is in the middle of a line
+    jtl_paths[0].write_text(header + ''.join(generator_lines[0][:150]) + generator_lines[0][150][:5])
+    jtl_paths[1].write_text(header + ''.join(generator_lines[1][:100]))
+    assert analyzer.refresh() == 250
+    assert analyzer.added_samples + len(analyzer.pending) == 250
+    assert analyzer.pending.index.min() >= pd.Timestamp(analyzer.watermark)
+    assert analyzer.snapshot()['live_analysis']['completed_ranges'] == ['ramp_up']
+
+    with open(jtl_paths[0], 'a') as file:
+        file.write(generator_lines[0][150][5:] + ''.join(generator_lines[0][151:]))
+    with open(jtl_paths[1], 'a') as file:
+        file.write(''.join(generator_lines[1][100:]))
+    assert analyzer.refresh(flush=True) == 350
+    snapshot = analyzer.snapshot()
+    assert snapshot['live_analysis']['analyzed_samples'] == 600
+    assert snapshot['live_analysis']['late_samples'] == 44
+
+    exact = calculate_test(df, sample_test_times(), ['A', 'B'], '30s')
+    live = snapshot['descriptive_analysis']
+    assert list(live) == list(exact)
+    for range_name, range_data in exact.items():
+        for label_name, label_data in range_data['by_transactions_range_results'].items():
+            live_data = live[range_name]['by_transactions_range_results'][label_name]
+            for name, value in label_data.items():
+                if name in DEFAULT_PERCENTILES:
+                    assert abs(live_data[name] - value) <= value * 0.01 + 0.5
+                else:
+                    assert live_data[name] == value
+
+
+def test_snapshots_summarize_only_ranges_with_new_rows(tmp_path, make_samples):
+    lines = to_jtl_lines(make_samples())
+    jtl_path = tmp_path / 'generator.jtl'
+    jtl_path.write_text("timeStamp,elapsed,label,responseCode,success,Latency\n" + ''.join(lines[:120]))
+    analyzer = LiveAnalyzer([jtl_path], RANGE_PARAMETERS, freq='30s', allowed_lateness_seconds=0)
+    analyzer.refresh()
+    first = analyzer.snapshot()['descriptive_analysis']
+    impact_series = first['impact']['by_transactions_range_results']['A']['series']
+    first_interval, first_means = next(iter(impact_series.items()))
+    intervals_count = len(impact_series)
+
+    with open(jtl_path, 'a') as file:
+        file.write(''.join(lines[120:]))
+    analyzer.refresh(flush=True)
+    second = analyzer.snapshot()['descriptive_analysis']
+
+    # The ramp up ended before the new rows, the impact range got new rows
+    assert second['ramp_up']['summary_range_results'] is first['ramp_up']['summary_range_results']
+    assert second['ramp_up']['by_transactions_range_results']['A'] is first['ramp_up']['by_transactions_range_results']['A']
+    assert second['impact']['summary_range_results']['sampler_count'] > first['impact']['summary_range_results']['sampler_count']
+    assert not analyzer.dirty_keys
+    # The series are updated in place, only in the intervals with new rows
+    assert second['impact']['by_transactions_range_results']['A']['series'] is impact_series
+    assert impact_series[first_interval] is first_means
+    assert len(impact_series) > intervals_count
+    assert analyzer.snapshot()['descriptive_analysis']['impact']['summary_range_results'] is second['impact']['summary_range_results']
@@ -0,0 +1,65 @@
+import numpy as np
+import pandas as pd
+from src.common.histograms import LATENCY_RELATIVE_ERROR
+from src.common.prefix_index import TimeWindowIndex, read_index, write_index
+from src.common.rollups import build_rollup, merge_rollups
+from src.s10_window_query import parse_window_bound, query_windows
+
+
+def make_data_frame():
+    rng = np.random.default_rng(9)
+    index = pd.date_range('2024-01-11 05:46:00.250', periods=3600, freq='500ms')
+    return pd.DataFrame({
+        'elapsed': rng.integers(1, 3000, 3600).astype('int32'),
+        'label': pd.Categorical(rng.choice(['A', 'B', 'C'], 3600)),
+        'responseCode': pd.Categorical(['200'] * 3600),
+        'success': rng.random(3600) > 0.1,
+    }, index=index)
+
+
+def test_window_statistics_match_rows():
+    df = make_data_frame()
+    index = TimeWindowIndex.from_data_frame(df, '1s')
+
+    for start, end, label in [('7min', '8min', None), ('12min', '22min', 'B'), ('0s', '1h', 'C'), ('5min', '5min', None)]:
+        window_start = parse_window_bound(start, index.start)
+        window_end = parse_window_bound(end, index.start)
+        rows = df[(df.index >= window_start) & (df.index < window_end)]
+        if label is not None:
+            rows = rows[rows['label'] == label]
+        statistics = index.query(window_start, window_end, label)
+        if rows.empty:
+            assert statistics is None
+            continue
+        assert statistics['sampler_count'] == len(rows)
+        assert statistics['failures'] == (~rows['success']).sum()
+        assert statistics['avg-max'] == rows['elapsed'].max()
+        assert statistics['avg-rt'] == rows['elapsed'].mean()
+        for name, quantile in {'p50': 0.5, 'p99': 0.99}.items():
+            expected = rows['elapsed'].quantile(quantile)
+            assert abs(statistics[name] - expected) <= expected * LATENCY_RELATIVE_ERROR
+
+
+def test_windows_are_resolved_to_buckets():
+    df = make_data_frame()
+    index = TimeWindowIndex.from_data_frame(df, '1min')
+
+    results = query_windows([index], [['1min', '2min'], ['50s', '1min 50s'], ['2024-01-11 05:47:00', '2024-01-11 05:48:00']], ['A', 'D'])
+
+    assert results[0]['all'] == results[1]['all']
+    assert results[1]['start'] == '2024-01-11 05:46:50'
+    assert results[2]['all']['sampler_count'] == 120
+    assert results[0]['D'] is None
+
+
+def test_saved_generator_indexes_answer_like_the_merged_rollup(tmp_path):
+    df = make_data_frame()
+    rollups = [build_rollup(df.iloc[0::2]), build_rollup(df.iloc[1::2])]
+    index_paths = [tmp_path / 'generator1.npz', tmp_path / 'generator2.npz']
+    for rollup, index_path in zip(rollups, index_paths):
+        write_index(TimeWindowIndex.from_rollup(rollup), index_path)
+    windows = [['0s', '30min'], ['7min', '8min'], ['12min 0.5s', '22min']]
+
+    saved = query_windows([read_index(index_path) for index_path in index_paths], windows, ['A', 'C'])
+
+    assert saved == query_windows([TimeWindowIndex.from_rollup(merge_rollups(rollups))], windows, ['A', 'C'])